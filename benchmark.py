@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+"""
+Benchmark the scraper's CPU-bound steps on stored pages
+
+Usage:
+  python benchmark.py                 # every stored fixture
+  python benchmark.py page.html -n 50 # a saved page, 50 rounds
+"""
+import sys
+import os
+import argparse
+import json
+import time
+from pathlib import Path
+
+# Add src to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'src'))
+
+from scraper import ShopeeScraper
+from html_parser import available_backends, parse_html
+from field_extractor import FieldExtractor
+from json_codec import HAS_ORJSON, load_fields, loads
+from item_ref import parse_item_ref
+
+PROJECT_ROOT = Path(__file__).parent
+FIXTURES = [PROJECT_ROOT / "shopee_page.html", PROJECT_ROOT / "tests" / "fixtures" / "product_page.html"]
+ITEM_API_FIXTURE = PROJECT_ROOT / "tests" / "fixtures" / "item_api.json"
+PRODUCT_URL = "https://shopee.ph/Camping-Tent-i.25316261.2935397050"
+
+# Records in the item-list body built from the item API fixture
+ITEM_LIST_SIZE = 50
+
+def timed(func, rounds: int) -> float:
+    """Get the best time of a function over several rounds, in milliseconds"""
+    best = float('inf')
+    for _ in range(rounds):
+        started = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - started)
+    return best * 1000
+
+def extract(scraper: ShopeeScraper, html: str, backend: str):
+    """Parse a page and run the HTML extraction on it"""
+    product = scraper._extract_from_html(parse_html(html, backend), parse_item_ref(PRODUCT_URL))
+    if product:
+        product.pop('timestamp', None)
+    return product
+
+def bench_parsers(pages, rounds: int):
+    """Compare parser backends: parse time, field extraction time, parse + extraction time, identical results"""
+    scraper = ShopeeScraper()
+    extractor = FieldExtractor()
+    backends = available_backends()
+    print(f"\nHTML parser backends ({', '.join(backends)}), best of {rounds} rounds")
+
+    for page in pages:
+        html = page.read_text(encoding='utf-8')
+        print(f"\n{page.name} ({len(html) / 1024:.0f} KB)")
+        print(f"  {'backend':<12} {'parse ms':>10} {'fields ms':>10} {'extract ms':>12}  result")
+
+        reference = extract(scraper, html, 'html.parser')
+        for backend in backends:
+            parse_ms = timed(lambda: parse_html(html, backend), rounds)
+            doc = parse_html(html, backend)
+            fields_ms = timed(lambda: extractor.extract(doc), rounds)
+            extract_ms = timed(lambda: extract(scraper, html, backend), rounds)
+            same = extract(scraper, html, backend) == reference
+            print(f"  {backend:<12} {parse_ms:>10.2f} {fields_ms:>10.2f} {extract_ms:>12.2f}  {'same' if same else 'DIFFERENT'}")
+
+        if reference:
+            print(f"  extracted: {reference['name']} - {reference['price']}")
+
+def api_bodies():
+    """Representative API bodies as served (compact JSON bytes): one item, and an item list"""
+    item = json.loads(ITEM_API_FIXTURE.read_text(encoding='utf-8'))
+    records = [dict(item['data'], itemid=item['data']['itemid'] + index) for index in range(ITEM_LIST_SIZE)]
+
+    compact = {'separators': (',', ':'), 'ensure_ascii': False}
+    return {
+        'item/get': json.dumps(item, **compact).encode('utf-8'),
+        'item/get_list': json.dumps({'error': None, 'data': records}, **compact).encode('utf-8'),
+    }
+
+def bench_json(rounds: int):
+    """Compare JSON decoding of API bodies: stdlib, fast library, decode + keep product fields"""
+    print(f"\nJSON decoding (fast library: {'orjson' if HAS_ORJSON else 'not installed'}), best of {rounds} rounds")
+    print(f"  {'body':<16} {'KB':>6} {'json ms':>9} {'loads ms':>9} {'fields ms':>10}")
+
+    for name, body in api_bodies().items():
+        json_ms = timed(lambda: json.loads(body), rounds)
+        loads_ms = timed(lambda: loads(body), rounds)
+        fields_ms = timed(lambda: load_fields(body, 'data'), rounds)
+        print(f"  {name:<16} {len(body) / 1024:>6.1f} {json_ms:>9.3f} {loads_ms:>9.3f} {fields_ms:>10.3f}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the scraper on stored pages")
+    parser.add_argument('pages', nargs='*', type=Path, help='Saved HTML pages (default: stored fixtures)')
+    parser.add_argument('-n', '--rounds', type=int, default=20, help='Rounds per measurement (default: 20)')
+    args = parser.parse_args()
+
+    pages = args.pages or [page for page in FIXTURES if page.exists()]
+    if not pages:
+        print("No pages to benchmark")
+        sys.exit(1)
+
+    bench_parsers(pages, args.rounds)
+    if ITEM_API_FIXTURE.exists():
+        bench_json(args.rounds)
+
+if __name__ == "__main__":
+    main()
@@ -92,6 +92,8 @@ def example_3_track_multiple_products():
             else:
                 print(f"✗ Failed to track: {url}")
         
+        # Wait for the queued rows to reach Google Sheets
+        tracker.close()
         print("\nTracking complete!")
     
     except Exception as e:
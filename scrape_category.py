@@ -4,22 +4,26 @@ Scrape all products from a Shopee category page
 """
 import sys
 import os
-import requests
+import argparse
 
 # Add src to path
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'src'))
 
 from scraper import ShopeeScraper
+from async_scraper import scrape_all
+from browser_pool import close_browser_pool
+from http_session import close_shared_session
 from google_sheets import GoogleSheetsManager
 from logger import app_logger
 
-def scrape_category(category_url: str, limit: int = None):
+def scrape_category(category_url: str, limit: int = None, concurrency: int = None):
     """
     Scrape all products from a category page and track them
     
     Args:
         category_url: Shopee category URL
         limit: Max products to scrape (None = all)
+        concurrency: Products scraped at once (None or 1 = one at a time)
     """
     scraper = ShopeeScraper()
     
@@ -41,7 +45,7 @@ def scrape_category(category_url: str, limit: int = None):
             'offset': 0,
         }
         
-        response = requests.get(search_url, params=params, timeout=10)
+        response = scraper.fetch(search_url, params=params)
         
         if response.status_code == 200:
             data = response.json()
@@ -63,7 +67,7 @@ def scrape_category(category_url: str, limit: int = None):
                 
                 if product_links:
                     app_logger.info(f"Will track {len(product_links)} products")
-                    track_products(product_links, limit)
+                    track_products(product_links, limit, concurrency, scraper)
                     return
     except Exception as e:
         app_logger.debug(f"API search failed: {e}")
@@ -79,11 +83,13 @@ def scrape_category(category_url: str, limit: int = None):
         app_logger.warning("3. Use manual URL list in a file")
         return
     
-    track_products(product_links, limit)
+    track_products(product_links, limit, concurrency, scraper)
 
-def track_products(product_links: list, limit: int = None):
-    """Track a list of product URLs"""
-    scraper = ShopeeScraper()
+def track_products(product_links: list, limit: int = None, concurrency: int = None,
+                   scraper: ShopeeScraper = None):
+    """Track a list of product URLs, once per product"""
+    scraper = scraper or ShopeeScraper()
+    product_links = scraper.unique_urls(product_links)
     
     # Limit if specified
     if limit:
@@ -96,18 +102,25 @@ def track_products(product_links: list, limit: int = None):
     tracked = 0
     failed = 0
     
-    for i, url in enumerate(product_links, 1):
+    def row_written(product_data, error):
+        nonlocal tracked, failed
+        
+        if error is None:
+            tracked += 1
+            app_logger.info(f"✓ Tracked: {product_data.get('name')}")
+        else:
+            failed += 1
+            app_logger.error(f"✗ Failed to save: {product_data.get('url')} ({error})")
+    
+    # Rows are appended in bulk, each reported once its batch is written
+    rows = sheets.row_buffer(on_result=row_written)
+    
+    def save_result(url, product_data):
+        nonlocal failed
+        
         try:
-            app_logger.info(f"Tracking {i}/{len(product_links)}: {url}")
-            
-            product_data = scraper.scrape_product(url)
             if product_data:
-                if sheets.append_price_data(product_data):
-                    tracked += 1
-                    app_logger.info(f"✓ Tracked: {product_data.get('name')}")
-                else:
-                    failed += 1
-                    app_logger.error(f"✗ Failed to save: {url}")
+                rows.add(product_data)
             else:
                 failed += 1
                 app_logger.error(f"✗ Failed to scrape: {url}")
@@ -116,6 +129,32 @@ def track_products(product_links: list, limit: int = None):
             failed += 1
             app_logger.error(f"Error processing {url}: {e}")
     
+    # Products returned by the batched item API need no further requests
+    prefetched = scraper.fetch_products_batch(product_links)
+    for url, product_data in prefetched.items():
+        save_result(url, product_data)
+    product_links = [url for url in product_links if url not in prefetched]
+    
+    if concurrency and concurrency > 1:
+        # Results are saved as each product completes
+        scrape_all(product_links, save_result, concurrency=concurrency, scraper=scraper)
+    else:
+        for i, url in enumerate(product_links, 1):
+            try:
+                app_logger.info(f"Tracking {i}/{len(product_links)}: {url}")
+                save_result(url, scraper.scrape_product(url))
+            except Exception as e:
+                failed += 1
+                app_logger.error(f"Error processing {url}: {e}")
+    
+    rows.flush()
+    scraper.log_run_stats()
+    sheets.log_quota_stats()
+    sheets.save_state()
+    scraper.save_state()
+    close_browser_pool()
+    close_shared_session()
+    
     # Summary
     print("\n" + "="*60)
     print(f"Scraping Complete")
@@ -125,14 +164,19 @@ def track_products(product_links: list, limit: int = None):
     print("="*60)
 
 if __name__ == "__main__":
-    if len(sys.argv) < 2:
-        print("Usage: python scrape_category.py <category_url> [limit]")
+    parser = argparse.ArgumentParser(description="Scrape all products from a Shopee category page")
+    parser.add_argument('category_url', nargs='?', help='Shopee category URL')
+    parser.add_argument('limit', nargs='?', type=int, help='Max products to scrape')
+    parser.add_argument('--concurrency', type=int,
+                        help='Number of products to scrape at once (default: 1)')
+    args = parser.parse_args()
+    
+    if not args.category_url:
+        print("Usage: python scrape_category.py <category_url> [limit] [--concurrency N]")
         print("\nExample:")
         print("  python scrape_category.py 'https://shopee.ph/Crocs-Classic-Sandal-V2'")
         print("  python scrape_category.py 'https://shopee.ph/Crocs-Classic-Sandal-V2' 10")
+        print("  python scrape_category.py 'https://shopee.ph/Crocs-Classic-Sandal-V2' --concurrency 8")
         sys.exit(1)
     
-    category_url = sys.argv[1]
-    limit = int(sys.argv[2]) if len(sys.argv) > 2 else None
-    
-    scrape_category(category_url, limit)
+    scrape_category(args.category_url, args.limit, args.concurrency)
@@ -0,0 +1,163 @@
+"""
+Asyncio scraping engine with bounded concurrency
+"""
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
+from typing import AsyncIterator, Callable, Dict, Iterable, List, Optional, Tuple
+from urllib.parse import urlparse
+from scraper import ShopeeScraper
+from retry import Deadline, DeadlineExceeded
+from config import config
+from logger import app_logger
+
+class AsyncShopeeScraper:
+    """
+    Scrape many Shopee products at once on an asyncio event loop
+
+    Each product still goes through ShopeeScraper.scrape_product (API,
+    JSON-LD, embedded JSON and HTML extraction) on a worker thread, so
+    all fetches share the scraper's keep-alive connection pool. Results
+    are handled by the caller as they are yielded; blocking work done
+    with them belongs on an executor (see scrape_all), not the loop.
+    """
+
+    def __init__(self, scraper: Optional[ShopeeScraper] = None, concurrency: int = None,
+                 per_host_concurrency: int = None):
+        """
+        Initialize async scraper
+
+        Args:
+            scraper: Scraper used for each product (default: new ShopeeScraper)
+            concurrency: Max products scraped at once (default from config)
+            per_host_concurrency: Max products scraped at once per host (default from config)
+        """
+        self.scraper = scraper or ShopeeScraper()
+        self.concurrency = max(1, concurrency or config.SCRAPE_CONCURRENCY)
+        self.per_host_concurrency = max(1, per_host_concurrency or config.SCRAPE_PER_HOST_CONCURRENCY)
+        self._global_limit = None
+        self._host_limits = {}
+        self._executor = None
+        # URLs not scraped before the deadline of the last scrape_many call
+        self.deferred = []
+
+    def _host_limit(self, url: str) -> asyncio.Semaphore:
+        """Get the semaphore capping concurrent requests to the URL's host"""
+        host = urlparse(url).netloc.lower()
+        if host not in self._host_limits:
+            self._host_limits[host] = asyncio.Semaphore(self.per_host_concurrency)
+        return self._host_limits[host]
+
+    async def scrape_product(self, url: str, deadline: Optional[Deadline] = None) -> Optional[Dict]:
+        """
+        Scrape a single product within the concurrency limits
+
+        Args:
+            url: Product URL
+            deadline: Deadline of the enclosing tracking cycle
+
+        Returns:
+            Dictionary with product data or None if failed
+
+        Raises:
+            DeadlineExceeded: If the deadline passed before the product was scraped
+        """
+        # Wait for the host before taking a global slot, so products of a
+        # busy host do not hold slots that other hosts could use
+        async with self._host_limit(url):
+            async with self._global_limit:
+                deadline = deadline or Deadline()
+                deadline.check(f"scraping {url}")
+                loop = asyncio.get_running_loop()
+                try:
+                    return await loop.run_in_executor(
+                        self._executor,
+                        functools.partial(self.scraper.scrape_product, url, deadline=deadline)
+                    )
+                except DeadlineExceeded:
+                    raise
+                except Exception as e:
+                    app_logger.error(f"Error scraping {url}: {e}")
+                    return None
+
+    async def _scrape_with_url(self, url: str, deadline: Optional[Deadline]) -> Tuple[str, Optional[Dict], bool]:
+        """Scrape a product and pair the result with its URL and whether it was deferred"""
+        try:
+            return url, await self.scrape_product(url, deadline), False
+        except DeadlineExceeded:
+            return url, None, True
+
+    async def scrape_many(self, urls: Iterable[str],
+                          deadline: Optional[Deadline] = None) -> AsyncIterator[Tuple[str, Optional[Dict]]]:
+        """
+        Scrape products concurrently, yielding results as they complete
+
+        Products not scraped before the deadline are not yielded; they are
+        collected in self.deferred instead.
+
+        Args:
+            urls: Product URLs
+            deadline: Deadline of the enclosing tracking cycle
+
+        Yields:
+            (url, product data or None) tuples in completion order
+        """
+        urls = [url.strip() for url in urls if url and url.strip()]
+        self.deferred = []
+        if not urls:
+            return
+
+        self._global_limit = asyncio.Semaphore(self.concurrency)
+        self._host_limits = {}
+        self._executor = ThreadPoolExecutor(
+            max_workers=self.concurrency,
+            thread_name_prefix='shopee-scraper'
+        )
+
+        app_logger.info(
+            f"Scraping {len(urls)} products with concurrency={self.concurrency} "
+            f"(per host: {self.per_host_concurrency})"
+        )
+
+        tasks = [asyncio.ensure_future(self._scrape_with_url(url, deadline)) for url in urls]
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                url, product_data, deferred = await next_done
+                if deferred:
+                    self.deferred.append(url)
+                else:
+                    yield url, product_data
+        finally:
+            for task in tasks:
+                task.cancel()
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+def scrape_all(urls: Iterable[str], on_result: Callable[[str, Optional[Dict]], None],
+               concurrency: int = None, scraper: Optional[ShopeeScraper] = None,
+               deadline: Optional[Deadline] = None) -> List[str]:
+    """
+    Scrape URLs concurrently and hand each result to a callback as it completes
+
+    The callback runs on a worker thread, one result at a time, so it may
+    block (e.g. write to Google Sheets) without stalling other scrapes.
+
+    Args:
+        urls: Product URLs
+        on_result: Called with (url, product data or None) for every URL scraped
+        concurrency: Max products scraped at once (default from config)
+        scraper: Scraper used for each product (default: new ShopeeScraper)
+        deadline: Deadline for the whole run
+
+    Returns:
+        URLs not scraped before the deadline
+    """
+    engine = AsyncShopeeScraper(scraper, concurrency)
+
+    async def _consume():
+        loop = asyncio.get_running_loop()
+        async for url, product_data in engine.scrape_many(urls, deadline):
+            await loop.run_in_executor(None, on_result, url, product_data)
+
+    asyncio.run(_consume())
+    return engine.deferred
@@ -0,0 +1,282 @@
+"""
+Persistent headless browser pool for JavaScript rendering
+"""
+import asyncio
+import atexit
+import concurrent.futures
+import threading
+from typing import List, Optional
+from config import config
+from logger import app_logger
+
+try:
+    import pyppeteer
+    from pyppeteer.errors import TimeoutError as PageTimeoutError
+    HAS_PYPPETEER = True
+except ImportError:
+    HAS_PYPPETEER = False
+    PageTimeoutError = asyncio.TimeoutError
+
+_shared_pool = None
+_shared_lock = threading.Lock()
+
+class BrowserPoolFullError(Exception):
+    """Raised when the render queue has no room for another job"""
+
+class _PooledBrowser:
+    """A Chromium instance with a fixed set of reusable tabs"""
+
+    def __init__(self, browser, pages: List):
+        self.browser = browser
+        self.pages = pages
+        self.rendered = 0
+        self.released = 0
+        self.retiring = False
+
+class BrowserPool:
+    """
+    Long-lived Chromium instances serving render jobs from reusable tabs
+
+    All browser work runs on one background event loop. Callers on any
+    thread submit jobs with render(); each job waits for an idle tab,
+    navigates it and returns the rendered HTML. A browser is relaunched
+    once it has rendered max_pages_per_browser pages or one of its tabs
+    fails (if the relaunch fails, the next job tries again), and render()
+    refuses new jobs once queue_size are waiting.
+    """
+
+    def __init__(self, browsers: int = None, tabs_per_browser: int = None,
+                 max_pages_per_browser: int = None, queue_size: int = None):
+        """
+        Initialize browser pool (browsers are launched on first render)
+
+        Args:
+            browsers: Number of Chromium instances (default from config)
+            tabs_per_browser: Reusable tabs per instance (default from config)
+            max_pages_per_browser: Pages rendered before an instance is recycled (default from config)
+            queue_size: Jobs allowed to wait for a tab (default from config)
+        """
+        self.browsers = max(1, browsers or config.BROWSER_POOL_SIZE)
+        self.tabs_per_browser = max(1, tabs_per_browser or config.BROWSER_TABS_PER_BROWSER)
+        self.max_pages_per_browser = max(1, max_pages_per_browser or config.BROWSER_MAX_PAGES)
+        self.queue_size = config.BROWSER_QUEUE_SIZE if queue_size is None else queue_size
+
+        total_tabs = self.browsers * self.tabs_per_browser
+        self._slots = threading.BoundedSemaphore(total_tabs + self.queue_size)
+        self._start_lock = threading.Lock()
+        self._loop = None
+        self._thread = None
+        self._tabs = None
+        self._instances = []
+        # Retired instances whose relaunch failed, launched again by the next job
+        self._missing = 0
+        self.recycled = 0
+
+    async def _launch(self) -> _PooledBrowser:
+        """Launch a Chromium instance and open its tabs"""
+        browser = await pyppeteer.launch(
+            headless=True,
+            args=['--no-sandbox', '--disable-dev-shm-usage'],
+            handleSIGINT=False,
+            handleSIGTERM=False,
+            handleSIGHUP=False,
+        )
+        pages = []
+        for _ in range(self.tabs_per_browser):
+            page = await browser.newPage()
+            await page.setUserAgent(config.USER_AGENT)
+            pages.append(page)
+        return _PooledBrowser(browser, pages)
+
+    async def _add_browser(self):
+        """Launch an instance and make its tabs available"""
+        instance = await self._launch()
+        self._instances.append(instance)
+        for page in instance.pages:
+            self._tabs.put_nowait((instance, page))
+
+    async def _start(self):
+        """Create the tab queue and launch all instances"""
+        self._tabs = asyncio.Queue()
+        for _ in range(self.browsers):
+            await self._add_browser()
+        app_logger.info(
+            f"Browser pool started: {self.browsers} browser(s) x {self.tabs_per_browser} tab(s)"
+        )
+
+    def _ensure_started(self):
+        """Start the event loop thread and browsers on first use"""
+        if self._loop is not None:
+            return
+
+        with self._start_lock:
+            if self._loop is not None:
+                return
+
+            loop = asyncio.new_event_loop()
+            thread = threading.Thread(target=loop.run_forever, name='browser-pool', daemon=True)
+            thread.start()
+            try:
+                asyncio.run_coroutine_threadsafe(self._start(), loop).result()
+            except Exception:
+                loop.call_soon_threadsafe(loop.stop)
+                raise
+            self._thread = thread
+            self._loop = loop
+
+    async def _release(self, instance: _PooledBrowser):
+        """Count a tab of a retiring instance as drained and recycle when all are"""
+        instance.released += 1
+        if instance.released < len(instance.pages):
+            return
+
+        self._instances.remove(instance)
+        try:
+            await instance.browser.close()
+        except Exception as e:
+            app_logger.debug(f"Error closing browser: {e}")
+
+        self.recycled += 1
+        app_logger.debug(f"Recycled browser after {instance.rendered} page(s)")
+        self._missing += 1
+        try:
+            await self._relaunch()
+        except Exception as e:
+            # Runs from a finally block: keep the job's own outcome
+            app_logger.warning(f"Could not relaunch browser, retrying on the next render: {e}")
+
+    async def _relaunch(self):
+        """Launch the instances whose relaunch failed"""
+        while self._missing:
+            self._missing -= 1
+            try:
+                await self._add_browser()
+            except Exception:
+                self._missing += 1
+                raise
+
+    async def _render(self, url: str, timeout: float) -> Optional[str]:
+        """Render a URL in the next idle tab"""
+        if self._missing:
+            try:
+                await self._relaunch()
+            except Exception as e:
+                if not self._instances:
+                    # No tab would ever become idle
+                    raise
+                app_logger.debug(f"Could not relaunch browser: {e}")
+
+        while True:
+            instance, page = await self._tabs.get()
+            if not instance.retiring:
+                break
+            await self._release(instance)
+
+        try:
+            await page.goto(url, {'timeout': int(timeout * 1000), 'waitUntil': 'networkidle2'})
+            return await page.content()
+        except PageTimeoutError:
+            app_logger.debug(f"Render timed out after {timeout}s: {url}")
+            return None
+        except Exception:
+            # The tab or browser may have crashed, replace the whole instance
+            instance.retiring = True
+            raise
+        finally:
+            instance.rendered += 1
+            if instance.rendered >= self.max_pages_per_browser:
+                instance.retiring = True
+
+            if instance.retiring:
+                await self._release(instance)
+            else:
+                self._tabs.put_nowait((instance, page))
+
+    def render(self, url: str, timeout: float = None) -> Optional[str]:
+        """
+        Render a URL and return the HTML after JavaScript has run
+
+        Args:
+            url: Page URL
+            timeout: Navigation timeout in seconds (default from config)
+
+        Returns:
+            Rendered HTML or None if the page timed out
+
+        Raises:
+            BrowserPoolFullError: If the render queue is full
+        """
+        timeout = config.RENDER_TIMEOUT if timeout is None else timeout
+        if timeout <= 0:
+            # A zero navigation timeout would mean no timeout at all to pyppeteer
+            app_logger.debug(f"No time left to render {url}")
+            return None
+
+        if not self._slots.acquire(blocking=False):
+            raise BrowserPoolFullError(f"Render queue full ({self.queue_size} waiting)")
+
+        try:
+            self._ensure_started()
+            future = asyncio.run_coroutine_threadsafe(self._render(url, timeout), self._loop)
+
+            # Allow for time spent queued behind other jobs
+            waves = 2 + self.queue_size // (self.browsers * self.tabs_per_browser)
+            try:
+                return future.result(timeout=timeout * waves)
+            except concurrent.futures.TimeoutError:
+                future.cancel()
+                app_logger.debug(f"Render job abandoned after waiting {timeout * waves}s: {url}")
+                return None
+        finally:
+            self._slots.release()
+
+    async def _close(self):
+        """Close all browser instances"""
+        for instance in list(self._instances):
+            try:
+                await instance.browser.close()
+            except Exception as e:
+                app_logger.debug(f"Error closing browser: {e}")
+        self._instances = []
+
+    def close(self):
+        """Close all browsers and stop the event loop thread"""
+        with self._start_lock:
+            if self._loop is None:
+                return
+
+            try:
+                asyncio.run_coroutine_threadsafe(self._close(), self._loop).result(timeout=30)
+            except Exception as e:
+                app_logger.debug(f"Error closing browser pool: {e}")
+
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._thread.join(timeout=5)
+            self._loop = None
+            self._thread = None
+
+def get_browser_pool() -> BrowserPool:
+    """
+    Get the process-wide browser pool, creating it on first use
+
+    Returns:
+        Shared browser pool
+    """
+    global _shared_pool
+
+    if _shared_pool is None:
+        with _shared_lock:
+            if _shared_pool is None:
+                _shared_pool = BrowserPool()
+                # Backstop for exits that skip the shutdown paths
+                atexit.register(close_browser_pool)
+    return _shared_pool
+
+def close_browser_pool():
+    """Close the shared browser pool if it was started"""
+    global _shared_pool
+
+    with _shared_lock:
+        if _shared_pool is not None:
+            _shared_pool.close()
+            _shared_pool = None
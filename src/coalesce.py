@@ -0,0 +1,102 @@
+"""
+Coalescing of concurrent and repeated work for the same key
+"""
+import threading
+from typing import Any, Callable, Hashable, Optional, Tuple
+
+class _Call:
+    """A unit of work in flight or finished"""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+class Coalescer:
+    """
+    Run a function once per key and hand its result to every caller
+
+    While a call is in flight, other callers with the same key wait for it
+    instead of starting their own. While `memoize` is set, results are also
+    remembered until clear(), so later callers reuse them; otherwise a key
+    is forgotten as soon as its call finishes. Errors are passed to the
+    waiting callers but never remembered, so a later caller tries again.
+    """
+
+    def __init__(self, memoize: bool = False):
+        """
+        Initialize with no remembered results
+
+        Args:
+            memoize: Remember finished results until clear()
+        """
+        self.memoize = memoize
+        self._calls = {}
+        self._lock = threading.Lock()
+
+    def run(self, key: Hashable, func: Callable[[], Any],
+            timeout: Optional[float] = None) -> Tuple[Any, bool]:
+        """
+        Get the result for a key, running func only if no other caller has
+
+        Args:
+            key: Key identifying the work
+            func: Function computing the result
+            timeout: Maximum seconds to wait for another caller's result
+
+        Returns:
+            (result, shared) where shared is True if another caller computed it
+
+        Raises:
+            TimeoutError: If another caller's result did not arrive in time
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = _Call()
+                self._calls[key] = call
+
+        if not leader:
+            if not call.done.wait(timeout):
+                raise TimeoutError(f"Timed out waiting for in-flight work on {key}")
+            if call.error is not None:
+                raise call.error
+            return call.result, True
+
+        try:
+            call.result = func()
+        except BaseException as e:
+            call.error = e
+            self._forget(key, call)
+            raise
+        finally:
+            call.done.set()
+        if not self.memoize:
+            self._forget(key, call)
+        return call.result, False
+
+    def _forget(self, key: Hashable, call: _Call):
+        """Drop a finished call, unless clear() already replaced it"""
+        with self._lock:
+            if self._calls.get(key) is call:
+                del self._calls[key]
+
+    def remember(self, key: Hashable, result: Any):
+        """Record a result computed elsewhere (e.g. by a batch request), if memoizing"""
+        if not self.memoize:
+            return
+        call = _Call()
+        call.result = result
+        call.done.set()
+        with self._lock:
+            self._calls.setdefault(key, call)
+
+    def __contains__(self, key: Hashable) -> bool:
+        with self._lock:
+            return key in self._calls
+
+    def clear(self):
+        """Forget remembered results (calls in flight still complete)"""
+        with self._lock:
+            self._calls.clear()
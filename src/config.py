@@ -19,6 +19,15 @@ class Config:
     # Google Sheets
     GOOGLE_SHEETS_ID = os.getenv("GOOGLE_SHEETS_ID", "")
     GOOGLE_CREDENTIALS_FILE = os.getenv("GOOGLE_CREDENTIALS_FILE", "credentials.json")
+    SHEETS_FLUSH_ROWS = int(os.getenv("SHEETS_FLUSH_ROWS", 500))  # Product rows per append request
+    SHEETS_FLUSH_SECONDS = float(os.getenv("SHEETS_FLUSH_SECONDS", 30))  # Longest a row waits to be written
+    SHEETS_QUEUE_SIZE = int(os.getenv("SHEETS_QUEUE_SIZE", 1000))  # Rows waiting for the background writer
+    # Sheets API quota per user of the project (requests per minute, reads and writes counted apart)
+    SHEETS_READS_PER_MINUTE = int(os.getenv("SHEETS_READS_PER_MINUTE", 60))
+    SHEETS_WRITES_PER_MINUTE = int(os.getenv("SHEETS_WRITES_PER_MINUTE", 60))
+    # Sheet names and header state cached in cache/sheet_metadata.json, so startup costs no requests
+    SHEETS_METADATA_CACHE_ENABLED = os.getenv("SHEETS_METADATA_CACHE_ENABLED", "true").lower() in ("1", "true", "yes")
+    SHEETS_METADATA_TTL = int(os.getenv("SHEETS_METADATA_TTL", 3600))  # Seconds sheet names are trusted without a refresh
     
     # Shopee Configuration
     SHOPEE_PRODUCT_URLS = os.getenv(
@@ -33,11 +42,73 @@ class Config:
     LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
     LOG_PATH = PROJECT_ROOT / "logs"
     
+    # State learned across runs (strategy statistics, caches)
+    CACHE_PATH = Path(os.getenv("CACHE_PATH", PROJECT_ROOT / "cache"))
+    
     # Request settings
     REQUEST_TIMEOUT = 10
     USER_AGENT = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36"
     
+    # Connection pooling
+    HTTP_POOL_CONNECTIONS = int(os.getenv("HTTP_POOL_CONNECTIONS", 10))  # Hosts kept in the pool
+    HTTP_POOL_MAXSIZE = int(os.getenv("HTTP_POOL_MAXSIZE", 20))  # Keep-alive sockets per host
+    HTTP_HOST_POOL_SIZES = os.getenv("HTTP_HOST_POOL_SIZES", "")  # e.g. "shopee.ph=50,shopee.sg=10"
+    # Adapter-level retries cannot see time budgets, so retries happen in RetryPolicy by default
+    HTTP_MAX_RETRIES = int(os.getenv("HTTP_MAX_RETRIES", 0))
+    HTTP_RETRY_BACKOFF = float(os.getenv("HTTP_RETRY_BACKOFF", 0.5))
+    
+    # Retries and time budgets
+    RETRY_ATTEMPTS = int(os.getenv("RETRY_ATTEMPTS", 3))  # Attempts per request, including the first
+    RETRY_BASE_DELAY = float(os.getenv("RETRY_BASE_DELAY", 0.5))
+    RETRY_MAX_DELAY = float(os.getenv("RETRY_MAX_DELAY", 8))
+    PRODUCT_DEADLINE = float(os.getenv("PRODUCT_DEADLINE", 60))  # Seconds per product
+    CYCLE_DEADLINE = float(os.getenv("CYCLE_DEADLINE", 0))  # Seconds per cycle (0 = 90% of the interval)
+    
+    # Rate limiting and circuit breaking (per host)
+    RATE_LIMIT_PER_SECOND = float(os.getenv("RATE_LIMIT_PER_SECOND", 2.0))
+    RATE_LIMIT_BURST = float(os.getenv("RATE_LIMIT_BURST", 5))
+    CIRCUIT_FAILURE_THRESHOLD = int(os.getenv("CIRCUIT_FAILURE_THRESHOLD", 5))  # Consecutive 403/429 responses
+    CIRCUIT_COOLDOWN = int(os.getenv("CIRCUIT_COOLDOWN", 300))  # Seconds before a half-open probe
+    MAX_RETRY_AFTER_WAIT = 30  # Longer Retry-After values open the circuit instead of waiting
+    
+    # On-disk HTTP response cache (GET requests, revalidated with ETag/Last-Modified)
+    HTTP_CACHE_ENABLED = os.getenv("HTTP_CACHE_ENABLED", "true").lower() in ("1", "true", "yes")
+    HTTP_CACHE_TTL = int(os.getenv("HTTP_CACHE_TTL", 300))  # Seconds a response is served without revalidating
+    HTTP_CACHE_MAX_MB = int(os.getenv("HTTP_CACHE_MAX_MB", 200))  # Least recently used responses are evicted beyond this
+    
+    # Product pages are streamed and reading stops once name and price are found
+    STREAM_PAGES = os.getenv("STREAM_PAGES", "true").lower() in ("1", "true", "yes")
+    STREAM_CHUNK_SIZE = 16 * 1024
+    
+    # HTML parser backend: html.parser, lxml or selectolax (falls back to html.parser if not installed)
+    HTML_PARSER = os.getenv("HTML_PARSER", "html.parser")
+    
+    # Products extracted from page/API bodies, reused when a body comes back byte-identical
+    EXTRACTION_CACHE_ENABLED = os.getenv("EXTRACTION_CACHE_ENABLED", "true").lower() in ("1", "true", "yes")
+    EXTRACTION_CACHE_SIZE = int(os.getenv("EXTRACTION_CACHE_SIZE", 20000))  # Least recently used entries are dropped beyond this
+    
+    # Item-list API batching (items per request, 0 or 1 disables)
+    API_BATCH_SIZE = int(os.getenv("API_BATCH_SIZE", 50))
+    
+    # Adaptive strategy ordering
+    STRATEGY_MIN_SAMPLES = int(os.getenv("STRATEGY_MIN_SAMPLES", 5))  # Samples before a scope's stats are trusted
+    STRATEGY_SKIP_AFTER = int(os.getenv("STRATEGY_SKIP_AFTER", 20))  # Consecutive failures before skipping
+    STRATEGY_SKIP_SECONDS = int(os.getenv("STRATEGY_SKIP_SECONDS", 6 * 3600))
+    RENDER_MIN_SUCCESS_RATE = float(os.getenv("RENDER_MIN_SUCCESS_RATE", 0.1))
+    
+    # Concurrency (1 = scrape products one at a time)
+    SCRAPE_CONCURRENCY = int(os.getenv("SCRAPE_CONCURRENCY", 1))
+    SCRAPE_PER_HOST_CONCURRENCY = int(os.getenv("SCRAPE_PER_HOST_CONCURRENCY", 8))
+    
+    # Headless browser pool (JavaScript rendering)
+    RENDER_TIMEOUT = 30
+    BROWSER_POOL_SIZE = int(os.getenv("BROWSER_POOL_SIZE", 2))  # Chromium instances
+    BROWSER_TABS_PER_BROWSER = int(os.getenv("BROWSER_TABS_PER_BROWSER", 4))
+    BROWSER_MAX_PAGES = int(os.getenv("BROWSER_MAX_PAGES", 200))  # Pages before a browser is recycled
+    BROWSER_QUEUE_SIZE = int(os.getenv("BROWSER_QUEUE_SIZE", 32))  # Render jobs allowed to wait for a tab
+    
     # Ensure directories exist
     LOG_PATH.mkdir(exist_ok=True)
+    CACHE_PATH.mkdir(parents=True, exist_ok=True)
 
 config = Config()
@@ -0,0 +1,110 @@
+"""
+Content-addressed cache of products extracted from page and API bodies
+"""
+import hashlib
+import threading
+from collections import OrderedDict
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Optional
+from config import config
+from logger import app_logger
+from state_store import load_json, save_json
+
+# Fields that depend on the request rather than the body, filled in again on a hit
+REQUEST_FIELDS = ('url', 'product_id', 'timestamp')
+
+def content_key(kind: str, product_key: str, body: bytes) -> str:
+    """
+    Build the cache key of a response body
+
+    Args:
+        kind: What the body is ("page" or "api"), extraction differs per kind
+        product_key: Product the body was fetched for
+        body: Raw response body
+
+    Returns:
+        Hex digest identifying the body
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(f"{kind}|{product_key}|".encode('utf-8'))
+    digest.update(body)
+    return digest.hexdigest()
+
+class ExtractionCache:
+    """
+    Products extracted from response bodies, keyed by a hash of the body
+
+    A body that comes back byte-identical (unchanged page, HTTP cache hit,
+    same API payload) maps straight to its product, so parsing and
+    extraction are skipped and only the timestamp is new. The least
+    recently used entries are dropped beyond the size cap.
+    """
+
+    def __init__(self, path: Optional[Path] = None, max_entries: int = None):
+        """
+        Initialize cache, loading saved entries
+
+        Args:
+            path: State file (default: cache/extraction_cache.json)
+            max_entries: Size cap (default from config)
+        """
+        self.path = path or config.CACHE_PATH / "extraction_cache.json"
+        self.max_entries = config.EXTRACTION_CACHE_SIZE if max_entries is None else max_entries
+        self._lock = threading.Lock()
+        # Oldest first, so iteration order is eviction order
+        self._entries = OrderedDict(load_json(self.path, {}).get('entries', []))
+        while len(self._entries) > max(self.max_entries, 0):
+            self._entries.popitem(last=False)
+
+    def get(self, key: str, url: str, product_id: Optional[str]) -> Optional[Dict]:
+        """
+        Get the product extracted from a body
+
+        Args:
+            key: Content key
+            url: URL the body was fetched for
+            product_id: Item ID of the product
+
+        Returns:
+            Product data with a fresh timestamp, or None if not cached
+        """
+        with self._lock:
+            product = self._entries.get(key)
+            if product is None:
+                return None
+            self._entries.move_to_end(key)
+
+        return dict(product, url=url, product_id=product_id, timestamp=datetime.now().isoformat())
+
+    def put(self, key: str, product: Dict):
+        """
+        Remember the product extracted from a body
+
+        Args:
+            key: Content key
+            product: Extracted product data
+        """
+        if self.max_entries <= 0:
+            return
+
+        entry = {name: value for name, value in product.items() if name not in REQUEST_FIELDS}
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._entries)
+
+    def save(self) -> bool:
+        """Persist entries"""
+        with self._lock:
+            data = {'entries': list(self._entries.items())}
+
+        if save_json(self.path, data):
+            app_logger.debug(f"Saved extraction cache ({len(data['entries'])} entries)")
+            return True
+        return False
@@ -0,0 +1,310 @@
+"""
+Single-pass extraction of product fields from a parsed page
+"""
+import re
+from typing import Dict, List, Optional, Tuple
+from html_parser import Document, SelectolaxNode, iter_elements
+
+# Fallback selectors per field, highest priority first
+TITLE_SELECTORS = ['[data-testid*="product"]', '[class*="product-title"]', '[class*="product-name"]']
+PRICE_SELECTORS = [
+    '[data-testid*="price"]',
+    '[class*="price"]',
+    '.product-price',
+    '.current-price',
+    '[itemprop="price"]',
+    'span[class*="price"]',
+]
+DISCOUNT_SELECTORS = ['[data-testid*="discount"]', '[class*="discount"]', '.product-discount']
+SHOP_SELECTORS = ['[data-testid*="shop"]', '[class*="shop-name"]', '[class*="seller"]', '.shop-name']
+RATING_SELECTORS = [
+    '[data-testid*="rating"]',
+    '[class*="rating"]',
+    '[class*="star"]',
+    '[itemprop="ratingValue"]',
+]
+
+# Elements the title rules look at before falling back to selectors
+LANDMARK_SELECTORS = {'og:title': 'meta[property="og:title"]', 'title': 'title', 'h1': 'h1'}
+
+FIELD_SELECTORS = {
+    'title': TITLE_SELECTORS,
+    'price': PRICE_SELECTORS,
+    'discount': DISCOUNT_SELECTORS,
+    'shop_name': SHOP_SELECTORS,
+    'rating': RATING_SELECTORS,
+}
+
+_SELECTOR = re.compile(r'^(\w+)?(?:\[([\w-]+)(\*?=)"([^"]*)"\]|\.([\w-]+))$')
+_PRICE_NUMBER = re.compile(r'[\d,]+\.?\d*')
+_INTEGER = re.compile(r'(\d+)')
+_DECIMAL = re.compile(r'(\d+\.?\d*)')
+
+def compile_selector(selector: str) -> Tuple[Optional[str], str, str, str]:
+    """
+    Compile a simple CSS selector
+
+    Supports tag[attr*="value"], tag[attr="value"] and tag.class, with
+    the tag optional.
+
+    Args:
+        selector: CSS selector
+
+    Returns:
+        (tag or None, attribute, operator, value) where operator is
+        'contains', 'equals' or 'class'
+
+    Raises:
+        ValueError: If the selector uses anything else
+    """
+    match = _SELECTOR.match(selector)
+    if not match:
+        raise ValueError(f"Unsupported selector: {selector}")
+
+    tag, attribute, operator, value, class_name = match.groups()
+    if class_name:
+        return tag, 'class', 'class', class_name
+    return tag, attribute, 'contains' if operator == '*=' else 'equals', value
+
+def exact_selector(element, selector: str) -> str:
+    """
+    Narrow a selector to the element it matched
+
+    Args:
+        element: Element the selector matched
+        selector: Selector supported by compile_selector
+
+    Returns:
+        tag[attr="full value"] for the attribute the selector tested, or
+        the selector itself if the value cannot be quoted
+    """
+    _, attribute, _, _ = compile_selector(selector)
+    value = element.get(attribute)
+    if isinstance(value, list):
+        value = ' '.join(value)
+    if not value or '"' in value:
+        return selector
+    return f'{element.name}[{attribute}="{value}"]'
+
+class FieldExtractor:
+    """
+    Extract title, price, discount, shop name and rating in one tree walk
+
+    Every element is classified against all field selectors at once; the
+    per-field priority rules (selector order, then document order) are
+    applied to the collected candidates afterwards, so results match
+    running each selector over the document in turn. Selectolax documents
+    are queried natively instead (see _collect).
+    """
+
+    def __init__(self, field_selectors: Dict[str, List[str]] = None):
+        """
+        Initialize extractor
+
+        Args:
+            field_selectors: Selectors per field in priority order (default: FIELD_SELECTORS)
+        """
+        self.field_selectors = field_selectors or FIELD_SELECTORS
+
+        # Matchers grouped by attribute, then by the text they look for, so
+        # each element is only tested on attributes it has and each text is
+        # searched for once whatever the number of selectors using it
+        self._matchers: Dict[str, Dict[str, List[Tuple[str, int, Optional[str], str]]]] = {}
+        for field, selectors in self.field_selectors.items():
+            for index, selector in enumerate(selectors):
+                tag, attribute, operator, value = compile_selector(selector)
+                needles = self._matchers.setdefault(attribute, {})
+                needles.setdefault(value, []).append((field, index, tag, operator))
+
+        # Every match needs its text somewhere in the attribute, so one
+        # search per attribute rules out almost all elements
+        self._screens = {
+            attribute: re.compile('|'.join(sorted(re.escape(needle) for needle in needles)))
+            for attribute, needles in self._matchers.items()
+        }
+
+    def _collect(self, doc: Document):
+        """Get the title landmarks and the elements matching each selector of each field"""
+        if isinstance(doc, SelectolaxNode):
+            # Lexbor runs a selector faster than Python can walk the tree, so
+            # native documents keep one query per selector, run only when the
+            # field's rules get that far
+            candidates = {
+                field: (doc.select(selector) for selector in selectors)
+                for field, selectors in self.field_selectors.items()
+            }
+            landmarks = {name: doc.select_one(selector) for name, selector in LANDMARK_SELECTORS.items()}
+            return candidates, landmarks
+
+        return self._walk(doc)
+
+    def _walk(self, doc: Document):
+        """Walk the document once, collecting candidates for every field"""
+        candidates = {
+            field: [[] for _ in selectors] for field, selectors in self.field_selectors.items()
+        }
+        landmarks = {}
+
+        for tag, attrs, element in iter_elements(doc):
+            if tag == 'meta':
+                if 'og:title' not in landmarks and attrs.get('property') == 'og:title':
+                    landmarks['og:title'] = element
+            elif tag in ('title', 'h1') and tag not in landmarks:
+                landmarks[tag] = element
+
+            for attribute, value in attrs.items():
+                screen = self._screens.get(attribute)
+                if screen is None or not value or not screen.search(value):
+                    continue
+
+                for needle, matchers in self._matchers[attribute].items():
+                    if needle not in value:
+                        continue
+                    for field, index, matcher_tag, operator in matchers:
+                        if matcher_tag and matcher_tag != tag:
+                            continue
+                        if operator == 'equals' and value != needle:
+                            continue
+                        if operator == 'class' and needle not in value.split():
+                            continue
+                        candidates[field][index].append(element)
+
+        return candidates, landmarks
+
+    def extract(self, doc: Document) -> Dict:
+        """
+        Extract product fields
+
+        Args:
+            doc: Parsed page
+
+        Returns:
+            Dictionary with title, price, discount, shop_name and rating
+            (None where not found; shop_name defaults to "Shopee")
+        """
+        return self.extract_with_sources(doc)[0]
+
+    def extract_with_sources(self, doc: Document) -> Tuple[Dict, Dict[str, str]]:
+        """
+        Extract product fields and tell where each was found
+
+        Args:
+            doc: Parsed page
+
+        Returns:
+            (fields as returned by extract, sources) where sources maps each
+            field found to the exact selector of the element it came from,
+            or to the landmark ("og:title", "title", "h1") the title came from
+        """
+        candidates, landmarks = self._collect(doc)
+        texts = {}
+
+        def text_of(element) -> str:
+            # The element is kept with its text so its id cannot be reused
+            key = id(element)
+            if key not in texts:
+                texts[key] = (element, element.get_text(strip=True))
+            return texts[key][1]
+
+        found = {
+            'title': self._title(landmarks, candidates['title'], text_of),
+            'price': self._price(candidates['price'], text_of),
+            'discount': self._discount(candidates['discount'], text_of),
+            'shop_name': self._shop_name(candidates['shop_name'], text_of),
+            'rating': self._rating(candidates['rating'], text_of),
+        }
+
+        fields = {field: value for field, (value, _) in found.items()}
+        if fields['shop_name'] is None:
+            fields['shop_name'] = "Shopee"
+
+        sources = {}
+        for field, (value, source) in found.items():
+            if isinstance(source, str):
+                sources[field] = source
+            elif source is not None:
+                index, element = source
+                sources[field] = exact_selector(element, self.field_selectors[field][index])
+        return fields, sources
+
+    # Each rule returns (value, source) where source is a landmark name or
+    # (selector index, element), and (None, None) if nothing matched
+
+    def _title(self, landmarks, candidates, text_of):
+        """Meta og:title, then <title>, then <h1>, then title selectors"""
+        og_title = landmarks.get('og:title')
+        if og_title and og_title.get('content'):
+            title = og_title['content'].strip()
+            if title:
+                return title, 'og:title'
+
+        title_tag = landmarks.get('title')
+        if title_tag and title_tag.string:
+            title = title_tag.string.strip()
+            if '|' in title:
+                title = title.split('|')[0].strip()
+            if title:
+                return title, 'title'
+
+        h1 = landmarks.get('h1')
+        if h1:
+            text = text_of(h1)
+            if text:
+                return text, 'h1'
+
+        for index, elements in enumerate(candidates):
+            for element in elements:
+                text = text_of(element)
+                if text and len(text) > 5:
+                    return text, (index, element)
+        return None, None
+
+    def _price(self, candidates, text_of):
+        """First plausible number in the highest-priority price element"""
+        for index, elements in enumerate(candidates):
+            for element in elements:
+                text = text_of(element)
+                if not text:
+                    continue
+
+                for num_str in _PRICE_NUMBER.findall(text):
+                    try:
+                        price = float(num_str.replace(',', ''))
+                        if 10 < price < 1000000:  # Sanity check
+                            return price, (index, element)
+                    except ValueError:
+                        pass
+        return None, None
+
+    def _discount(self, candidates, text_of):
+        """First number in the highest-priority discount element"""
+        for index, elements in enumerate(candidates):
+            for element in elements:
+                numbers = _INTEGER.findall(text_of(element))
+                if numbers:
+                    return float(numbers[0]), (index, element)
+        return None, None
+
+    def _shop_name(self, candidates, text_of):
+        """Text of the first element of the highest-priority shop selector"""
+        for index, elements in enumerate(candidates):
+            for element in elements:
+                text = text_of(element)
+                if text:
+                    return text, (index, element)
+                break
+        return None, None
+
+    def _rating(self, candidates, text_of):
+        """First number between 0 and 5 in the rating elements"""
+        for index, elements in enumerate(candidates):
+            for element in elements:
+                numbers = _DECIMAL.findall(text_of(element))
+                if numbers:
+                    try:
+                        rating = float(numbers[0])
+                        if 0 <= rating <= 5:
+                            return rating, (index, element)
+                    except ValueError:
+                        pass
+        return None, None
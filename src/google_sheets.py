@@ -1,33 +1,133 @@
 """
 Google Sheets integration for price tracking
 """
-from typing import List, Dict, Optional
+from contextlib import contextmanager
+from typing import Callable, Iterator, List, Dict, Optional, Set, Tuple
 from google.auth.transport.requests import Request
 from google.oauth2.service_account import Credentials
 from google.oauth2 import service_account
 from google_auth_oauthlib.flow import InstalledAppFlow
 from googleapiclient import discovery
+from googleapiclient.errors import HttpError
 from config import config
 from logger import app_logger
+from rate_limiter import parse_retry_after
+from retry import RetryPolicy
+from sheet_metadata import SHEET_FIELDS, SheetMetadataCache, last_row
+from sheets_quota import READ, WRITE, SheetsQuota, get_shared_quota
 import os
+import threading
+import time
 from pathlib import Path
 
 SCOPES = ['https://www.googleapis.com/auth/spreadsheets']
 
+# Sheets responses worth retrying: quota exceeded and transient server errors
+SHEETS_RETRY_STATUS_CODES = (429, 500, 502, 503, 504)
+
+PRICE_HEADERS = ['Product Name', 'Product ID', 'Price', 'Original Price', 'Savings Amount',
+                 'Discount (%)', 'Shop Name', 'Rating', 'Category', 'Stock Status',
+                 'Reviews Count', 'Notes', 'URL', 'Timestamp']
+
+SUMMARY_HEADERS = ['Product Name', 'Latest Price', 'Previous Price', 'Change', 'Change %']
+
+def is_missing_sheet(error: HttpError) -> bool:
+    """True if Sheets rejected a request because the range names no existing sheet"""
+    return error.resp.status == 400 and 'Unable to parse range' in str(error)
+
+def is_invalid_rows(error: HttpError) -> bool:
+    """True if Sheets rejected a request for its values (a 400 not caused by a missing sheet)"""
+    return error.resp.status == 400 and not is_missing_sheet(error)
+
+def is_refused(error: Exception) -> bool:
+    """
+    True if Sheets refused a request without applying it (a 4xx response)
+
+    A 5xx response, timeout or dropped connection may come after the
+    request was applied, so an append that failed that way may have
+    written its rows.
+    """
+    return isinstance(error, HttpError) and 400 <= error.resp.status < 500
+
+def row_key(product_data: Dict) -> Optional[Tuple[str, str]]:
+    """
+    Identify a product row by its URL and scrape timestamp (columns M:N)
+
+    Returns:
+        (url, timestamp), or None if the row has no timestamp to tell it apart
+    """
+    timestamp = product_data.get('timestamp')
+    if not timestamp:
+        return None
+    return str(product_data.get('url', '')), str(timestamp)
+
+def savings_amount(product_data: Dict):
+    """
+    Savings Amount column value: original price minus price
+
+    Computed when the row is built, so no formula has to be written per row.
+
+    Returns:
+        The product's own savings_amount if set, the computed amount if
+        both prices are numbers, else ''
+    """
+    savings = product_data.get('savings_amount')
+    if savings is not None and savings != '':
+        return savings
+    try:
+        return round(float(product_data['original_price']) - float(product_data['price']), 2)
+    except (KeyError, TypeError, ValueError):
+        return ''
+
+def product_row(product_data: Dict) -> List:
+    """Values of a product's row in the price sheet (columns A:N)"""
+    return [
+        product_data.get('name', ''),
+        product_data.get('product_id', ''),
+        product_data.get('price', ''),
+        product_data.get('original_price', ''),
+        savings_amount(product_data),
+        product_data.get('discount', ''),
+        product_data.get('shop_name', ''),
+        product_data.get('rating', ''),
+        product_data.get('category', ''),
+        product_data.get('stock_status', ''),
+        product_data.get('reviews_count', ''),
+        '',  # Notes column (for manual entry)
+        product_data.get('url', ''),
+        product_data.get('timestamp', '')
+    ]
+
 class GoogleSheetsManager:
     """Manage Google Sheets for price tracking"""
     
-    def __init__(self, spreadsheet_id: str = None, credentials_file: str = None):
+    def __init__(self, spreadsheet_id: str = None, credentials_file: str = None,
+                 quota: Optional[SheetsQuota] = None, retry_policy: Optional[RetryPolicy] = None,
+                 metadata: Optional[SheetMetadataCache] = None):
         """
         Initialize Google Sheets manager
         
         Args:
             spreadsheet_id: Google Sheets ID
             credentials_file: Path to credentials JSON file
+            quota: Request quota to schedule calls against (default: shared by the process)
+            retry_policy: Backoff between attempts after a 429 or 5xx (default from config)
+            metadata: Cache of sheet names and header state (default: cache/sheet_metadata.json,
+                if enabled)
         """
         self.spreadsheet_id = spreadsheet_id or config.GOOGLE_SHEETS_ID
         self.credentials_file = credentials_file or config.GOOGLE_CREDENTIALS_FILE
         self.service = None
+        self.quota = quota if quota is not None else get_shared_quota()
+        self.retry_policy = retry_policy or RetryPolicy()
+        if metadata is None and config.SHEETS_METADATA_CACHE_ENABLED:
+            metadata = SheetMetadataCache()
+        self.metadata = metadata
+        self.rows_appended = 0
+        # Value updates waiting for one values().batchUpdate, by (input option, range)
+        self._updates: Dict[tuple, List[List]] = {}
+        self._deferred = 0
+        self._updates_lock = threading.Lock()
         
         if not self.spreadsheet_id:
             raise ValueError("GOOGLE_SHEETS_ID not configured")
@@ -66,14 +166,63 @@ class GoogleSheetsManager:
             app_logger.error(f"Authentication error: {e}")
             raise
     
+    def _execute(self, request, kind: str = WRITE, idempotent: bool = True) -> Dict:
+        """
+        Execute an API request within the quota, retrying 429 and 5xx responses
+        
+        Args:
+            request: Request built from self.service
+            kind: READ or WRITE quota
+            idempotent: False for requests that must not be sent twice (appends):
+                only a 429 is retried, since Sheets refused it unprocessed,
+                while a 5xx may have been applied
+            
+        Returns:
+            API response
+            
+        Raises:
+            HttpError: If the request fails for good
+        """
+        attempt = 0
+        while True:
+            self.quota.acquire(kind)
+            try:
+                return request.execute()
+            except HttpError as e:
+                status = e.resp.status
+                attempt += 1
+                retryable = status == 429 or (idempotent and status in SHEETS_RETRY_STATUS_CODES)
+                if not retryable or attempt >= self.retry_policy.attempts:
+                    raise
+                
+                delay = self.retry_policy.backoff(attempt)
+                if status == 429:
+                    retry_after = parse_retry_after(e.resp.get('retry-after'))
+                    if retry_after is not None:
+                        delay = min(retry_after, config.MAX_RETRY_AFTER_WAIT)
+                    # Other callers sharing the quota hold off too
+                    self.quota.pause(kind, delay)
+                app_logger.warning(f"Sheets {kind} request failed with HTTP {status}, retrying in {delay:.1f}s")
+                time.sleep(delay)
+    
     def _get_sheet_names(self) -> List[str]:
-        """Get all sheet names in the spreadsheet"""
+        """Get all sheet names in the spreadsheet (cached for SHEETS_METADATA_TTL)"""
+        if self.metadata is not None:
+            sheets = self.metadata.sheets(self.spreadsheet_id)
+            if sheets is not None:
+                return list(sheets)
+        
         try:
-            spreadsheet = self.service.spreadsheets().get(
-                spreadsheetId=self.spreadsheet_id
-            ).execute()
-            
-            return [sheet['properties']['title'] for sheet in spreadsheet['sheets']]
+            spreadsheet = self._execute(self.service.spreadsheets().get(
+                spreadsheetId=self.spreadsheet_id,
+                fields=SHEET_FIELDS
+            ), READ)
+            
+            properties = [sheet['properties'] for sheet in spreadsheet['sheets']]
+            if self.metadata is not None:
+                self.metadata.store(self.spreadsheet_id, properties)
+                self.metadata.save()
+            return [props['title'] for props in properties]
         except Exception as e:
             app_logger.error(f"Error getting sheet names: {e}")
             return []
@@ -101,11 +250,14 @@ class GoogleSheetsManager:
                 ]
             }
             
-            self.service.spreadsheets().batchUpdate(
+            response = self._execute(self.service.spreadsheets().batchUpdate(
                 spreadsheetId=self.spreadsheet_id,
                 body=request_body
-            ).execute()
+            ))
             
+            if self.metadata is not None:
+                self.metadata.add_sheet(self.spreadsheet_id, response['replies'][0]['addSheet']['properties'])
+                self.metadata.save()
             app_logger.info(f"Sheet created: {sheet_name}")
             return True
         except Exception as e:
@@ -123,34 +275,50 @@ class GoogleSheetsManager:
             True if successful
         """
         try:
-            sheet_names = self._get_sheet_names()
-            
-            # Create sheet if it doesn't exist
-            if sheet_name not in sheet_names:
-                self._create_sheet(sheet_name)
-            
-            # Write headers (expanded columns)
-            headers = [
-                ['Product Name', 'Product ID', 'Price', 'Original Price', 'Savings Amount',
-                 'Discount (%)', 'Shop Name', 'Rating', 'Category', 'Stock Status', 
-                 'Reviews Count', 'Notes', 'URL', 'Timestamp']
-            ]
-            
-            range_name = f"'{sheet_name}'!A1:N1"
-            
-            self.service.spreadsheets().values().update(
-                spreadsheetId=self.spreadsheet_id,
-                range=range_name,
-                valueInputOption='RAW',
-                body={'values': headers}
-            ).execute()
-            
-            app_logger.info(f"Sheet initialized: {sheet_name}")
+            # Write headers (expanded columns), with any other queued updates
+            with self.batch_updates():
+                written = self._ensure_sheet(sheet_name, PRICE_HEADERS, f"'{sheet_name}'!A1:N1")
+            if written:
+                app_logger.info(f"Sheet initialized: {sheet_name}")
             return True
         except Exception as e:
             app_logger.error(f"Error initializing sheet: {e}")
             return False
     
+    def _ensure_sheet(self, sheet_name: str, headers: List[str], range_name: str) -> bool:
+        """
+        Create a sheet if it doesn't exist and write its header row
+        
+        Both steps are skipped while the metadata cache knows the sheet and
+        its headers, so an initialized sheet costs no request.
+        
+        The header state is recorded only once the header update has been
+        sent (at the end of the enclosing batch_updates block).
+        
+        Returns:
+            True if anything was written or queued, False if the sheet was up to date
+            
+        Raises:
+            HttpError: If the headers cannot be written
+        """
+        sheet_names = self._get_sheet_names()
+        
+        # Create sheet if it doesn't exist
+        if sheet_name not in sheet_names:
+            self._create_sheet(sheet_name)
+        elif self.metadata is not None and self.metadata.headers(self.spreadsheet_id, sheet_name) == headers:
+            app_logger.debug(f"Sheet already initialized: {sheet_name}")
+            return False
+        
+        self.update_values(range_name, [headers], on_written=lambda: self._headers_written(sheet_name, headers))
+        return True
+    
+    def _headers_written(self, sheet_name: str, headers: List[str]):
+        """Remember a sheet's header row once it has been written"""
+        if self.metadata is not None:
+            self.metadata.set_headers(self.spreadsheet_id, sheet_name, headers)
+            self.metadata.save()
+    
     def append_price_data(self, product_data: Dict, sheet_name: str = "Price Tracker") -> bool:
         """
         Append price data to sheet
@@ -163,42 +331,170 @@ class GoogleSheetsManager:
             True if successful
         """
         try:
-            values = [[
-                product_data.get('name', ''),
-                product_data.get('product_id', ''),
-                product_data.get('price', ''),
-                product_data.get('original_price', ''),
-                product_data.get('savings_amount', ''),
-                product_data.get('discount', ''),
-                product_data.get('shop_name', ''),
-                product_data.get('rating', ''),
-                product_data.get('category', ''),
-                product_data.get('stock_status', ''),
-                product_data.get('reviews_count', ''),
-                '',  # Notes column (for manual entry)
-                product_data.get('url', ''),
-                product_data.get('timestamp', '')
-            ]]
-            
-            range_name = f"'{sheet_name}'!A:N"
-            
-            self.service.spreadsheets().values().append(
-                spreadsheetId=self.spreadsheet_id,
-                range=range_name,
-                valueInputOption='RAW',
-                body={'values': values}
-            ).execute()
-            
+            self.append_rows([product_row(product_data)], sheet_name)
             app_logger.info(f"Data appended: {product_data.get('name')}")
             return True
         except Exception as e:
             app_logger.error(f"Error appending data: {e}")
             return False
     
+    def append_rows(self, values: List[List], sheet_name: str = "Price Tracker") -> Dict:
+        """
+        Append rows to a sheet in one request
+        
+        A sheet deleted or renamed since it was initialized is created
+        again (with its headers) and the append retried once.
+        
+        Args:
+            values: Row values
+            sheet_name: Sheet name
+            
+        Returns:
+            API response
+            
+        Raises:
+            HttpError: If Sheets rejects the request
+        """
+        try:
+            result = self._append_values(values, sheet_name)
+        except HttpError as e:
+            if not is_missing_sheet(e):
+                raise
+            app_logger.warning(f"Sheet '{sheet_name}' no longer exists, creating it again")
+            if self.metadata is not None:
+                # The cached sheet names are what let initialize_sheet skip its checks
+                self.metadata.invalidate(self.spreadsheet_id)
+            if not self.initialize_sheet(sheet_name):
+                raise
+            result = self._append_values(values, sheet_name)
+        
+        self.rows_appended += len(values)
+        row = last_row(result.get('updates', {}).get('updatedRange'))
+        if self.metadata is not None and row:
+            self.metadata.set_last_row(self.spreadsheet_id, sheet_name, row)
+        return result
+    
+    def _append_values(self, values: List[List], sheet_name: str) -> Dict:
+        """Send one values().append request"""
+        range_name = f"'{sheet_name}'!A:N"
+        
+        return self._execute(self.service.spreadsheets().values().append(
+            spreadsheetId=self.spreadsheet_id,
+            range=range_name,
+            valueInputOption='RAW',
+            body={'values': values}
+        ), idempotent=False)
+    
+    def row_keys(self, sheet_name: str = "Price Tracker") -> Set[Tuple[str, str]]:
+        """
+        Get the (url, timestamp) of every row in a sheet
+        
+        Reads only the URL and Timestamp columns; used to find out whether
+        an append whose response was lost reached the sheet.
+        
+        Returns:
+            Row keys, as built by row_key()
+            
+        Raises:
+            HttpError: If the sheet cannot be read
+        """
+        result = self._execute(self.service.spreadsheets().values().get(
+            spreadsheetId=self.spreadsheet_id,
+            range=f"'{sheet_name}'!M:N"
+        ), READ)
+        return {(row[0], row[1]) for row in result.get('values', []) if len(row) >= 2}
+    
+    def update_values(self, range_name: str, values: List[List], value_input_option: str = 'RAW',
+                      on_written: Optional[Callable[[], None]] = None) -> int:
+        """
+        Write values to a range
+        
+        Inside batch_updates() the update is queued and sent with the others
+        when the block ends; otherwise it is sent now.
+        
+        Args:
+            range_name: A1 range
+            values: Rows of values
+            value_input_option: RAW, or USER_ENTERED to have formulas evaluated
+            on_written: Called once the update has been sent successfully
+            
+        Returns:
+            Number of ranges written (0 if queued)
+            
+        Raises:
+            HttpError: If Sheets rejects the update
+        """
+        with self._updates_lock:
+            # A later update of the same range replaces the queued one
+            self._updates[(value_input_option, range_name)] = (values, on_written)
+            if self._deferred:
+                return 0
+        return self.flush_updates()
+    
+    @contextmanager
+    def batch_updates(self) -> Iterator['GoogleSheetsManager']:
+        """
+        Queue the value updates made inside the block and send them together
+        
+        The updates go out in one values().batchUpdate per value input
+        option when the outermost block ends, so each costs no request of
+        its own against the write quota.
+        """
+        with self._updates_lock:
+            self._deferred += 1
+        try:
+            yield self
+        finally:
+            with self._updates_lock:
+                self._deferred -= 1
+                flush = not self._deferred
+        # Not reached if the block raised: its updates go out with the next flush
+        if flush:
+            self.flush_updates()
+    
+    def flush_updates(self) -> int:
+        """
+        Send queued value updates
+        
+        Returns:
+            Number of ranges written
+            
+        Raises:
+            HttpError: If Sheets rejects the updates
+        """
+        with self._updates_lock:
+            updates, self._updates = self._updates, {}
+        
+        by_option: Dict[str, List[tuple]] = {}
+        for (value_input_option, range_name), (values, on_written) in updates.items():
+            by_option.setdefault(value_input_option, []).append((range_name, values, on_written))
+        
+        for value_input_option, queued in by_option.items():
+            self._execute(self.service.spreadsheets().values().batchUpdate(
+                spreadsheetId=self.spreadsheet_id,
+                body={
+                    'valueInputOption': value_input_option,
+                    'data': [{'range': range_name, 'values': values} for range_name, values, _ in queued],
+                }
+            ))
+            for _, _, on_written in queued:
+                if on_written is not None:
+                    on_written()
+        return len(updates)
+    
+    def save_state(self):
+        """Persist the cached sheet metadata (row counts change with every append)"""
+        if self.metadata is not None:
+            self.metadata.save()
+    
+    def log_quota_stats(self):
+        """Log how much of the Sheets API quota has been used"""
+        self.quota.log_report(self.rows_appended)
+    
     def append_multiple(self, products_data: List[Dict], 
                        sheet_name: str = "Price Tracker") -> int:
         """
-        Append multiple product records
+        Append multiple product records with one request
         
         Args:
             products_data: List of product dictionaries
@@ -207,11 +503,27 @@ class GoogleSheetsManager:
         Returns:
             Number of records appended
         """
-        count = 0
-        for product in products_data:
-            if self.append_price_data(product, sheet_name):
-                count += 1
-        return count
+        rows = self.row_buffer(sheet_name, max_rows=max(len(products_data), 1))
+        written = sum(rows.add(product) for product in products_data)
+        return written + rows.flush()
+    
+    def row_buffer(self, sheet_name: str = "Price Tracker", max_rows: int = None,
+                   max_seconds: float = None,
+                   on_result: Optional[Callable[[Dict, Optional[str]], None]] = None) -> 'SheetRowBuffer':
+        """
+        Get a buffered writer that appends product rows in bulk
+        
+        Args:
+            sheet_name: Sheet name
+            max_rows: Rows buffered before a flush (default from config)
+            max_seconds: Longest a row waits before a flush (default from config)
+            on_result: Called with (product data, None) for each row written,
+                or (product data, error message) for each row that failed
+            
+        Returns:
+            Row buffer (flush it when done)
+        """
+        return SheetRowBuffer(self, sheet_name, max_rows, max_seconds, on_result)
     
     def get_latest_prices(self, sheet_name: str = "Price Tracker") -> List[Dict]:
         """
@@ -226,10 +538,10 @@ class GoogleSheetsManager:
         try:
             range_name = f"'{sheet_name}'!A:N"
             
-            result = self.service.spreadsheets().values().get(
+            result = self._execute(self.service.spreadsheets().values().get(
                 spreadsheetId=self.spreadsheet_id,
                 range=range_name
-            ).execute()
+            ), READ)
             
             rows = result.get('values', [])
             
@@ -263,25 +575,10 @@ class GoogleSheetsManager:
             True if successful
         """
         try:
-            sheet_names = self._get_sheet_names()
-            
-            if sheet_name not in sheet_names:
-                self._create_sheet(sheet_name)
-            
-            headers = [
-                ['Product Name', 'Latest Price', 'Previous Price', 'Change', 'Change %']
-            ]
-            
-            range_name = f"'{sheet_name}'!A1:E1"
-            
-            self.service.spreadsheets().values().update(
-                spreadsheetId=self.spreadsheet_id,
-                range=range_name,
-                valueInputOption='RAW',
-                body={'values': headers}
-            ).execute()
-            
-            app_logger.info(f"Summary sheet created: {sheet_name}")
+            with self.batch_updates():
+                written = self._ensure_sheet(sheet_name, SUMMARY_HEADERS, f"'{sheet_name}'!A1:E1")
+            if written:
+                app_logger.info(f"Summary sheet created: {sheet_name}")
             return True
         except Exception as e:
             app_logger.error(f"Error creating summary sheet: {e}")
@@ -291,6 +588,9 @@ class GoogleSheetsManager:
         """
         Apply formulas to calculated columns in a row
         
+        Tracking does not need this: rows are written with the savings
+        amount already computed (see savings_amount).
+        
         Args:
             sheet_name: Name of the sheet
             row_num: Row number to apply formulas to (default: 2 for first data row)
@@ -306,15 +606,121 @@ class GoogleSheetsManager:
             # Update the Savings Amount cell with formula
             range_name = f"'{sheet_name}'!E{row_num}"
             
-            self.service.spreadsheets().values().update(
-                spreadsheetId=self.spreadsheet_id,
-                range=range_name,
-                valueInputOption='USER_ENTERED',  # USER_ENTERED allows formulas
-                body={'values': [[savings_formula]]}
-            ).execute()
+            # USER_ENTERED allows formulas
+            self.update_values(range_name, [[savings_formula]], value_input_option='USER_ENTERED')
             
             app_logger.debug(f"Applied formula to row {row_num}: {savings_formula}")
             return True
         except Exception as e:
             app_logger.error(f"Error applying formulas: {e}")
             return False
+
+class SheetRowBuffer:
+    """
+    Product rows waiting to be appended to one sheet
+    
+    Rows accumulate until max_rows are buffered or the oldest has waited
+    max_seconds, then go out in a single values().append call. A batch
+    that Sheets rejects as invalid (HTTP 400) is split in halves until the
+    offending rows are isolated, so one bad row does not fail the rest;
+    any other error (including a sheet that cannot be re-created) fails
+    every row of the batch. Each row's outcome is
+    reported through on_result.
+    """
+    
+    def __init__(self, manager: GoogleSheetsManager, sheet_name: str = "Price Tracker",
+                 max_rows: int = None, max_seconds: float = None,
+                 on_result: Optional[Callable[[Dict, Optional[str]], None]] = None):
+        """
+        Initialize buffer
+        
+        Args:
+            manager: Sheets manager used to append
+            sheet_name: Sheet name
+            max_rows: Rows buffered before a flush (default from config)
+            max_seconds: Longest a row waits before a flush (default from config)
+            on_result: Called with (product data, error message or None) per row
+        """
+        self.manager = manager
+        self.sheet_name = sheet_name
+        self.max_rows = max(1, max_rows or config.SHEETS_FLUSH_ROWS)
+        self.max_seconds = config.SHEETS_FLUSH_SECONDS if max_seconds is None else max_seconds
+        self.on_result = on_result
+        self.requests = 0
+        self._rows: List[Dict] = []
+        self._oldest = None
+        # Held through a flush, so rows reach the sheet in the order they were added
+        self._lock = threading.RLock()
+    
+    def add(self, product_data: Dict) -> int:
+        """
+        Buffer a product's row, flushing if a threshold is reached
+        
+        Returns:
+            Number of rows written by the flush, 0 if none happened
+        """
+        with self._lock:
+            if not self._rows:
+                self._oldest = time.monotonic()
+            self._rows.append(product_data)
+            if len(self._rows) >= self.max_rows or time.monotonic() - self._oldest >= self.max_seconds:
+                return self.flush()
+            return 0
+    
+    def flush(self) -> int:
+        """
+        Append all buffered rows
+        
+        Returns:
+            Number of rows written
+        """
+        with self._lock:
+            rows, self._rows = self._rows, []
+            if not rows:
+                return 0
+            
+            written = self._append(rows)
+            app_logger.info(
+                f"Appended {written}/{len(rows)} rows to '{self.sheet_name}' "
+                f"({self.requests} requests so far)"
+            )
+            return written
+    
+    def _append(self, rows: List[Dict]) -> int:
+        """Append rows in one request, isolating invalid rows by halving rejected batches"""
+        try:
+            values = [product_row(product_data) for product_data in rows]
+            self.requests += 1
+            self.manager.append_rows(values, self.sheet_name)
+        except HttpError as e:
+            # A missing sheet was already re-created once by append_rows, splitting cannot help
+            if is_invalid_rows(e) and len(rows) > 1:
+                middle = len(rows) // 2
+                return self._append(rows[:middle]) + self._append(rows[middle:])
+            self._report(rows, f"Sheets rejected the rows: {e}")
+            return 0
+        except Exception as e:
+            self._report(rows, f"Error appending rows: {e}")
+            return 0
+        
+        self._report(rows, None)
+        return len(rows)
+    
+    def _report(self, rows: List[Dict], error: Optional[str]):
+        """Report the outcome of rows"""
+        if error:
+            app_logger.error(f"{error} ({len(rows)} rows)")
+        if self.on_result is None:
+            return
+        for product_data in rows:
+            self.on_result(product_data, error)
+    
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._rows)
+    
+    def __enter__(self) -> 'SheetRowBuffer':
+        return self
+    
+    def __exit__(self, exc_type, exc, tb):
+        self.flush()
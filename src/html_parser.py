@@ -0,0 +1,178 @@
+"""
+Pluggable HTML parser backends behind a BeautifulSoup-style interface
+"""
+from typing import Dict, Iterator, List, Optional, Tuple, Union
+from bs4 import BeautifulSoup
+from config import config
+from logger import app_logger
+
+try:
+    import lxml  # noqa: F401 (BeautifulSoup loads it by name)
+    HAS_LXML = True
+except ImportError:
+    HAS_LXML = False
+
+try:
+    from selectolax.lexbor import LexborHTMLParser
+    HAS_SELECTOLAX = True
+except ImportError:
+    HAS_SELECTOLAX = False
+
+PARSER_BACKENDS = ('html.parser', 'lxml', 'selectolax')
+DEFAULT_BACKEND = 'html.parser'
+
+# Elements whose contents BeautifulSoup does not count as text
+NON_TEXT_TAGS = ('script', 'style', 'template')
+
+def available_backends() -> List[str]:
+    """Get the parser backends that can be used in this environment"""
+    installed = {'html.parser': True, 'lxml': HAS_LXML, 'selectolax': HAS_SELECTOLAX}
+    return [backend for backend in PARSER_BACKENDS if installed[backend]]
+
+def resolve_backend(backend: Optional[str] = None) -> str:
+    """
+    Validate a parser backend, falling back to html.parser
+
+    Args:
+        backend: Backend name (default from config)
+
+    Returns:
+        A backend that is installed
+    """
+    backend = (backend or config.HTML_PARSER).strip().lower()
+    if backend in available_backends():
+        return backend
+
+    if backend in PARSER_BACKENDS:
+        app_logger.warning(f"HTML parser '{backend}' is not installed, using {DEFAULT_BACKEND}")
+    else:
+        app_logger.warning(
+            f"Unknown HTML parser '{backend}' (choose from {', '.join(PARSER_BACKENDS)}), "
+            f"using {DEFAULT_BACKEND}"
+        )
+    return DEFAULT_BACKEND
+
+class SelectolaxNode:
+    """
+    A selectolax node with the subset of the BeautifulSoup Tag API the
+    scraper uses (find, select, select_one, get, get_text, string)
+
+    Text follows BeautifulSoup's rules, so extraction gives the same
+    results whichever backend parsed the page.
+    """
+
+    __slots__ = ('node',)
+
+    def __init__(self, node):
+        self.node = node
+
+    @property
+    def name(self) -> str:
+        """Tag name"""
+        return self.node.tag
+
+    @property
+    def attrs(self) -> Dict[str, Optional[str]]:
+        """Tag attributes"""
+        return self.node.attributes
+
+    def get(self, name: str, default=None):
+        """Get an attribute value (empty string for valueless attributes)"""
+        attributes = self.node.attributes
+        if name not in attributes:
+            return default
+        return attributes[name] or ''
+
+    def __getitem__(self, name: str) -> str:
+        return self.node.attributes[name] or ''
+
+    def find(self, name: str, attrs: Optional[Dict[str, str]] = None) -> Optional['SelectolaxNode']:
+        """Get the first descendant with a tag name and exact attribute values"""
+        selector = name + ''.join(
+            f'[{key}="{value}"]' for key, value in (attrs or {}).items()
+        )
+        return self.select_one(selector)
+
+    def select(self, selector: str) -> List['SelectolaxNode']:
+        """Get descendants matching a CSS selector, in document order"""
+        return [SelectolaxNode(node) for node in self.node.css(selector)]
+
+    def select_one(self, selector: str) -> Optional['SelectolaxNode']:
+        """Get the first descendant matching a CSS selector"""
+        node = self.node.css_first(selector)
+        return SelectolaxNode(node) if node is not None else None
+
+    def _strings(self, node) -> Iterator[str]:
+        """Text nodes under a node, skipping comments and script/style contents"""
+        for child in node.iter(include_text=True):
+            if child.tag == '-text':
+                yield child.text(deep=False)
+            elif child.tag not in NON_TEXT_TAGS and not child.tag.startswith('-'):
+                yield from self._strings(child)
+
+    def get_text(self, separator: str = '', strip: bool = False) -> str:
+        """Get the text of the node and its descendants"""
+        strings = self._strings(self.node)
+        if strip:
+            strings = (text.strip() for text in strings)
+            strings = (text for text in strings if text)
+        return separator.join(strings)
+
+    @property
+    def string(self) -> Optional[str]:
+        """The node's only string, like BeautifulSoup's Tag.string"""
+        children = list(self.node.iter(include_text=True))
+        if len(children) != 1:
+            return None
+        if children[0].tag == '-text':
+            return children[0].text(deep=False)
+        if children[0].tag.startswith('-'):
+            return None
+        return SelectolaxNode(children[0]).string
+
+Document = Union[BeautifulSoup, SelectolaxNode]
+
+def parse_html(markup: Union[str, bytes], backend: Optional[str] = None) -> Document:
+    """
+    Parse an HTML document
+
+    Args:
+        markup: HTML text, or UTF-8 bytes (handed to the parser as they are)
+        backend: 'html.parser', 'lxml' or 'selectolax' (default from config)
+
+    Returns:
+        Document offering find/select/select_one/get_text
+    """
+    backend = backend or config.HTML_PARSER
+    if backend == 'selectolax' and HAS_SELECTOLAX:
+        return SelectolaxNode(LexborHTMLParser(markup).root)
+
+    # Naming the encoding keeps BeautifulSoup from guessing it
+    encoding = 'utf-8' if isinstance(markup, bytes) else None
+    if backend == 'lxml' and HAS_LXML:
+        return BeautifulSoup(markup, 'lxml', from_encoding=encoding)
+    return BeautifulSoup(markup, 'html.parser', from_encoding=encoding)
+
+def iter_elements(doc: Document) -> Iterator[Tuple[str, Dict[str, str], Document]]:
+    """
+    Walk every element of a document once, in document order
+
+    Args:
+        doc: Parsed document
+
+    Yields:
+        (tag name, attributes, element) with multi-valued attributes such
+        as class joined by spaces, as CSS attribute selectors see them
+    """
+    if isinstance(doc, SelectolaxNode):
+        for node in doc.node.traverse(include_text=False):
+            if not node.tag.startswith('-'):
+                yield node.tag, node.attributes, SelectolaxNode(node)
+        return
+
+    for element in doc.find_all(True):
+        attrs = {
+            key: ' '.join(value) if isinstance(value, list) else value
+            for key, value in element.attrs.items()
+        }
+        yield element.name, attrs, element
@@ -0,0 +1,256 @@
+"""
+On-disk HTTP response cache with ETag/Last-Modified revalidation
+"""
+import hashlib
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Optional
+from urllib.parse import urlencode
+import requests
+from config import config
+from logger import app_logger
+from state_store import load_json, save_bytes, save_json
+
+# Response headers kept with a cached body
+STORED_HEADERS = ('Content-Type', 'ETag', 'Last-Modified')
+
+_shared_cache = None
+_shared_lock = threading.Lock()
+
+def cache_key(url: str, params: Optional[Dict] = None) -> str:
+    """
+    Build the cache key of a GET request
+
+    Args:
+        url: Request URL
+        params: Query parameters passed separately from the URL
+
+    Returns:
+        Hex digest identifying the request
+    """
+    if params:
+        url = f"{url}?{urlencode(sorted(params.items()))}"
+    return hashlib.sha256(url.encode('utf-8')).hexdigest()
+
+class HttpCache:
+    """
+    Cache of successful GET responses stored on disk
+
+    Bodies live in one file per response; metadata (validators, size, age,
+    last use) lives in an index saved with save(). Fresh entries are
+    served without a request, stale ones are revalidated with
+    If-None-Match / If-Modified-Since. The least recently used entries are
+    evicted once the cache grows past its size cap.
+    """
+
+    def __init__(self, directory: Optional[Path] = None, ttl: int = None, max_bytes: int = None):
+        """
+        Initialize cache, loading the saved index
+
+        Args:
+            directory: Cache directory (default: cache/http)
+            ttl: Seconds a response is served without revalidation (default from config)
+            max_bytes: Size cap for stored bodies (default from config)
+        """
+        self.directory = Path(directory or config.CACHE_PATH / "http")
+        self.ttl = config.HTTP_CACHE_TTL if ttl is None else ttl
+        self.max_bytes = config.HTTP_CACHE_MAX_MB * 1024 * 1024 if max_bytes is None else max_bytes
+        self._index_path = self.directory / "index.json"
+        self._lock = threading.Lock()
+
+        entries = load_json(self._index_path, {}).get('entries', {})
+        self._entries = {key: entry for key, entry in entries.items() if self._body_path(key).exists()}
+        self._size = sum(entry['size'] for entry in self._entries.values())
+        self._remove_orphans()
+
+    def _remove_orphans(self):
+        """
+        Delete body files the index does not list
+
+        Bodies stored after the last save() (the process crashed or was
+        killed) are missing from the index, so they would never count
+        toward the size cap nor be evicted. Temporary files left by an
+        interrupted write go too.
+        """
+        if not self.directory.is_dir():
+            return
+
+        removed = 0
+        for path in self.directory.iterdir():
+            orphan = path.suffix == '.body' and path.stem not in self._entries
+            interrupted = path.name.startswith('.') and path.suffix == '.tmp'
+            if orphan or interrupted:
+                path.unlink(missing_ok=True)
+                removed += 1
+        if removed:
+            app_logger.debug(f"Removed {removed} cached bodies missing from the index")
+
+    def _body_path(self, key: str) -> Path:
+        """Get the file holding a cached body"""
+        return self.directory / f"{key}.body"
+
+    def lookup(self, key: str) -> Optional[Dict]:
+        """
+        Get the metadata of a cached response
+
+        Args:
+            key: Cache key
+
+        Returns:
+            Copy of the entry with a 'fresh' flag, or None if not cached
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            entry = dict(entry)
+        entry['fresh'] = time.time() - entry['stored_at'] < self.ttl
+        return entry
+
+    def conditional_headers(self, entry: Dict) -> Dict[str, str]:
+        """Get the validators to send when revalidating an entry"""
+        headers = {}
+        if entry['headers'].get('ETag'):
+            headers['If-None-Match'] = entry['headers']['ETag']
+        if entry['headers'].get('Last-Modified'):
+            headers['If-Modified-Since'] = entry['headers']['Last-Modified']
+        return headers
+
+    def response(self, key: str, url: str) -> Optional[requests.Response]:
+        """
+        Rebuild a response from the cache, marking the entry as used
+
+        Args:
+            key: Cache key
+            url: Request URL
+
+        Returns:
+            Response with the cached body, or None if the body is gone
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            entry['last_used'] = time.time()
+            stored_headers = dict(entry['headers'])
+            encoding = entry.get('encoding')
+
+        try:
+            body = self._body_path(key).read_bytes()
+        except OSError:
+            self._remove(key)
+            return None
+
+        response = requests.Response()
+        response.url = url
+        response.status_code = 200
+        response._content = body
+        response._content_consumed = True
+        response.headers.update(stored_headers)
+        response.encoding = encoding
+        response.from_cache = True
+        return response
+
+    def store(self, key: str, response: requests.Response) -> bool:
+        """
+        Store a successful response
+
+        Args:
+            key: Cache key
+            response: Response received (status 200)
+
+        Returns:
+            True if the response was cached
+        """
+        if 'no-store' in response.headers.get('Cache-Control', ''):
+            return False
+
+        body = response.content
+        if len(body) > self.max_bytes or not save_bytes(self._body_path(key), body):
+            return False
+
+        now = time.time()
+        entry = {
+            'headers': {name: response.headers[name] for name in STORED_HEADERS if name in response.headers},
+            'encoding': response.encoding,
+            'size': len(body),
+            'stored_at': now,
+            'last_used': now,
+        }
+        with self._lock:
+            previous = self._entries.get(key)
+            if previous:
+                self._size -= previous['size']
+            self._entries[key] = entry
+            self._size += entry['size']
+            evicted = self._evict()
+
+        for evicted_key in evicted:
+            self._body_path(evicted_key).unlink(missing_ok=True)
+        return True
+
+    def refresh(self, key: str):
+        """Restart an entry's TTL after the server confirmed it is unchanged (304)"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry:
+                entry['stored_at'] = time.time()
+
+    def _evict(self) -> list:
+        """Drop least recently used entries beyond the size cap (lock must be held)"""
+        evicted = []
+        if self._size <= self.max_bytes:
+            return evicted
+
+        for key, entry in sorted(self._entries.items(), key=lambda item: item[1]['last_used']):
+            if self._size <= self.max_bytes:
+                break
+            del self._entries[key]
+            self._size -= entry['size']
+            evicted.append(key)
+
+        app_logger.debug(f"Evicted {len(evicted)} cached responses")
+        return evicted
+
+    def _remove(self, key: str):
+        """Forget an entry"""
+        with self._lock:
+            entry = self._entries.pop(key, None)
+            if entry:
+                self._size -= entry['size']
+        self._body_path(key).unlink(missing_ok=True)
+
+    @property
+    def size(self) -> int:
+        """Bytes of cached bodies"""
+        with self._lock:
+            return self._size
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._entries)
+
+    def save(self) -> bool:
+        """Persist the index"""
+        with self._lock:
+            data = {'entries': {key: dict(entry) for key, entry in self._entries.items()}}
+        return save_json(self._index_path, data)
+
+def get_shared_http_cache() -> Optional[HttpCache]:
+    """
+    Get the process-wide response cache, creating it on first use
+
+    Returns:
+        Shared HTTP cache, or None if caching is disabled
+    """
+    global _shared_cache
+
+    if not config.HTTP_CACHE_ENABLED:
+        return None
+
+    if _shared_cache is None:
+        with _shared_lock:
+            if _shared_cache is None:
+                _shared_cache = HttpCache()
+    return _shared_cache
@@ -0,0 +1,130 @@
+"""
+Pooled HTTP session shared by the Shopee scrapers
+"""
+import threading
+from typing import Dict, Optional
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from config import config
+
+# Transient server errors worth retrying at the connection-pool level
+RETRY_STATUS_CODES = (500, 502, 503, 504)
+
+_shared_session = None
+_shared_lock = threading.Lock()
+
+def parse_host_pool_sizes(value: str) -> Dict[str, int]:
+    """
+    Parse per-host pool sizes from a "host=size,host=size" string
+
+    Args:
+        value: Raw setting (e.g. "shopee.ph=50,shopee.sg=10")
+
+    Returns:
+        Mapping of host to pool size
+    """
+    sizes = {}
+    for entry in (value or '').split(','):
+        host, sep, size = entry.partition('=')
+        host = host.strip()
+        if not sep or not host:
+            continue
+        try:
+            sizes[host] = int(size)
+        except ValueError:
+            continue
+    return sizes
+
+def build_retry(total: int = None, backoff_factor: float = None) -> Retry:
+    """
+    Build the retry policy used by the pooled adapters
+
+    Args:
+        total: Maximum retries per request (default from config)
+        backoff_factor: Exponential backoff factor in seconds (default from config)
+
+    Returns:
+        urllib3 Retry instance
+    """
+    total = config.HTTP_MAX_RETRIES if total is None else total
+    backoff_factor = config.HTTP_RETRY_BACKOFF if backoff_factor is None else backoff_factor
+
+    return Retry(
+        total=total,
+        backoff_factor=backoff_factor,
+        status_forcelist=RETRY_STATUS_CODES,
+        respect_retry_after_header=True,
+        raise_on_status=False,
+    )
+
+def build_adapter(pool_maxsize: int = None, pool_connections: int = None,
+                  retry: Optional[Retry] = None) -> HTTPAdapter:
+    """
+    Build a keep-alive adapter with its own connection pool
+
+    Args:
+        pool_maxsize: Sockets kept alive per host
+        pool_connections: Number of host pools cached by the adapter
+        retry: Retry policy (default from config)
+
+    Returns:
+        Configured HTTPAdapter
+    """
+    return HTTPAdapter(
+        pool_connections=pool_connections or config.HTTP_POOL_CONNECTIONS,
+        pool_maxsize=pool_maxsize or config.HTTP_POOL_MAXSIZE,
+        max_retries=retry or build_retry(),
+    )
+
+def create_session(pool_maxsize: int = None, host_pool_sizes: Dict[str, int] = None,
+                   retry: Optional[Retry] = None) -> requests.Session:
+    """
+    Create a session whose adapters reuse keep-alive connections
+
+    Args:
+        pool_maxsize: Default sockets kept alive per host
+        host_pool_sizes: Per-host overrides (default from config)
+        retry: Retry policy shared by all adapters
+
+    Returns:
+        Configured requests session
+    """
+    session = requests.Session()
+
+    default_adapter = build_adapter(pool_maxsize=pool_maxsize, retry=retry)
+    session.mount('https://', default_adapter)
+    session.mount('http://', default_adapter)
+
+    if host_pool_sizes is None:
+        host_pool_sizes = parse_host_pool_sizes(config.HTTP_HOST_POOL_SIZES)
+
+    # requests picks the longest matching prefix, so these win over the defaults
+    for host, size in host_pool_sizes.items():
+        session.mount(f'https://{host}/', build_adapter(pool_maxsize=size, pool_connections=1, retry=retry))
+
+    return session
+
+def get_shared_session() -> requests.Session:
+    """
+    Get the process-wide pooled session, creating it on first use
+
+    Returns:
+        Shared requests session
+    """
+    global _shared_session
+
+    if _shared_session is None:
+        with _shared_lock:
+            if _shared_session is None:
+                _shared_session = create_session()
+    return _shared_session
+
+def close_shared_session():
+    """Close the shared session and release its pooled connections"""
+    global _shared_session
+
+    with _shared_lock:
+        if _shared_session is not None:
+            _shared_session.close()
+            _shared_session = None
@@ -0,0 +1,117 @@
+"""
+Canonical references to Shopee items parsed from product URLs
+"""
+import re
+from functools import lru_cache
+from typing import Optional, Tuple
+from urllib.parse import urlsplit
+
+# Region used for URLs that are not on a Shopee domain
+DEFAULT_REGION = 'shopee.ph'
+
+# Parsed URLs remembered by parse_item_ref
+ITEM_REF_CACHE_SIZE = 100000
+
+# https://shopee.xx/[product-name]-i.[shop-id].[product-id]
+_SLUG_IDS = re.compile(r'-i\.(\d+)\.(\d+)')
+_SLUG_IDS_SUFFIX = re.compile(r'-i\.\d+\.\d+$')
+# https://shopee.xx/i.[shop-id].[product-id]
+_BARE_IDS = re.compile(r'i\.(\d+)\.(\d+)')
+# https://shopee.xx/product/[shop-id]/[product-id]
+_PRODUCT_PATH = re.compile(r'^product/(\d+)/(\d+)(?:/|$)')
+
+class ItemRef:
+    """
+    A Shopee item identified by region, shop ID and item ID
+
+    Two references are equal when they point at the same item, whatever
+    slug or query string their URLs carry. Instances are shared through
+    parse_item_ref's cache and must not be modified.
+    """
+
+    __slots__ = ('region', 'shop_id', 'item_id', 'slug', 'url')
+
+    def __init__(self, region: str, shop_id: Optional[str], item_id: Optional[str],
+                 slug: Optional[str] = None, url: str = ''):
+        """
+        Initialize reference
+
+        Args:
+            region: Shopee domain (e.g. "shopee.ph")
+            shop_id: Shop ID, or None if the URL has none
+            item_id: Item ID, or None if the URL has none
+            slug: Product name part of the URL path
+            url: URL the reference was parsed from
+        """
+        self.region = region
+        self.shop_id = shop_id
+        self.item_id = item_id
+        self.slug = slug
+        self.url = url
+
+    @property
+    def key(self) -> Optional[Tuple[str, str, str]]:
+        """(region, shop_id, item_id), or None if the URL has no item IDs"""
+        if self.shop_id and self.item_id:
+            return self.region, self.shop_id, self.item_id
+        return None
+
+    @property
+    def api_base(self) -> str:
+        """API origin for the item's region"""
+        return f"https://{self.region}"
+
+    @property
+    def name(self) -> Optional[str]:
+        """Product name guessed from the URL slug"""
+        return self.slug.replace('-', ' ') if self.slug else None
+
+    def __eq__(self, other) -> bool:
+        if not isinstance(other, ItemRef):
+            return NotImplemented
+        return (self.key or self.url) == (other.key or other.url)
+
+    def __hash__(self) -> int:
+        return hash(self.key or self.url)
+
+    def __repr__(self) -> str:
+        return f"ItemRef({self.region}, shop={self.shop_id}, item={self.item_id})"
+
+def _region(host: str) -> str:
+    """Get the Shopee region of a host name"""
+    host = host.split(':')[0]
+    for prefix in ('www.', 'm.'):
+        if host.startswith(prefix):
+            host = host[len(prefix):]
+            break
+    return host if host.startswith('shopee.') else DEFAULT_REGION
+
+@lru_cache(maxsize=ITEM_REF_CACHE_SIZE)
+def parse_item_ref(url: str) -> ItemRef:
+    """
+    Parse a Shopee product URL
+
+    Handles slug URLs (name-i.shop.item), bare i.shop.item paths and
+    /product/shop/item paths on any Shopee domain. Query strings (tracking
+    parameters) and fragments are ignored.
+
+    Args:
+        url: Product URL
+
+    Returns:
+        Item reference (shop_id and item_id are None if the URL has none)
+    """
+    url = url.strip()
+    parts = urlsplit(url if '//' in url else f"//{url}")
+    path = parts.path.strip('/')
+
+    match = _PRODUCT_PATH.match(path)
+    if match:
+        return ItemRef(_region(parts.netloc.lower()), match.group(1), match.group(2), None, url)
+
+    match = _SLUG_IDS.search(path) or _BARE_IDS.search(path)
+    shop_id, item_id = match.groups() if match else (None, None)
+    slug = _SLUG_IDS_SUFFIX.sub('', path)
+    if not slug or _BARE_IDS.fullmatch(slug):
+        slug = None
+    return ItemRef(_region(parts.netloc.lower()), shop_id, item_id, slug, url)
@@ -0,0 +1,112 @@
+"""
+JSON decoding with a fast library when installed, and field projection of large payloads
+"""
+import json
+from typing import Dict, Iterable, Optional, Tuple, Union
+
+try:
+    import orjson
+    HAS_ORJSON = True
+except ImportError:
+    HAS_ORJSON = False
+
+# Item API fields the scraper reads (see ShopeeScraper._build_product_from_api_item)
+API_ITEM_FIELDS = (
+    'itemid', 'shopid', 'name', 'price', 'price_before_discount', 'discount', 'raw_discount',
+    'shop', 'shop_name', 'rating', 'item_rating', 'stock',
+)
+
+_DECODER = json.JSONDecoder()
+
+def loads(data: Union[str, bytes, bytearray, memoryview]):
+    """
+    Decode a JSON document
+
+    Args:
+        data: JSON text or UTF-8 bytes
+
+    Returns:
+        Decoded value
+
+    Raises:
+        ValueError: If the document is not valid JSON
+    """
+    if HAS_ORJSON:
+        try:
+            return orjson.loads(data)
+        except orjson.JSONDecodeError:
+            # orjson is stricter (NaN, integers over 64 bits, lone surrogates); let json decide
+            pass
+
+    if isinstance(data, (bytes, bytearray, memoryview)):
+        # Undecodable bytes are replaced, as response.text would
+        data = bytes(data).decode('utf-8', errors='replace')
+    return json.loads(data)
+
+def raw_decode(text: Union[str, bytes], start: int, end: Optional[int] = None) -> Tuple[object, int]:
+    """
+    Decode the JSON value starting at a position of a larger text
+
+    Args:
+        text: Text (or UTF-8 bytes) containing the value
+        start: Position of the value's first character (byte offset for bytes)
+        end: Where the enclosing block ends, if known; a value that fills
+            the block up to optional whitespace and ";" is decoded with the
+            fast library
+
+    Returns:
+        (value, position after the value)
+
+    Raises:
+        ValueError: If no valid JSON value starts there
+    """
+    if HAS_ORJSON and end is not None:
+        tail = text[start:end].rstrip()
+        if tail[-1:] in (';', b';'):
+            tail = tail[:-1]
+        try:
+            return orjson.loads(tail), start + len(tail)
+        except orjson.JSONDecodeError:
+            pass
+
+    if isinstance(text, str):
+        return _DECODER.raw_decode(text, start)
+
+    # surrogateescape round-trips every byte, so the end position maps back exactly
+    block = text[start:end].decode('utf-8', errors='surrogateescape')
+    value, position = _DECODER.raw_decode(block)
+    return value, start + len(block[:position].encode('utf-8', errors='surrogateescape'))
+
+def pick_fields(record, fields: Iterable[str] = API_ITEM_FIELDS) -> Optional[Dict]:
+    """Keep only some fields of a decoded record (None if it is not an object)"""
+    if not isinstance(record, dict):
+        return None
+    return {name: record[name] for name in fields if name in record}
+
+def load_fields(data: Union[str, bytes], key: str, fields: Iterable[str] = API_ITEM_FIELDS):
+    """
+    Decode a payload and keep only the wanted fields of the record(s) under a top-level key
+
+    Only the small projections outlive the call, so the decoded payload
+    (descriptions, model lists, images...) is released right away.
+
+    Args:
+        data: JSON text or UTF-8 bytes of an object, e.g. an item API response
+        key: Top-level key holding a record or a list of records (e.g. "data")
+        fields: Record fields to keep
+
+    Returns:
+        Dict of fields for a record, list of such dicts for a list (records
+        that are not objects are dropped), or None if the key is missing
+
+    Raises:
+        ValueError: If the document is not valid JSON
+    """
+    document = loads(data)
+    if not isinstance(document, dict):
+        return None
+
+    value = document.get(key)
+    if isinstance(value, list):
+        return [picked for picked in (pick_fields(record, fields) for record in value) if picked is not None]
+    return pick_fields(value, fields)
@@ -0,0 +1,94 @@
+"""
+Encoding of downloaded pages, decided from the bytes without charset detection
+"""
+import codecs
+import re
+from typing import Optional
+
+# Encoding assumed when neither the response nor the page declares one (Shopee serves UTF-8)
+DEFAULT_ENCODING = 'utf-8'
+
+# Bytes searched for a <meta charset>, as browsers do
+SNIFF_BYTES = 1024
+
+BOMS = ((codecs.BOM_UTF8, 'utf-8'), (codecs.BOM_UTF16_LE, 'utf-16'), (codecs.BOM_UTF16_BE, 'utf-16'))
+
+_HEADER_CHARSET = re.compile(r'charset\s*=\s*["\']?\s*([\w.:-]+)', re.IGNORECASE)
+_META_CHARSET = re.compile(rb'<meta\b[^>]*?charset\s*=\s*["\']?\s*([\w.:-]+)', re.IGNORECASE)
+
+def normalize_encoding(name: Optional[str]) -> Optional[str]:
+    """Get the canonical codec name of an encoding label (None if unknown)"""
+    if not name:
+        return None
+    try:
+        return codecs.lookup(name).name
+    except LookupError:
+        return None
+
+def page_encoding(content_type: Optional[str], head: bytes) -> str:
+    """
+    Decide the encoding of a page
+
+    A byte order mark wins, then the charset of the Content-Type header,
+    then a <meta charset> near the start of the page. Unlike
+    response.text, a missing charset never triggers detection over the
+    whole body (nor the ISO-8859-1 default for text/* responses).
+
+    Args:
+        content_type: Content-Type header of the response
+        head: First bytes of the body (at least SNIFF_BYTES if available)
+
+    Returns:
+        Canonical codec name
+    """
+    for bom, encoding in BOMS:
+        if head.startswith(bom):
+            return encoding
+
+    match = _HEADER_CHARSET.search(content_type or '')
+    encoding = normalize_encoding(match.group(1)) if match else None
+    if encoding:
+        return encoding
+
+    match = _META_CHARSET.search(head[:SNIFF_BYTES])
+    encoding = normalize_encoding(match.group(1).decode('ascii')) if match else None
+    return encoding or DEFAULT_ENCODING
+
+def utf8_body(body: bytes, encoding: str) -> bytes:
+    """
+    Get a body as UTF-8 bytes
+
+    UTF-8 and ASCII bodies are returned as they are; others are transcoded
+    once, so everything downstream scans and parses UTF-8 bytes.
+    """
+    if encoding in ('utf-8', 'ascii'):
+        return body
+    return body.decode(encoding, errors='replace').encode('utf-8')
+
+def response_body(response) -> bytes:
+    """Get the body of a (non-streamed) response as UTF-8 bytes"""
+    body = response.content
+    return utf8_body(body, page_encoding(response.headers.get('Content-Type'), body[:SNIFF_BYTES]))
+
+class Utf8Transcoder:
+    """Turn the chunks of a streamed body into UTF-8 chunks"""
+
+    def __init__(self, encoding: str):
+        """
+        Initialize transcoder
+
+        Args:
+            encoding: Encoding of the body (see page_encoding)
+        """
+        self.encoding = encoding
+        # True if chunks are already UTF-8 and come out untouched
+        self.passthrough = encoding in ('utf-8', 'ascii')
+        self._decoder = None
+        if not self.passthrough:
+            self._decoder = codecs.getincrementaldecoder(encoding)(errors='replace')
+
+    def feed(self, chunk: bytes, final: bool = False) -> bytes:
+        """Transcode the next chunk"""
+        if self.passthrough:
+            return chunk
+        return self._decoder.decode(chunk, final).encode('utf-8')
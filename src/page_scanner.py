@@ -0,0 +1,163 @@
+"""
+Incremental scanner that finds product name and price while a page downloads
+"""
+import html
+import re
+from typing import Dict, Optional, Tuple
+from json_codec import loads
+
+# JSON-LD blocks, in the exact form Shopee serves them
+LD_JSON_OPEN = b'<script type="application/ld+json">'
+SCRIPT_CLOSE = b'</script>'
+HEAD_CLOSE = b'</head>'
+
+_META_TAG = re.compile(rb'<meta\b[^>]*>', re.IGNORECASE)
+_ATTRIBUTE = re.compile(r'([\w:-]+)\s*=\s*(?:"([^"]*)"|\'([^\']*)\')')
+
+# Meta properties that carry the product price
+PRICE_META_PROPERTIES = ('product:price:amount', 'og:price:amount')
+
+def json_ld_product(data) -> Optional[Tuple[str, float]]:
+    """
+    Get name and price from a decoded JSON-LD block
+
+    Args:
+        data: Decoded JSON-LD value
+
+    Returns:
+        (name, price) if the block is a product with a price, else None
+    """
+    if not isinstance(data, dict):
+        return None
+
+    # Check if it's a Product
+    if not (data.get('@type') == 'Product' or ('name' in data and 'offers' in data)):
+        return None
+
+    name = data.get('name', '').strip()
+    if not name:
+        return None
+
+    # Extract price
+    price = None
+    if 'offers' in data:
+        offers = data['offers']
+        if isinstance(offers, list) and offers:
+            price = offers[0].get('price')
+        elif isinstance(offers, dict):
+            price = offers.get('price')
+
+    if not price:
+        return None
+    try:
+        return name, float(price)
+    except ValueError:
+        return None
+
+def tag_attributes(tag: str) -> Dict[str, str]:
+    """Parse the attributes of a tag (names lowercased, entities decoded)"""
+    attributes = {}
+    for name, double_quoted, single_quoted in _ATTRIBUTE.findall(tag):
+        value = double_quoted if double_quoted or not single_quoted else single_quoted
+        attributes[name.lower()] = html.unescape(value)
+    return attributes
+
+class PageScanner:
+    """
+    Look for a complete product record in a page fed in pieces
+
+    Complete JSON-LD product blocks and og:title plus price meta tags are
+    recognized as soon as their closing tag has arrived. Only bytes added
+    since the previous feed are searched (plus any unfinished tag). The
+    page is kept as UTF-8 bytes and never decoded as a whole.
+    """
+
+    def __init__(self):
+        """Initialize an empty scanner"""
+        self.data = bytearray()
+        self._ld_pos = 0
+        self._meta_pos = 0
+        self._in_head = True
+        self.meta: Dict[str, str] = {}
+
+    def feed(self, chunk: bytes) -> Optional[Tuple[str, float]]:
+        """
+        Add bytes and scan them
+
+        Args:
+            chunk: Next piece of the page, UTF-8 encoded (see page_encoding.Utf8Transcoder)
+
+        Returns:
+            (name, price) once a product record is complete, else None
+        """
+        if not chunk:
+            return None
+        self.data += chunk
+        text = self.data
+
+        found = self._scan_json_ld(text)
+        if found:
+            return found
+        if self._in_head:
+            return self._scan_meta(text)
+        return None
+
+    def _scan_json_ld(self, text: bytearray) -> Optional[Tuple[str, float]]:
+        """Decode JSON-LD blocks whose closing tag has arrived"""
+        while True:
+            start = text.find(LD_JSON_OPEN, self._ld_pos)
+            if start < 0:
+                # Keep enough of the tail to match an opening tag split across chunks
+                self._ld_pos = max(self._ld_pos, len(text) - len(LD_JSON_OPEN))
+                return None
+
+            body_start = start + len(LD_JSON_OPEN)
+            end = text.find(SCRIPT_CLOSE, body_start)
+            if end < 0:
+                self._ld_pos = start
+                return None
+            self._ld_pos = end + len(SCRIPT_CLOSE)
+
+            try:
+                found = json_ld_product(loads(text[body_start:end]))
+            except (ValueError, KeyError, TypeError, AttributeError):
+                found = None
+            if found:
+                return found
+
+    def _scan_meta(self, text: bytearray) -> Optional[Tuple[str, float]]:
+        """Collect complete <meta> tags until the end of <head>"""
+        head_end = text.find(HEAD_CLOSE, self._meta_pos)
+        limit = head_end if head_end >= 0 else len(text)
+
+        for match in _META_TAG.finditer(text, self._meta_pos, limit):
+            attributes = tag_attributes(match.group(0).decode('utf-8', errors='replace'))
+            key = attributes.get('property') or attributes.get('name')
+            if key and 'content' in attributes:
+                self.meta.setdefault(key.lower(), attributes['content'])
+            self._meta_pos = match.end()
+
+        if head_end >= 0:
+            self._in_head = False
+        else:
+            # An unfinished tag may start in the tail, rescan from there next time
+            tail = text.rfind(b'<', self._meta_pos)
+            self._meta_pos = tail if tail >= 0 else len(text)
+
+        return self._meta_product()
+
+    def _meta_product(self) -> Optional[Tuple[str, float]]:
+        """Get name and price from og:title and a price meta tag"""
+        name = self.meta.get('og:title', '').strip()
+        if not name:
+            return None
+
+        for prop in PRICE_META_PROPERTIES:
+            value = self.meta.get(prop, '').replace(',', '')
+            try:
+                price = float(value)
+            except ValueError:
+                continue
+            if 10 < price < 1000000:
+                return name, price
+        return None
@@ -0,0 +1,142 @@
+"""
+Single-pass tokenizer for the script blocks and meta tags of a page
+"""
+import re
+from typing import Dict, Iterator, List, Union
+from json_codec import loads, raw_decode
+from page_scanner import tag_attributes
+
+# Pages are scanned as UTF-8 bytes; only tag attributes and decoded values become str
+_TAG = re.compile(rb'<(script|meta)\b([^>]*)>', re.IGNORECASE)
+_SCRIPT_CLOSE = re.compile(rb'</script\s*>', re.IGNORECASE)
+
+# State objects the page assigns anywhere in a script, by kind
+STATE_NAMES = (('window.__INITIAL_STATE__', 'initial_state'), ('__data__', 'data'))
+_ASSIGN_OBJECT = re.compile(rb'\s*=\s*(?=\{)')
+_IDENTIFIER_CHARS = frozenset(b'abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789_$')
+
+# A variable declared with an object literal at the start of a script
+_DECLARATION = re.compile(rb'\s*(?:var|let|const)\s+([A-Za-z_$][\w$]*)\s*=\s*(?=\{)')
+
+LD_JSON_TYPE = 'application/ld+json'
+
+# Kinds of embedded state, in the order extraction tries them
+STATE_KINDS = ('initial_state', 'data', 'variable')
+
+_MISSING = object()
+
+class EmbeddedState:
+    """
+    An object literal assigned in a script, decoded on first use
+
+    Decoding starts at the opening brace and stops where the JSON value
+    ends, so nested objects and braces inside strings need no matching.
+    A literal that fills the rest of its script is decoded with the fast
+    JSON library when installed.
+    """
+
+    __slots__ = ('kind', 'name', '_html', '_start', '_end', '_value')
+
+    def __init__(self, kind: str, name: str, html: bytes, start: int, end: int):
+        self.kind = kind
+        self.name = name
+        self._html = html
+        self._start = start
+        self._end = end
+        self._value = _MISSING
+
+    @property
+    def value(self):
+        """Decoded object, or None if the literal is not valid JSON"""
+        if self._value is _MISSING:
+            try:
+                self._value = raw_decode(self._html, self._start, self._end)[0]
+            except ValueError:
+                self._value = None
+        return self._value
+
+class PageTokens:
+    """
+    Script blocks and meta tags of a page, found in one linear pass
+
+    JSON-LD blocks and embedded state objects are decoded lazily and at
+    most once, so every extraction method can share one instance.
+    """
+
+    def __init__(self, html: Union[bytes, str]):
+        """
+        Tokenize a page
+
+        Args:
+            html: Page as UTF-8 bytes (see page_encoding.utf8_body), or text
+        """
+        if isinstance(html, str):
+            html = html.encode('utf-8')
+        self.html = html
+        # Content of the first meta tag per property/name (lowercased)
+        self.meta: Dict[str, str] = {}
+        self.states: List[EmbeddedState] = []
+        self._ld_json_spans = []
+        self._ld_json = None
+        self._tokenize()
+
+    def _tokenize(self):
+        """Walk the page once, collecting meta tags and script blocks"""
+        html = self.html
+        position = 0
+        states = {kind: [] for kind in STATE_KINDS}
+
+        while True:
+            match = _TAG.search(html, position)
+            if not match:
+                break
+            attributes = tag_attributes(match.group(2).decode('utf-8', errors='replace'))
+            position = match.end()
+
+            if match.group(1).lower() == b'meta':
+                key = attributes.get('property') or attributes.get('name')
+                if key and 'content' in attributes:
+                    self.meta.setdefault(key.lower(), attributes['content'])
+                continue
+
+            close = _SCRIPT_CLOSE.search(html, position)
+            end = close.start() if close else len(html)
+            if attributes.get('type', '').strip().lower() == LD_JSON_TYPE:
+                self._ld_json_spans.append((position, end))
+            else:
+                self._find_states(position, end, states)
+            position = close.end() if close else end
+
+        self.states = [state for kind in STATE_KINDS for state in states[kind]]
+
+    def _find_states(self, start: int, end: int, states: Dict[str, List[EmbeddedState]]):
+        """Collect the state assignments of one script body"""
+        html = self.html
+        declaration = _DECLARATION.match(html, start, end)
+        if declaration:
+            name = declaration.group(1).decode('ascii')
+            states['variable'].append(EmbeddedState('variable', name, html, declaration.end(), end))
+
+        # bytes.find skips ahead far faster than a regex without a literal prefix
+        for name, kind in STATE_NAMES:
+            needle = name.encode('ascii')
+            found = html.find(needle, start, end)
+            while found >= 0:
+                after = found + len(needle)
+                if found == 0 or html[found - 1] not in _IDENTIFIER_CHARS:
+                    assignment = _ASSIGN_OBJECT.match(html, after, end)
+                    if assignment:
+                        states[kind].append(EmbeddedState(kind, name, html, assignment.end(), end))
+                found = html.find(needle, after, end)
+
+    def json_ld(self) -> Iterator:
+        """Decoded JSON-LD blocks in page order, skipping invalid ones"""
+        if self._ld_json is None:
+            self._ld_json = []
+            page = memoryview(self.html)
+            for start, end in self._ld_json_spans:
+                try:
+                    self._ld_json.append(loads(page[start:end]))
+                except ValueError:
+                    pass
+        return iter(self._ld_json)
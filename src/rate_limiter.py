@@ -0,0 +1,336 @@
+"""
+Per-host rate limiting and circuit breaking for Shopee endpoints
+"""
+import threading
+import time
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import Dict, Optional
+import requests
+from config import config
+from logger import app_logger
+
+# Responses that mean Shopee is throttling or blocking us
+BLOCK_STATUS_CODES = (403, 429)
+
+_shared_throttle = None
+_shared_lock = threading.Lock()
+
+class CircuitOpenError(requests.exceptions.RequestException):
+    """Raised when requests to a host are suspended by its circuit breaker"""
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """
+    Parse a Retry-After header
+
+    Args:
+        value: Header value (seconds or HTTP date)
+
+    Returns:
+        Seconds to wait, or None if missing or invalid
+    """
+    if not value:
+        return None
+
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if retry_at.tzinfo is None:
+        retry_at = retry_at.replace(tzinfo=timezone.utc)
+    return max(0.0, (retry_at - datetime.now(timezone.utc)).total_seconds())
+
+class TokenBucket:
+    """Thread-safe token bucket allowing short bursts above a sustained rate"""
+
+    def __init__(self, rate: float, capacity: float):
+        """
+        Initialize a full bucket
+
+        Args:
+            rate: Tokens added per second
+            capacity: Maximum tokens (burst size)
+        """
+        self.rate = rate
+        self.capacity = max(1.0, capacity)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float):
+        """Add tokens for the time elapsed since the last update"""
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def acquire(self, timeout: Optional[float] = None) -> Optional[float]:
+        """
+        Take a token, sleeping until one is available
+
+        Args:
+            timeout: Maximum seconds to wait (None = no limit)
+
+        Returns:
+            Seconds spent waiting, or None if no token was available in time
+        """
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._refill(now)
+                if now >= self._paused_until and self._tokens >= 1:
+                    self._tokens -= 1
+                    return waited
+
+                delay = max(self._paused_until - now, (1 - self._tokens) / self.rate)
+
+            if timeout is not None and waited + delay > timeout:
+                return None
+            time.sleep(delay)
+            waited += delay
+
+    def pause(self, seconds: float):
+        """Hand out no tokens for the given number of seconds"""
+        with self._lock:
+            self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+            self._tokens = 0
+
+    @property
+    def tokens(self) -> float:
+        """Tokens currently available"""
+        with self._lock:
+            self._refill(time.monotonic())
+            return self._tokens
+
+class CircuitBreaker:
+    """
+    Stop sending requests to a host that keeps blocking us
+
+    Closed: requests flow. Open: requests are rejected until the cooldown
+    (or a longer Retry-After) has passed. Half-open: one probe request is
+    let through; success closes the circuit, another block reopens it.
+    """
+
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half-open'
+
+    def __init__(self, name: str, failure_threshold: int, cooldown: float):
+        """
+        Initialize a closed breaker
+
+        Args:
+            name: Host name used in logs
+            failure_threshold: Consecutive blocked responses before opening
+            cooldown: Seconds to stay open before probing
+        """
+        self.name = name
+        self.failure_threshold = max(1, failure_threshold)
+        self.cooldown = cooldown
+        self.state = self.CLOSED
+        self.failures = 0
+        self._open_until = 0.0
+        self._probe_in_flight = False
+        self._lock = threading.Lock()
+
+    def allow(self) -> bool:
+        """True if a request may be sent now"""
+        with self._lock:
+            if self.state == self.CLOSED:
+                return True
+
+            if self.state == self.OPEN:
+                if time.monotonic() < self._open_until:
+                    return False
+                self.state = self.HALF_OPEN
+                self._probe_in_flight = False
+                app_logger.info(f"Circuit half-open for {self.name}, sending a probe request")
+
+            if self._probe_in_flight:
+                return False
+            self._probe_in_flight = True
+            return True
+
+    def record_success(self):
+        """Record a response that was not blocked"""
+        with self._lock:
+            if self.state != self.CLOSED:
+                app_logger.info(f"Circuit closed for {self.name}")
+            self.state = self.CLOSED
+            self.failures = 0
+            self._probe_in_flight = False
+
+    def record_block(self, retry_after: Optional[float] = None, force_open: bool = False):
+        """
+        Record a blocked (403/429) response
+
+        Args:
+            retry_after: Seconds the server asked us to wait, if any
+            force_open: Open the circuit even below the failure threshold
+        """
+        with self._lock:
+            self.failures += 1
+            self._probe_in_flight = False
+
+            if force_open or self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+                self._open(max(self.cooldown, retry_after or 0))
+
+    def record_failure(self):
+        """
+        Record a request that got no response (connection error, timeout)
+
+        A failed probe reopens the circuit for another cooldown; failures
+        while closed are not blocks and are left to the retry policy.
+        """
+        with self._lock:
+            if self.state == self.HALF_OPEN and self._probe_in_flight:
+                self._probe_in_flight = False
+                self._open(self.cooldown)
+
+    def release_probe(self):
+        """Let another request probe a half-open circuit (the probe was never sent)"""
+        with self._lock:
+            self._probe_in_flight = False
+
+    def _open(self, seconds: float):
+        """Open the circuit (lock must be held)"""
+        self.state = self.OPEN
+        self._open_until = max(self._open_until, time.monotonic() + seconds)
+        app_logger.warning(
+            f"Circuit open for {self.name} after {self.failures} blocked response(s), "
+            f"pausing requests for {seconds:.0f}s"
+        )
+
+    def remaining(self) -> float:
+        """Seconds until an open circuit may be probed"""
+        with self._lock:
+            return max(0.0, self._open_until - time.monotonic()) if self.state == self.OPEN else 0.0
+
+class HostThrottle:
+    """Token bucket and circuit breaker for every host we talk to"""
+
+    def __init__(self, rate: float = None, burst: float = None,
+                 failure_threshold: int = None, cooldown: float = None):
+        """
+        Initialize throttle
+
+        Args:
+            rate: Sustained requests per second per host (default from config)
+            burst: Requests allowed in a burst per host (default from config)
+            failure_threshold: Blocked responses before a circuit opens (default from config)
+            cooldown: Seconds a circuit stays open (default from config)
+        """
+        self.rate = rate or config.RATE_LIMIT_PER_SECOND
+        self.burst = burst or config.RATE_LIMIT_BURST
+        self.failure_threshold = failure_threshold or config.CIRCUIT_FAILURE_THRESHOLD
+        self.cooldown = config.CIRCUIT_COOLDOWN if cooldown is None else cooldown
+        self._buckets = {}
+        self._breakers = {}
+        self._lock = threading.Lock()
+
+    def _get(self, host: str):
+        """Get (bucket, breaker) for a host, creating them on first use"""
+        with self._lock:
+            if host not in self._buckets:
+                self._buckets[host] = TokenBucket(self.rate, self.burst)
+                self._breakers[host] = CircuitBreaker(host, self.failure_threshold, self.cooldown)
+            return self._buckets[host], self._breakers[host]
+
+    def before_request(self, host: str, timeout: Optional[float] = None) -> Optional[float]:
+        """
+        Wait for permission to send a request to a host
+
+        Args:
+            host: Host name
+            timeout: Maximum seconds to wait for a token (None = no limit)
+
+        Returns:
+            Seconds spent waiting for a token, or None if none was available in time
+
+        Raises:
+            CircuitOpenError: If the host's circuit is open
+        """
+        bucket, breaker = self._get(host)
+        if not breaker.allow():
+            raise CircuitOpenError(
+                f"Circuit open for {host}, retry in {breaker.remaining():.0f}s"
+            )
+        waited = bucket.acquire(timeout)
+        if waited is None:
+            breaker.release_probe()
+        return waited
+
+    def after_error(self, host: str):
+        """
+        Tell the host's breaker a request failed without a response
+
+        Args:
+            host: Host name
+        """
+        _, breaker = self._get(host)
+        breaker.record_failure()
+
+    def after_response(self, host: str, response: requests.Response) -> bool:
+        """
+        Feed a response back into the host's bucket and breaker
+
+        Args:
+            host: Host name
+            response: Response received
+
+        Returns:
+            True if the response was a block (403/429)
+        """
+        bucket, breaker = self._get(host)
+
+        if response.status_code not in BLOCK_STATUS_CODES:
+            breaker.record_success()
+            return False
+
+        retry_after = parse_retry_after(response.headers.get('Retry-After'))
+        if retry_after is not None and retry_after > config.MAX_RETRY_AFTER_WAIT:
+            # Too long to hold threads on the bucket, reject requests instead
+            breaker.record_block(retry_after, force_open=True)
+        else:
+            breaker.record_block(retry_after)
+            bucket.pause(retry_after if retry_after is not None else 1 / bucket.rate)
+        return True
+
+    def states(self) -> Dict[str, Dict]:
+        """
+        Describe every host's limiter state
+
+        Returns:
+            Mapping of host to circuit state, consecutive blocks and available tokens
+        """
+        with self._lock:
+            hosts = list(self._buckets)
+
+        states = {}
+        for host in hosts:
+            bucket, breaker = self._get(host)
+            states[host] = {
+                'circuit': breaker.state,
+                'blocked': breaker.failures,
+                'tokens': round(bucket.tokens, 2),
+            }
+        return states
+
+def get_shared_throttle() -> HostThrottle:
+    """
+    Get the process-wide throttle, creating it on first use
+
+    Returns:
+        Shared host throttle
+    """
+    global _shared_throttle
+
+    if _shared_throttle is None:
+        with _shared_lock:
+            if _shared_throttle is None:
+                _shared_throttle = HostThrottle()
+    return _shared_throttle
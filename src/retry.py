@@ -0,0 +1,106 @@
+"""
+Retry policy and time budgets for scraping
+"""
+import random
+import time
+from typing import Optional
+import requests
+from config import config
+
+# Server errors worth retrying (403/429 are handled by the rate limiter)
+RETRY_STATUS_CODES = (500, 502, 503, 504)
+
+class DeadlineExceeded(requests.exceptions.RequestException):
+    """Raised when a product's or cycle's time budget has run out"""
+
+class Deadline:
+    """A point in time after which no new work should start"""
+
+    def __init__(self, seconds: Optional[float] = None):
+        """
+        Initialize deadline
+
+        Args:
+            seconds: Budget from now (None = unlimited)
+        """
+        self.expires_at = None if seconds is None else time.monotonic() + seconds
+
+    def within(self, other: Optional['Deadline']) -> 'Deadline':
+        """
+        Get whichever of this and another deadline expires first
+
+        Args:
+            other: Enclosing deadline (e.g. the cycle's), or None
+
+        Returns:
+            The earlier deadline
+        """
+        if other is None or other.expires_at is None:
+            return self
+        if self.expires_at is None or other.expires_at < self.expires_at:
+            return other
+        return self
+
+    def remaining(self) -> Optional[float]:
+        """Seconds left (None if unlimited, never negative)"""
+        if self.expires_at is None:
+            return None
+        return max(0.0, self.expires_at - time.monotonic())
+
+    def expired(self) -> bool:
+        """True once the budget is used up"""
+        return self.expires_at is not None and time.monotonic() >= self.expires_at
+
+    def clamp(self, timeout: float) -> float:
+        """Limit a timeout to the time left"""
+        remaining = self.remaining()
+        return timeout if remaining is None else min(timeout, remaining)
+
+    def check(self, what: str = "work"):
+        """
+        Raise if the budget is used up
+
+        Args:
+            what: Description used in the error message
+
+        Raises:
+            DeadlineExceeded: If the deadline has passed
+        """
+        if self.expired():
+            raise DeadlineExceeded(f"Time budget exhausted before {what}")
+
+class RetryPolicy:
+    """Retries transient failures with full-jitter exponential backoff"""
+
+    def __init__(self, attempts: int = None, base_delay: float = None, max_delay: float = None):
+        """
+        Initialize policy
+
+        Args:
+            attempts: Total attempts including the first (default from config)
+            base_delay: Backoff before the first retry in seconds (default from config)
+            max_delay: Upper bound on a single backoff (default from config)
+        """
+        self.attempts = max(1, attempts or config.RETRY_ATTEMPTS)
+        self.base_delay = config.RETRY_BASE_DELAY if base_delay is None else base_delay
+        self.max_delay = config.RETRY_MAX_DELAY if max_delay is None else max_delay
+
+    def backoff(self, attempt: int) -> float:
+        """
+        Get a jittered delay before the next attempt
+
+        Args:
+            attempt: Number of attempts made so far (1 after the first failure)
+
+        Returns:
+            Seconds to wait
+        """
+        return random.uniform(0, min(self.max_delay, self.base_delay * (2 ** (attempt - 1))))
+
+    def is_retryable_error(self, error: Exception) -> bool:
+        """True for connection errors and timeouts"""
+        return isinstance(error, (requests.exceptions.ConnectionError, requests.exceptions.Timeout))
+
+    def is_retryable_status(self, status_code: int) -> bool:
+        """True for transient server errors"""
+        return status_code in RETRY_STATUS_CODES
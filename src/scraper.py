@@ -2,26 +2,86 @@
 Web scraper for Shopee product prices
 """
 import requests
-from bs4 import BeautifulSoup
-from typing import Dict, Optional
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import urlparse
 from config import config
 from logger import app_logger
-import json
+from http_session import get_shared_session
+from rate_limiter import CircuitOpenError, HostThrottle, get_shared_throttle
+from retry import Deadline, DeadlineExceeded, RetryPolicy
+from http_cache import HttpCache, cache_key, get_shared_http_cache
+from coalesce import Coalescer
+from item_ref import ItemRef, parse_item_ref
+from page_scanner import PageScanner, json_ld_product
+from page_tokens import PageTokens
+from page_encoding import Utf8Transcoder, page_encoding, response_body
+from json_codec import load_fields, loads, pick_fields
+from html_parser import Document, parse_html, resolve_backend
+from field_extractor import FieldExtractor
+from browser_pool import HAS_PYPPETEER, BrowserPoolFullError, get_browser_pool
+from stats import RunStats
+from strategy_stats import StrategyStats
+from extraction_cache import ExtractionCache, content_key
+from state_paths import LAYOUT_META, StatePathCache, iter_product_records, names_other_item, resolve_path
+from selector_templates import REQUIRED_FIELDS, SelectorTemplates
 import re
+import threading
+import time
+from contextlib import contextmanager
 from datetime import datetime
 
-try:
-    from requests_html import HTMLSession
-    HAS_REQUESTS_HTML = True
-except ImportError:
-    HAS_REQUESTS_HTML = False
+# Decoded size of a typical product page (see shopee_page.html), used to
+# estimate bytes saved before any page has been downloaded in a run
+ESTIMATED_PAGE_BYTES = 90 * 1024
+
+# Strategies in their default order; observed statistics reorder them per shop/region
+FETCH_STRATEGIES = ('api', 'page', 'render')
+EXTRACTION_STRATEGIES = ('json_ld', 'embedded_json', 'html')
 
 class ShopeeScraper:
     """Scrape product information from Shopee"""
     
-    def __init__(self):
-        """Initialize scraper"""
+    def __init__(self, session: Optional[requests.Session] = None,
+                 strategy_stats: Optional[StrategyStats] = None,
+                 throttle: Optional[HostThrottle] = None,
+                 retry_policy: Optional[RetryPolicy] = None,
+                 http_cache: Optional[HttpCache] = None,
+                 parser_backend: Optional[str] = None,
+                 state_paths: Optional[StatePathCache] = None,
+                 extraction_cache: Optional[ExtractionCache] = None,
+                 selector_templates: Optional[SelectorTemplates] = None):
+        """
+        Initialize scraper
+        
+        Args:
+            session: HTTP session to use (default: shared keep-alive pool)
+            strategy_stats: Strategy statistics (default: loaded from the cache directory)
+            throttle: Per-host rate limiter and circuit breaker (default: shared)
+            retry_policy: Retry policy for transient errors (default from config)
+            http_cache: Response cache for GET requests (default: shared, if enabled)
+            parser_backend: HTML parser backend (default from config)
+            state_paths: Learned product locations in embedded state (default: loaded from the cache directory)
+            extraction_cache: Products by response body hash (default: loaded from the cache directory, if enabled)
+            selector_templates: Learned field selectors per page layout (default: loaded from the cache directory)
+        """
         self.timeout = config.REQUEST_TIMEOUT
+        self.session = session or get_shared_session()
+        self.throttle = throttle or get_shared_throttle()
+        self.retry_policy = retry_policy or RetryPolicy()
+        self.http_cache = http_cache if http_cache is not None else get_shared_http_cache()
+        self.parser_backend = resolve_backend(parser_backend)
+        self.field_extractor = FieldExtractor()
+        # Products in flight, and inside run_scope() those already scraped, by product key
+        self._products = Coalescer()
+        # Deadline of the product being scraped on the current thread
+        self._local = threading.local()
+        self.stats = RunStats()
+        self.strategy_stats = strategy_stats or StrategyStats()
+        self.state_paths = state_paths if state_paths is not None else StatePathCache()
+        self.selector_templates = selector_templates if selector_templates is not None else SelectorTemplates()
+        if extraction_cache is None and config.EXTRACTION_CACHE_ENABLED:
+            extraction_cache = ExtractionCache()
+        self.extraction_cache = extraction_cache
         self.headers = {
             'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
             'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,image/apng,*/*;q=0.8',
@@ -35,63 +95,270 @@ class ShopeeScraper:
             'Cache-Control': 'max-age=0',
         }
     
-    def extract_product_id(self, url: str) -> Optional[str]:
-        """Extract product ID from Shopee URL"""
+    @contextmanager
+    def _deadline_scope(self, deadline: Deadline):
+        """Make a deadline apply to every fetch and render on this thread"""
+        previous = getattr(self._local, 'deadline', None)
+        self._local.deadline = deadline
         try:
-            # Format: https://shopee.xx/[product-name]-i.[shop-id].[product-id]
-            match = re.search(r'-i\.(\d+)\.(\d+)', url)
-            if match:
-                return match.group(2)
-            
-            # Alternative format without hyphen
-            match = re.search(r'i\.(\d+)\.(\d+)', url)
-            if match:
-                return match.group(2)
-            
-            return None
-        except Exception as e:
-            app_logger.error(f"Error extracting product ID: {e}")
-            return None
+            yield deadline
+        finally:
+            self._local.deadline = previous
     
-    def extract_shop_id_from_url(self, url: str) -> Optional[str]:
-        """Extract shop ID from Shopee URL"""
+    def _current_deadline(self) -> Deadline:
+        """Get the deadline in effect on this thread (unlimited if none)"""
+        return getattr(self._local, 'deadline', None) or Deadline()
+    
+    def _acquire_host(self, host: str, deadline: Deadline):
+        """Wait for the host's rate limit without overrunning the deadline"""
+        deadline.check(f"requesting {host}")
+        
         try:
-            # Format: https://shopee.xx/[product-name]-i.[shop-id].[product-id]
-            match = re.search(r'-i\.(\d+)\.(\d+)', url)
-            if match:
-                return match.group(1)
+            waited = self.throttle.before_request(host, timeout=deadline.remaining())
+        except CircuitOpenError:
+            self.stats.incr('circuit_rejections')
+            raise
+        
+        if waited is None:
+            raise DeadlineExceeded(f"Time budget exhausted waiting for the {host} rate limit")
+        if waited:
+            self.stats.incr('throttle_waits')
+            self.stats.incr('throttle_wait_seconds', waited)
+    
+    def fetch(self, url: str, headers: Optional[Dict] = None, method: str = 'GET',
+              retry: Optional[bool] = None, **kwargs) -> requests.Response:
+        """
+        Request a URL through the pooled session, within the host's rate limit
+        
+        Successful GET responses are cached on disk. Fresh cache entries are
+        served without a request; stale ones are revalidated with their
+        ETag/Last-Modified, and a 304 answer is served from the cache.
+        
+        Args:
+            url: URL to fetch
+            headers: Request headers (default: browser headers)
+            method: HTTP method
+            retry: Retry transient errors (default: only for GET/HEAD)
+            **kwargs: Extra arguments passed to requests (params, json, timeout, ...)
             
-            # Alternative format
-            match = re.search(r'i\.(\d+)\.(\d+)', url)
-            if match:
-                return match.group(1)
+        Returns:
+            Response object (from_cache is set on responses served from the cache)
             
-            return None
-        except Exception as e:
-            app_logger.error(f"Error extracting shop ID: {e}")
-            return None
+        Raises:
+            CircuitOpenError: If the host keeps blocking us and its circuit is open
+            DeadlineExceeded: If the time budget ran out
+        """
+        headers = headers or self.headers
+        if method != 'GET' or self.http_cache is None:
+            return self._send(url, headers, method, retry, **kwargs)
+        
+        key = cache_key(url, kwargs.get('params'))
+        entry = self.http_cache.lookup(key)
+        if entry and entry['fresh']:
+            response = self.http_cache.response(key, url)
+            if response is not None:
+                self.stats.incr('http_cache_hits')
+                self.stats.incr('http_cache_bytes_saved', entry['size'])
+                return response
+        
+        if entry:
+            response = self._send(url, {**headers, **self.http_cache.conditional_headers(entry)},
+                                  method, retry, **kwargs)
+        else:
+            response = self._send(url, headers, method, retry, **kwargs)
+        
+        if response.status_code == 304 and entry:
+            cached = self.http_cache.response(key, url)
+            if cached is not None:
+                self.http_cache.refresh(key)
+                self.stats.incr('http_cache_revalidated')
+                self.stats.incr('http_cache_bytes_saved', entry['size'])
+                return cached
+            # The body was evicted since lookup(): a 304 has none to return
+            app_logger.debug(f"Cached body of {url} is gone, fetching it again")
+            response = self._send(url, headers, method, retry, **kwargs)
+        
+        self.stats.incr('http_cache_misses')
+        if response.status_code == 200 and not kwargs.get('stream'):
+            self.http_cache.store(key, response)
+        return response
     
-    def extract_product_name_from_url(self, url: str) -> Optional[str]:
-        """Extract product name from Shopee URL slug"""
-        try:
-            # Extract the path from URL
-            from urllib.parse import urlparse
-            parsed = urlparse(url)
-            path = parsed.path.strip('/')
+    def _cache_streamed(self, url: str, response: requests.Response, body: bytes):
+        """Cache a streamed GET response once its whole body has been read"""
+        if self.http_cache is None or response.status_code != 200 or getattr(response, 'from_cache', False):
+            return
+        response._content = body
+        response._content_consumed = True
+        self.http_cache.store(cache_key(url), response)
+    
+    def _send(self, url: str, headers: Dict, method: str, retry: Optional[bool], **kwargs) -> requests.Response:
+        """
+        Send a request, retrying transient failures
+        
+        Transient errors (connection errors, timeouts, 5xx) are retried with
+        jittered exponential backoff. Timeouts and backoff are clamped to the
+        deadline of the product being scraped.
+        """
+        host = urlparse(url).netloc.lower()
+        deadline = self._current_deadline()
+        timeout = kwargs.pop('timeout', self.timeout)
+        if retry is None:
+            retry = method in ('GET', 'HEAD')
+        attempts = self.retry_policy.attempts if retry else 1
+        
+        attempt = 0
+        while True:
+            attempt += 1
+            self._acquire_host(host, deadline)
             
-            # Remove the "-i.shop_id.product_id" part at the end
-            # Format: product-name-i.123456.789
-            product_part = re.sub(r'-i\.\d+\.\d+$', '', path)
+            try:
+                response = self.session.request(
+                    method, url, headers=headers,
+                    timeout=deadline.clamp(timeout), **kwargs
+                )
+            except requests.exceptions.RequestException as e:
+                # A half-open circuit whose probe failed must reopen, not wait for a response
+                self.throttle.after_error(host)
+                if attempt >= attempts or not self.retry_policy.is_retryable_error(e):
+                    raise
+                app_logger.debug(f"Retrying {url} after error: {e}")
+            else:
+                if self.throttle.after_response(host, response):
+                    self.stats.incr('blocked_responses')
+                    app_logger.debug(f"HTTP {response.status_code} from {host}")
+                
+                if attempt >= attempts or not self.retry_policy.is_retryable_status(response.status_code):
+                    return response
+                app_logger.debug(f"Retrying {url} after HTTP {response.status_code}")
             
-            if product_part:
-                # Replace hyphens with spaces and capitalize
-                product_name = product_part.replace('-', ' ')
-                return product_name
+            delay = self.retry_policy.backoff(attempt)
+            remaining = deadline.remaining()
+            if remaining is not None and delay >= remaining:
+                raise DeadlineExceeded(f"Time budget exhausted retrying {url}")
             
-            return None
-        except Exception as e:
-            app_logger.debug(f"Error extracting product name from URL: {e}")
-            return None
+            self.stats.incr('retries')
+            time.sleep(delay)
+    
+    def reset_run_stats(self):
+        """Clear per-run counters and results (call at the start of a tracking run)"""
+        self.stats.reset()
+        self._products.clear()
+    
+    @contextmanager
+    def run_scope(self):
+        """
+        Reuse each product's result for the rest of a tracking run
+        
+        Outside a run scope only concurrent scrapes of a product are
+        coalesced, so a long-lived scraper never returns stale results.
+        Results are forgotten when the scope ends.
+        """
+        previous = self._products.memoize
+        self._products.memoize = True
+        try:
+            yield self
+        finally:
+            self._products.memoize = previous
+            if not previous:
+                self._products.clear()
+    
+    def run_report(self) -> Dict:
+        """
+        Summarize requests made and saved during the current run
+        
+        Returns:
+            Dictionary of counters plus requests/bytes saved by skipping pages
+        """
+        report = self.stats.snapshot()
+        html_requests = report.get('html_requests', 0)
+        skipped = report.get('html_pages_skipped', 0)
+        
+        if html_requests:
+            page_bytes = report.get('html_bytes', 0) / html_requests
+        else:
+            page_bytes = ESTIMATED_PAGE_BYTES
+        
+        report['requests_saved'] = skipped
+        report['bytes_saved'] = int(skipped * page_bytes)
+        
+        # Revalidated responses count as hits: only headers went over the wire
+        report['http_cache_hit_ratio'] = self.stats.ratio(
+            ('http_cache_hits', 'http_cache_revalidated'), 'http_cache_misses'
+        )
+        report['extraction_cache_hit_ratio'] = self.stats.ratio('extraction_cache_hits', 'extraction_cache_misses')
+        return report
+    
+    def save_state(self):
+        """Persist state learned during the run (strategy statistics, state paths, caches)"""
+        self.strategy_stats.save()
+        self.state_paths.save()
+        self.selector_templates.save()
+        if self.extraction_cache is not None:
+            self.extraction_cache.save()
+        if self.http_cache is not None:
+            self.http_cache.save()
+    
+    def log_run_stats(self):
+        """Log the per-run request report"""
+        report = self.run_report()
+        app_logger.info(
+            f"Fetch stats: {report.get('api_requests', 0)} API requests, "
+            f"{report.get('api_batch_requests', 0)} batch API requests, "
+            f"{report.get('html_requests', 0)} page requests "
+            f"({report.get('html_bytes', 0) / 1024:.0f} KB, {report.get('html_streams_stopped', 0)} stopped early "
+            f"saving {report.get('html_bytes_not_read', 0) / 1024:.0f} KB); "
+            f"API-first saved {report['requests_saved']} page requests "
+            f"(~{report['bytes_saved'] / 1024:.0f} KB)"
+        )
+        app_logger.info(
+            f"Throttle stats: {report.get('blocked_responses', 0)} blocked responses, "
+            f"{report.get('circuit_rejections', 0)} requests rejected by open circuits, "
+            f"{report.get('throttle_wait_seconds', 0):.1f}s waiting for rate limit, "
+            f"{report.get('retries', 0)} retries, {report.get('deferred', 0)} products deferred, "
+            f"{report.get('coalesced', 0)} duplicate scrapes avoided"
+        )
+        if report.get('state_path_hits') or report.get('state_path_misses'):
+            app_logger.info(
+                f"Embedded state: {report.get('state_path_hits', 0)} products found at a learned path, "
+                f"{report.get('state_path_misses', 0)} searched"
+            )
+        if report.get('selector_template_hits') or report.get('selector_template_misses'):
+            app_logger.info(
+                f"HTML selectors: {report.get('selector_template_hits', 0)} pages extracted with learned selectors, "
+                f"{report.get('selector_template_misses', 0)} with generic ones, "
+                f"{report.get('selector_template_invalidations', 0)} templates relearned"
+            )
+        if self.http_cache is not None:
+            app_logger.info(
+                f"HTTP cache: {report['http_cache_hit_ratio']:.0%} hit ratio "
+                f"({report.get('http_cache_hits', 0)} fresh, {report.get('http_cache_revalidated', 0)} revalidated, "
+                f"{report.get('http_cache_misses', 0)} misses), "
+                f"{report.get('http_cache_bytes_saved', 0) / 1024:.0f} KB not downloaded, "
+                f"{len(self.http_cache)} entries ({self.http_cache.size / 1024 / 1024:.1f} MB)"
+            )
+        if self.extraction_cache is not None:
+            app_logger.info(
+                f"Extraction cache: {report['extraction_cache_hit_ratio']:.0%} hit ratio "
+                f"({report.get('extraction_cache_hits', 0)} unchanged bodies not parsed, "
+                f"{report.get('extraction_cache_misses', 0)} misses), {len(self.extraction_cache)} entries"
+            )
+        for host, state in self.throttle.states().items():
+            app_logger.info(
+                f"  {host}: circuit {state['circuit']}, {state['blocked']} consecutive blocks, "
+                f"{state['tokens']} tokens"
+            )
+    
+    def extract_product_id(self, url: str) -> Optional[str]:
+        """Extract product ID from Shopee URL"""
+        return parse_item_ref(url).item_id
+    
+    def extract_shop_id_from_url(self, url: str) -> Optional[str]:
+        """Extract shop ID from Shopee URL"""
+        return parse_item_ref(url).shop_id
+    
+    def extract_product_name_from_url(self, url: str) -> Optional[str]:
+        """Extract product name from Shopee URL slug"""
+        return parse_item_ref(url).name
     
     def scrape_category_products(self, category_url: str) -> list:
         """
@@ -106,15 +373,10 @@ class ShopeeScraper:
         try:
             app_logger.info(f"Scraping category page: {category_url}")
             
-            response = requests.get(
-                category_url,
-                headers=self.headers,
-                timeout=self.timeout,
-                allow_redirects=True
-            )
+            response = self.fetch(category_url, allow_redirects=True)
             response.raise_for_status()
             
-            soup = BeautifulSoup(response.text, 'html.parser')
+            soup = parse_html(response_body(response), self.parser_backend)
             product_links = []
             
             # Try multiple selectors to find product links
@@ -147,41 +409,124 @@ class ShopeeScraper:
             app_logger.error(f"Error scraping category page: {e}")
             return []
     
-    def scrape_product(self, url: str) -> Optional[Dict]:
+    def product_key(self, url: str) -> Optional[Tuple[str, str, str]]:
+        """
+        Get the canonical key of a product URL
+        
+        Different slugs and query strings for the same item share a key.
+        
+        Args:
+            url: Product URL
+            
+        Returns:
+            (region, shop_id, product_id), or None if the URL has no item IDs
+        """
+        return parse_item_ref(url).key
+    
+    def unique_urls(self, urls: List[str]) -> List[str]:
+        """
+        Drop blank URLs and URLs of products already in the list
+        
+        Args:
+            urls: Product URLs
+            
+        Returns:
+            URLs in their original order, one per product
+        """
+        seen = set()
+        unique = []
+        for url in urls:
+            url = url.strip()
+            if not url:
+                continue
+            key = self.product_key(url) or url
+            if key not in seen:
+                seen.add(key)
+                unique.append(url)
+        
+        if len(unique) < len(urls):
+            app_logger.info(f"Skipping {len(urls) - len(unique)} duplicate product URLs")
+        return unique
+    
+    def is_scraped(self, url: str) -> bool:
+        """True if the URL's product is in flight (or, inside run_scope(), was already scraped)"""
+        return (self.product_key(url) or url) in self._products
+    
+    def scrape_product(self, url: str, deadline: Optional[Deadline] = None) -> Optional[Dict]:
         """
         Scrape product information from Shopee
         
+        Concurrent requests for the same product are coalesced: only the
+        first caller fetches, the others get a copy of its result. Inside
+        run_scope() repeated requests reuse the result too.
+        
         Args:
             url: Product URL
+            deadline: Deadline of the enclosing tracking cycle
             
         Returns:
             Dictionary with product data or None if failed
+            
+        Raises:
+            DeadlineExceeded: If a deadline was given and the time budget ran
+                out, so the caller can defer the product to the next cycle
         """
+        ref = parse_item_ref(url)
+        wait = Deadline(config.PRODUCT_DEADLINE).within(deadline).remaining()
         try:
-            app_logger.info(f"Scraping: {url}")
-            
-            # Try JavaScript-enabled scraping first if available
-            if HAS_REQUESTS_HTML:
-                app_logger.debug("Playwright available - attempting JavaScript rendering")
-                product_data = self._scrape_with_js_render(url)
+            product_data, shared = self._products.run(
+                ref.key or url, lambda: self._scrape_product(ref, deadline), timeout=wait
+            )
+        except TimeoutError as e:
+            if deadline is not None:
+                raise DeadlineExceeded(str(e))
+            app_logger.warning(str(e))
+            return None
+        
+        if not shared:
+            return product_data
+        
+        self.stats.incr('coalesced')
+        app_logger.debug(f"Reusing result scraped this run for {url}")
+        return dict(product_data, url=url) if product_data else None
+    
+    def _scrape_product(self, ref: ItemRef, deadline: Optional[Deadline] = None) -> Optional[Dict]:
+        """
+        Scrape one product with every fetch strategy
+        
+        Every fetch and render is bounded by PRODUCT_DEADLINE and by the
+        caller's deadline, if given.
+        """
+        url = ref.url
+        budget = Deadline(config.PRODUCT_DEADLINE).within(deadline)
+        
+        try:
+            with self._deadline_scope(budget):
+                app_logger.info(f"Scraping: {url}")
+                
+                product_data = self._run_fetch_strategies(ref)
                 if product_data:
+                    app_logger.info(f"Successfully scraped: {product_data.get('name')}")
                     return product_data
             
-            # Fallback to regular requests
-            app_logger.debug("Falling back to regular requests")
-            product_data = self._scrape_with_regular_requests(url)
+            budget.check(f"falling back to demo data for {url}")
             
-            if product_data:
-                app_logger.info(f"Successfully scraped: {product_data.get('name')}")
-            else:
-                # If all real scraping failed, inform user
-                product_id = self.extract_product_id(url)
-                app_logger.warning(f"Could not extract real price data from: {url}")
-                app_logger.info(f"Hint: Try accessing {url} directly in a browser to check if product exists")
-                app_logger.info(f"Product ID extracted: {product_id}")
+            # If all real scraping failed, inform user
+            app_logger.warning(f"Could not extract real price data from: {url}")
+            app_logger.info(f"Hint: Try accessing {url} directly in a browser to check if product exists")
+            app_logger.info(f"Product ID extracted: {ref.item_id}")
             
-            return product_data
+            # Fallback to demo data
+            return self._get_demo_data(ref)
             
+        except DeadlineExceeded as e:
+            if deadline is not None:
+                self.stats.incr('deferred')
+                app_logger.warning(f"Deferring {url}: {e}")
+                raise
+            # A product that ran out of time is not a blocked one: no demo data
+            app_logger.warning(f"{e} for {url}")
+            return None
         except requests.exceptions.RequestException as e:
             app_logger.error(f"Request error for {url}: {e}")
             return None
@@ -189,195 +534,438 @@ class ShopeeScraper:
             app_logger.error(f"Error scraping {url}: {e}")
             return None
     
-    def _scrape_with_js_render(self, url: str) -> Optional[Dict]:
-        """Scrape with JavaScript rendering using requests-html"""
+    def _strategy_scopes(self, ref: ItemRef) -> List[str]:
+        """Scopes that strategy statistics are kept for (region, then shop)"""
+        scopes = [ref.region]
+        if ref.shop_id:
+            scopes.append(f"shop:{ref.shop_id}")
+        return scopes
+    
+    def _timed_strategy(self, strategy: str, scopes: List[str], runner, *args) -> Optional[Dict]:
+        """
+        Run a strategy and record its outcome and latency
+        
+        A request rejected by an open circuit is not recorded: the strategy
+        never ran, and counting it would switch the strategy off for hours.
+        Running out of time waiting for the rate limit is not recorded
+        either (DeadlineExceeded propagates).
+        """
+        started = time.monotonic()
         try:
-            app_logger.debug(f"Attempting JavaScript rendering for {url}")
-            session = HTMLSession()
+            result = runner(*args)
+        except CircuitOpenError as e:
+            app_logger.debug(f"Skipping {strategy}: {e}")
+            return None
+        self.strategy_stats.record(strategy, scopes, result is not None, time.monotonic() - started)
+        return result
+    
+    def _run_fetch_strategies(self, ref: ItemRef) -> Optional[Dict]:
+        """
+        Try item API, page download and JavaScript rendering in expected-cost order
+        
+        Args:
+            ref: Product reference
             
-            try:
-                response = session.get(
-                    url,
-                    headers=self.headers,
-                    timeout=self.timeout
-                )
-                # Render JavaScript with longer timeout
-                app_logger.debug("Rendering JavaScript...")
-                response.html.render(timeout=30, keep_page=True)
-                
-                # Try to extract from rendered HTML
-                soup = BeautifulSoup(response.html.html, 'html.parser')
-                app_logger.debug(f"Rendered HTML length: {len(response.html.html)}")
-                
-                product_data = self._extract_from_html(soup, url)
-                
-                if product_data:
-                    app_logger.info("Successfully extracted data with JavaScript rendering")
-                
+        Returns:
+            Product data or None if every strategy failed
+        """
+        scopes = self._strategy_scopes(ref)
+        strategies = [s for s in FETCH_STRATEGIES if s != 'render' or HAS_PYPPETEER]
+        
+        # Rendering is only worth its cost where it has been seen to work
+        order = self.strategy_stats.order(
+            strategies, scopes, min_success={'render': config.RENDER_MIN_SUCCESS_RATE}
+        )
+        app_logger.debug(f"Strategy order for {ref.url}: {', '.join(order)}")
+        
+        runners = {
+            'api': self._try_shopee_mobile_api,
+            'page': self._scrape_page,
+            'render': self._scrape_with_js_render,
+        }
+        
+        deadline = self._current_deadline()
+        page_fetched = False
+        for strategy in order:
+            deadline.check(f"trying {strategy} for {ref.url}")
+            product_data = self._timed_strategy(strategy, scopes, runners[strategy], ref)
+            if product_data:
+                if strategy == 'api' and not page_fetched:
+                    # The product page download (and render) was not needed
+                    self.stats.incr('html_pages_skipped')
                 return product_data
-            finally:
-                session.close()
+            page_fetched = page_fetched or strategy != 'api'
+        
+        return None
+    
+    def _scrape_with_js_render(self, ref: ItemRef) -> Optional[Dict]:
+        """Scrape with JavaScript rendering using the shared browser pool"""
+        url = ref.url
+        try:
+            app_logger.debug(f"Attempting JavaScript rendering for {url}")
+            
+            # Rendered page loads count against the host's rate limit too
+            deadline = self._current_deadline()
+            self._acquire_host(urlparse(url).netloc.lower(), deadline)
+            html = get_browser_pool().render(url, timeout=deadline.clamp(config.RENDER_TIMEOUT))
+            if not html:
+                return None
+            
+            # Try to extract from rendered HTML
+            soup = parse_html(html, self.parser_backend)
+            app_logger.debug(f"Rendered HTML length: {len(html)}")
+            
+            product_data = self._extract_from_html(soup, ref)
+            
+            if product_data:
+                app_logger.info("Successfully extracted data with JavaScript rendering")
+            
+            return product_data
+        except BrowserPoolFullError as e:
+            app_logger.debug(f"Skipping JavaScript rendering: {e}")
+            return None
+        except (DeadlineExceeded, CircuitOpenError):
+            raise
         except Exception as e:
             app_logger.debug(f"JavaScript rendering failed: {e}")
             return None
     
-    def _scrape_with_regular_requests(self, url: str) -> Optional[Dict]:
-        """Scrape using regular requests (without JS rendering)"""
+    def _scrape_page(self, ref: ItemRef) -> Optional[Dict]:
+        """Download the product page and run the extraction methods on it"""
         try:
-            response = requests.get(
-                url,
-                headers=self.headers,
-                timeout=self.timeout,
-                allow_redirects=True
-            )
-            response.raise_for_status()
+            if not config.STREAM_PAGES:
+                response = self.fetch(ref.url, allow_redirects=True)
+                self.stats.incr('html_requests')
+                self.stats.incr('html_bytes', len(response.content))
+                response.raise_for_status()
+                
+                # Try multiple extraction methods
+                return self._extract_cached(
+                    'page', ref, response.content,
+                    lambda: self._try_extraction_methods(response_body(response), ref)
+                )
             
-            # Try multiple extraction methods
-            product_data = self._try_extraction_methods(response.text, url)
+            response = self.fetch(ref.url, allow_redirects=True, stream=True)
+            self.stats.incr('html_requests')
+            try:
+                response.raise_for_status()
+                product_data, page, body = self._scan_page(response, ref)
+            finally:
+                # Drops the connection if the body was not read to the end
+                response.close()
             
-            # Fallback to demo data if real scraping fails
-            if not product_data:
-                product_data = self._get_demo_data(url)
+            if product_data:
+                return product_data
             
-            return product_data
+            # Try multiple extraction methods
+            return self._extract_cached(
+                'page', ref, body,
+                lambda: self._try_extraction_methods(page, ref)
+            )
+        except (DeadlineExceeded, CircuitOpenError):
+            raise
         except Exception as e:
             app_logger.debug(f"Regular scraping failed: {e}")
-            # Use demo data as fallback
-            return self._get_demo_data(url)
-    
-    def _try_extraction_methods(self, html_content: str, url: str) -> Optional[Dict]:
-        """Try multiple extraction methods in order"""
-        # Method 0: Try Shopee's mobile API endpoint (most reliable)
-        result = self._try_shopee_mobile_api(url)
-        if result:
-            return result
-        
-        # Method 1: Try JSON-LD structured data
-        result = self._extract_from_json_ld(html_content, url)
-        if result:
-            return result
-        
-        # Method 2: Try embedded JSON state
-        result = self._extract_from_embedded_json(html_content, url)
-        if result:
-            return result
-        
-        # Method 3: Try HTML parsing
-        soup = BeautifulSoup(html_content, 'html.parser')
-        result = self._extract_from_html(soup, url)
-        if result:
-            return result
+            return None
+    
+    def _scan_page(self, response: requests.Response,
+                   ref: ItemRef) -> Tuple[Optional[Dict], Optional[bytes], Optional[bytes]]:
+        """
+        Read a streamed page, stopping as soon as name and price are found
+        
+        The page is scanned as UTF-8 bytes. The encoding is decided from the
+        headers and the first chunk; only pages in another encoding are
+        transcoded (and keep their raw chunks for the response cache).
+        
+        Args:
+            response: Streamed response
+            ref: Product reference
+            
+        Returns:
+            (product data, None, None) if found early, else (None, UTF-8 page, raw body)
+        """
+        scanner = PageScanner()
+        transcoder = None
+        chunks = []
+        read = 0
+        for chunk in response.iter_content(config.STREAM_CHUNK_SIZE):
+            if transcoder is None:
+                transcoder = Utf8Transcoder(page_encoding(response.headers.get('Content-Type'), chunk))
+            if not transcoder.passthrough:
+                chunks.append(chunk)
+            read += len(chunk)
+            self.stats.incr('html_bytes', len(chunk))
+            found = scanner.feed(transcoder.feed(chunk))
+            if found:
+                self.stats.incr('html_streams_stopped')
+                length = response.headers.get('Content-Length', '')
+                if length.isdigit():
+                    self.stats.incr('html_bytes_not_read', max(0, int(length) - read))
+                return self._build_listed_product(ref, *found), None, None
+        
+        if transcoder is not None:
+            found = scanner.feed(transcoder.feed(b'', final=True))
+        page = bytes(scanner.data)
+        body = page if transcoder is None or transcoder.passthrough else b''.join(chunks)
+        self._cache_streamed(ref.url, response, body)
+        if found:
+            return self._build_listed_product(ref, *found), None, None
+        return None, page, body
+    
+    def _extract_cached(self, kind: str, ref: ItemRef, body: bytes, extract) -> Optional[Dict]:
+        """
+        Extract a product from a response body unless the same body was seen before
+        
+        Args:
+            kind: "page" or "api"
+            ref: Product reference
+            body: Raw response body
+            extract: Runs the extraction (called on a miss)
+            
+        Returns:
+            Product data or None
+        """
+        if self.extraction_cache is None:
+            return extract()
+        
+        key = content_key(kind, ref.key or ref.url, body)
+        product_data = self.extraction_cache.get(key, ref.url, ref.item_id)
+        if product_data is not None:
+            self.stats.incr('extraction_cache_hits')
+            return product_data
+        
+        self.stats.incr('extraction_cache_misses')
+        product_data = extract()
+        if product_data:
+            self.extraction_cache.put(key, product_data)
+        return product_data
+    
+    def _try_extraction_methods(self, page: bytes, ref: ItemRef) -> Optional[Dict]:
+        """
+        Try extraction methods on a downloaded page in expected-cost order
+        
+        The item API is tried before the page is downloaded. The page is
+        tokenized once for the script-based methods and parsed into a tree
+        only if the HTML method runs.
+        """
+        scopes = self._strategy_scopes(ref)
+        tokens = PageTokens(page)
+        extractors = {
+            'json_ld': lambda: self._extract_from_json_ld(tokens, ref),
+            'embedded_json': lambda: self._extract_from_embedded_json(tokens, ref),
+            'html': lambda: self._extract_from_html(
+                parse_html(page, self.parser_backend), ref, tokens.meta.get(LAYOUT_META)
+            ),
+        }
+        
+        for strategy in self.strategy_stats.order(EXTRACTION_STRATEGIES, scopes):
+            result = self._timed_strategy(strategy, scopes, extractors[strategy])
+            if result:
+                return result
         
         return None
     
-    def _try_shopee_mobile_api(self, url: str) -> Optional[Dict]:
+    def _api_headers(self) -> Dict:
+        """Headers for Shopee API requests (mobile user agent)"""
+        mobile_headers = self.headers.copy()
+        mobile_headers['User-Agent'] = 'Mozilla/5.0 (Linux; Android 10) AppleWebKit/537.36'
+        return mobile_headers
+    
+    def _try_shopee_mobile_api(self, ref: ItemRef) -> Optional[Dict]:
         """Try Shopee's mobile API endpoint"""
         try:
-            # Extract IDs from URL
-            shop_id = self.extract_shop_id_from_url(url)
-            product_id = self.extract_product_id(url)
-            
-            if not shop_id or not product_id:
+            if not ref.key:
                 return None
             
-            app_logger.debug(f"Trying Shopee mobile API for shop={shop_id}, item={product_id}")
+            app_logger.debug(f"Trying Shopee mobile API for shop={ref.shop_id}, item={ref.item_id}")
             
             # Shopee mobile API endpoint
-            api_url = f"https://shopee.ph/api/v2/item/get"
+            api_url = f"{ref.api_base}/api/v2/item/get"
             
             params = {
-                'itemid': product_id,
-                'shopid': shop_id,
+                'itemid': ref.item_id,
+                'shopid': ref.shop_id,
             }
             
-            # Mobile user agent
-            mobile_headers = self.headers.copy()
-            mobile_headers['User-Agent'] = 'Mozilla/5.0 (Linux; Android 10) AppleWebKit/537.36'
-            
-            response = requests.get(
-                api_url,
-                params=params,
-                headers=mobile_headers,
-                timeout=self.timeout
-            )
+            response = self.fetch(api_url, params=params, headers=self._api_headers())
+            self.stats.incr('api_requests')
+            self.stats.incr('api_bytes', len(response.content))
             
             if response.status_code == 200:
-                data = response.json()
-                
-                if 'data' in data:
-                    product = data['data']
-                    
-                    name = product.get('name', '').strip()
-                    price_val = product.get('price')
-                    
-                    if name and price_val:
-                        try:
-                            price = int(price_val) / 100000  # Shopee API returns price in smallest unit
-                            
-                            return {
-                                'product_id': product_id,
-                                'name': name,
-                                'url': url,
-                                'price': price,
-                                'original_price': int(product.get('price_before_discount', price_val)) / 100000,
-                                'discount': int(product.get('discount', 0)),
-                                'shop_name': product.get('shop', {}).get('name', 'Shopee'),
-                                'rating': product.get('rating', {}).get('rating_star'),
-                                'timestamp': datetime.now().isoformat()
-                            }
-                        except (ValueError, TypeError, ZeroDivisionError):
-                            pass
+                return self._extract_cached(
+                    'api', ref, response.content,
+                    lambda: self._build_product_from_api_body(response.content, ref)
+                )
             
             return None
+        except (DeadlineExceeded, CircuitOpenError):
+            raise
         except Exception as e:
             app_logger.debug(f"Shopee API error: {e}")
             return None
     
-    def _extract_from_json_ld(self, html_content: str, url: str) -> Optional[Dict]:
-        """Extract from JSON-LD structured data"""
+    def _build_product_from_api_body(self, body: bytes, ref: ItemRef) -> Optional[Dict]:
+        """Build product dict from an item API response body"""
+        # Only the fields the product is built from are kept
+        item = load_fields(body, 'data')
+        if item is None:
+            return None
+        return self._build_product_from_api_item(item, ref)
+    
+    def _build_product_from_api_item(self, product: Dict, ref: ItemRef) -> Optional[Dict]:
+        """Build product dict from a Shopee API item record"""
+        name = str(product.get('name') or '').strip()
+        price_val = product.get('price')
+        
+        if not name or not price_val:
+            return None
+        
         try:
-            # Look for JSON-LD data
-            json_ld_matches = re.findall(r'<script type="application/ld\+json">(.*?)</script>', html_content, re.DOTALL)
+            price = int(price_val) / 100000  # Shopee API returns price in smallest unit
             
-            for json_str in json_ld_matches:
-                try:
-                    data = json.loads(json_str)
+            # Item list records use "32%" style discounts, shop_name and item_rating
+            discount = product.get('raw_discount', product.get('discount', 0))
+            if isinstance(discount, str):
+                discount = discount.rstrip('%') or 0
+            shop_name = product.get('shop', {}).get('name') or product.get('shop_name') or 'Shopee'
+            rating = product.get('rating') or product.get('item_rating') or {}
+            
+            return {
+                'product_id': ref.item_id,
+                'name': name,
+                'url': ref.url,
+                'price': price,
+                'original_price': int(product.get('price_before_discount', price_val)) / 100000,
+                'discount': int(discount),
+                'shop_name': shop_name,
+                'rating': rating.get('rating_star'),
+                'timestamp': datetime.now().isoformat()
+            }
+        except (ValueError, TypeError, ZeroDivisionError, AttributeError):
+            return None
+    
+    def fetch_products_batch(self, urls: List[str], deadline: Optional[Deadline] = None) -> Dict[str, Dict]:
+        """
+        Fetch many products with a few item-list API requests
+        
+        URLs are grouped by Shopee region and ordered by shop, so items from
+        the same shop share a request. Duplicate URLs and products already
+        scraped this run are not requested again. URLs the API does not
+        return, or not reached before the deadline, are left for
+        scrape_product, which reuses the batch results inside run_scope().
+        
+        Args:
+            urls: Product URLs
+            deadline: Deadline of the enclosing tracking cycle
+            
+        Returns:
+            Mapping of URL to product data for every item the API returned
+        """
+        batch_size = config.API_BATCH_SIZE
+        if batch_size < 2:
+            return {}
+        
+        groups = {}
+        for url in self.unique_urls(urls):
+            ref = parse_item_ref(url)
+            if ref.key and ref.key not in self._products:
+                groups.setdefault(ref.api_base, []).append(ref)
+        
+        results = {}
+        with self._deadline_scope(deadline or Deadline()):
+            for api_base, items in groups.items():
+                # A single item is cheaper through the regular item API
+                if len(items) < 2:
+                    continue
+                
+                items.sort(key=lambda ref: int(ref.shop_id))
+                for start in range(0, len(items), batch_size):
+                    try:
+                        chunk = self._fetch_item_list(api_base, items[start:start + batch_size])
+                    except DeadlineExceeded as e:
+                        app_logger.warning(f"Stopping batch fetch: {e}")
+                        return results
                     
-                    # Check if it's a Product
-                    if data.get('@type') == 'Product' or ('name' in data and 'offers' in data):
-                        name = data.get('name', '').strip()
-                        
-                        if not name:
-                            continue
-                        
-                        # Extract price
-                        price = None
-                        if 'offers' in data:
-                            offers = data['offers']
-                            if isinstance(offers, list) and offers:
-                                price = offers[0].get('price')
-                            elif isinstance(offers, dict):
-                                price = offers.get('price')
-                        
-                        if price:
-                            try:
-                                price = float(price)
-                                product_id = self.extract_product_id(url)
-                                
-                                return {
-                                    'product_id': product_id,
-                                    'name': name,
-                                    'url': url,
-                                    'price': price,
-                                    'original_price': price,
-                                    'discount': 0,
-                                    'shop_name': 'Shopee',
-                                    'rating': None,
-                                    'timestamp': datetime.now().isoformat()
-                                }
-                            except ValueError:
-                                pass
-                except (json.JSONDecodeError, KeyError, TypeError):
+                    # Later scrape_product calls for these products reuse the batch results
+                    for url, product_data in chunk.items():
+                        self._products.remember(parse_item_ref(url).key, product_data)
+                    results.update(chunk)
+        
+        if results:
+            app_logger.info(
+                f"Batch API returned {len(results)}/{len(urls)} products "
+                f"in {int(self.stats.get('api_batch_requests'))} request(s)"
+            )
+        return results
+    
+    def _fetch_item_list(self, api_base: str, items: List[ItemRef]) -> Dict[str, Dict]:
+        """
+        Fetch one chunk of items through Shopee's item-list endpoint
+        
+        Args:
+            api_base: API origin for the region
+            items: Product references
+            
+        Returns:
+            Mapping of URL to product data
+        """
+        try:
+            body = {
+                'shop_item_ids': [
+                    {'shopid': int(ref.shop_id), 'itemid': int(ref.item_id)}
+                    for ref in items
+                ]
+            }
+            
+            # The item-list endpoint only reads, so it is safe to retry
+            response = self.fetch(
+                f"{api_base}/api/v4/item/get_list",
+                method='POST',
+                retry=True,
+                json=body,
+                headers=self._api_headers()
+            )
+            self.stats.incr('api_batch_requests')
+            self.stats.incr('api_bytes', len(response.content))
+            
+            if response.status_code != 200:
+                app_logger.debug(f"Batch API returned HTTP {response.status_code}")
+                return {}
+            
+            records = loads(response.content).get('data') or []
+            if isinstance(records, dict):
+                records = records.get('items') or []
+            
+            by_key = {}
+            for record in records:
+                record = pick_fields(record)
+                if record is not None:
+                    by_key[(str(record.get('shopid')), str(record.get('itemid')))] = record
+            
+            # Split the response back into one record per URL
+            results = {}
+            for ref in items:
+                record = by_key.get((ref.shop_id, ref.item_id))
+                product_data = self._build_product_from_api_item(record, ref) if record else None
+                if product_data:
+                    results[ref.url] = product_data
+                    self.stats.incr('html_pages_skipped')
+            return results
+        except DeadlineExceeded:
+            raise
+        except Exception as e:
+            app_logger.debug(f"Batch API error: {e}")
+            return {}
+    
+    def _extract_from_json_ld(self, tokens: PageTokens, ref: ItemRef) -> Optional[Dict]:
+        """Extract from JSON-LD structured data"""
+        try:
+            for data in tokens.json_ld():
+                try:
+                    found = json_ld_product(data)
+                    if found:
+                        return self._build_listed_product(ref, *found)
+                except (KeyError, TypeError, AttributeError):
                     pass
             
             return None
@@ -385,61 +973,73 @@ class ShopeeScraper:
             app_logger.debug(f"Error extracting from JSON-LD: {e}")
             return None
     
-    def _extract_from_embedded_json(self, html_content: str, url: str) -> Optional[Dict]:
-        """Extract from embedded JSON in script tags"""
+    def _build_listed_product(self, ref: ItemRef, name: str, price: float) -> Dict:
+        """Build product dict from a name and price (JSON-LD or meta tags)"""
+        return {
+            'product_id': ref.item_id,
+            'name': name,
+            'url': ref.url,
+            'price': price,
+            'original_price': price,
+            'discount': 0,
+            'shop_name': 'Shopee',
+            'rating': None,
+            'timestamp': datetime.now().isoformat()
+        }
+    
+    def _extract_from_embedded_json(self, tokens: PageTokens, ref: ItemRef) -> Optional[Dict]:
+        """Extract from embedded JSON in script tags (__INITIAL_STATE__, __data__, var assignments)"""
         try:
-            # Look for __INITIAL_STATE__ or similar
-            patterns = [
-                r'window\.__INITIAL_STATE__\s*=\s*({.*?})\s*;',
-                r'__data__\s*=\s*({.*?})\s*;',
-                r'<script>\s*var\s+\w+\s*=\s*({.*?})\s*</script>',
-            ]
-            
-            for pattern in patterns:
-                matches = re.finditer(pattern, html_content, re.DOTALL)
-                for match in matches:
-                    try:
-                        state = json.loads(match.group(1))
-                        result = self._find_product_in_state(state, url)
-                        if result:
-                            return result
-                    except (json.JSONDecodeError, KeyError, TypeError, ValueError):
-                        pass
+            layout = tokens.meta.get(LAYOUT_META, '')
+            for state in tokens.states:
+                try:
+                    data = state.value
+                    if data is None:
+                        continue
+                    result = self._find_product_in_state(data, ref, f"{layout}|{state.kind}")
+                    if result:
+                        return result
+                except (KeyError, TypeError, ValueError):
+                    pass
             
             return None
         except Exception as e:
             app_logger.debug(f"Error extracting from embedded JSON: {e}")
             return None
     
-    def _find_product_in_state(self, data, url: str, depth: int = 0) -> Optional[Dict]:
-        """Recursively search for product data in JSON structure"""
-        if depth > 10:  # Prevent infinite recursion
-            return None
+    def _find_product_in_state(self, data, ref: ItemRef, layout: str) -> Optional[Dict]:
+        """
+        Find the product record in a decoded state object
         
-        try:
-            if isinstance(data, dict):
-                # Check if this looks like product data
-                if 'price' in data and 'name' in data:
-                    return self._build_product_from_data(data, url)
-                
-                # Recurse through dict values
-                for key, value in data.items():
-                    result = self._find_product_in_state(value, url, depth + 1)
-                    if result:
-                        return result
-            
-            elif isinstance(data, list):
-                # Check each item in list
-                for item in data:
-                    result = self._find_product_in_state(item, url, depth + 1)
-                    if result:
-                        return result
+        The path learned for the page layout is tried first; on a miss the
+        state is searched depth first and the path found is learned.
+        
+        Args:
+            data: Decoded state object
+            ref: Product reference
+            layout: Layout version and state kind
             
-            return None
-        except (TypeError, AttributeError):
-            return None
+        Returns:
+            Product data, or None if no record builds a product
+        """
+        path = self.state_paths.get(layout, ref.item_id, ref.shop_id)
+        if path is not None:
+            record = resolve_path(data, path)
+            if isinstance(record, dict) and not names_other_item(record, ref.item_id):
+                result = self._build_product_from_data(record, ref)
+                if result:
+                    self.stats.incr('state_path_hits')
+                    return result
+        
+        self.stats.incr('state_path_misses')
+        for path, record in iter_product_records(data, ref.item_id):
+            result = self._build_product_from_data(record, ref)
+            if result:
+                self.state_paths.learn(layout, path, ref.item_id, ref.shop_id)
+                return result
+        return None
     
-    def _build_product_from_data(self, data: Dict, url: str) -> Optional[Dict]:
+    def _build_product_from_data(self, data: Dict, ref: ItemRef) -> Optional[Dict]:
         """Build product dict from extracted data"""
         try:
             name = str(data.get('name', '')).strip()
@@ -455,12 +1055,10 @@ class ShopeeScraper:
             except (ValueError, TypeError):
                 return None
             
-            product_id = self.extract_product_id(url)
-            
             return {
-                'product_id': product_id,
+                'product_id': ref.item_id,
                 'name': name,
-                'url': url,
+                'url': ref.url,
                 'price': price,
                 'original_price': float(data.get('original_price', price)),
                 'discount': float(data.get('discount', 0)),
@@ -472,32 +1070,59 @@ class ShopeeScraper:
             app_logger.debug(f"Error building product from data: {e}")
             return None
     
-    def _extract_from_html(self, soup: BeautifulSoup, url: str) -> Optional[Dict]:
+    def _extract_fields(self, soup: Document, layout: Optional[str]) -> Dict:
+        """
+        Extract the product fields of a page, with the learned selectors of its layout if any
+        
+        Args:
+            soup: Parsed page
+            layout: Layout version of the page (None if unknown)
+            
+        Returns:
+            Fields as returned by FieldExtractor.extract
+        """
+        if not layout:
+            return self.field_extractor.extract(soup)
+        
+        extractor = self.selector_templates.extractor(layout)
+        if extractor is not None:
+            fields, sources = extractor.extract_with_sources(soup)
+            if all(fields[field] is not None for field in REQUIRED_FIELDS):
+                self.stats.incr('selector_template_hits')
+                # Picks up fields this layout had not shown yet
+                self.selector_templates.learn(layout, sources)
+                return fields
+            self.stats.incr('selector_template_invalidations')
+            self.selector_templates.invalidate(layout)
+        
+        self.stats.incr('selector_template_misses')
+        fields, sources = self.field_extractor.extract_with_sources(soup)
+        self.selector_templates.learn(layout, sources)
+        return fields
+    
+    def _extract_from_html(self, soup: Document, ref: ItemRef, layout: Optional[str] = None) -> Optional[Dict]:
         """Extract product data from HTML structure"""
         try:
-            product_id = self.extract_product_id(url)
-            
-            # Extract title
-            title = self._extract_title(soup)
+            fields = self._extract_fields(soup, layout)
+
+            title = fields['title']
             if not title:
-                app_logger.debug(f"Could not extract title from {url}")
+                app_logger.debug(f"Could not extract title from {ref.url}")
                 return None
             
-            # Extract price
-            price = self._extract_price(soup)
+            price = fields['price']
             if price is None:
-                app_logger.debug(f"Could not extract price from {url}")
+                app_logger.debug(f"Could not extract price from {ref.url}")
                 return None
             
-            # Extract other fields
-            discount = self._extract_discount(soup)
-            shop_name = self._extract_shop_name(soup)
-            rating = self._extract_rating(soup)
+            discount = fields['discount']
+            shop_name = fields['shop_name']
+            rating = fields['rating']
             
             return {
-                'product_id': product_id,
+                'product_id': ref.item_id,
                 'name': title,
-                'url': url,
+                'url': ref.url,
                 'price': price,
                 'original_price': price,
                 'discount': discount or 0,
@@ -509,165 +1134,7 @@ class ShopeeScraper:
             app_logger.error(f"Error extracting from HTML: {e}")
             return None
     
-    def _extract_title(self, soup: BeautifulSoup) -> Optional[str]:
-        """Extract product title"""
-        try:
-            # Try meta tags
-            og_title = soup.find('meta', {'property': 'og:title'})
-            if og_title and og_title.get('content'):
-                title = og_title['content'].strip()
-                if title:
-                    return title
-            
-            # Try page title
-            title_tag = soup.find('title')
-            if title_tag and title_tag.string:
-                title = title_tag.string.strip()
-                if '|' in title:
-                    title = title.split('|')[0].strip()
-                if title:
-                    return title
-            
-            # Try h1
-            h1 = soup.find('h1')
-            if h1:
-                text = h1.get_text(strip=True)
-                if text:
-                    return text
-            
-            # Try data attributes
-            for selector in ['[data-testid*="product"]', '[class*="product-title"]', '[class*="product-name"]']:
-                elements = soup.select(selector)
-                for elem in elements:
-                    text = elem.get_text(strip=True)
-                    if text and len(text) > 5:
-                        return text
-            
-            return None
-        except Exception as e:
-            app_logger.debug(f"Error extracting title: {e}")
-            return None
-    
-    def _extract_price(self, soup: BeautifulSoup) -> Optional[float]:
-        """Extract product price"""
-        try:
-            # Try multiple price selectors
-            price_selectors = [
-                '[data-testid*="price"]',
-                '[class*="price"]',
-                '.product-price',
-                '.current-price',
-                '[itemprop="price"]',
-                'span[class*="price"]',
-            ]
-            
-            for selector in price_selectors:
-                try:
-                    elements = soup.select(selector)
-                    for element in elements:
-                        text = element.get_text(strip=True)
-                        if not text:
-                            continue
-                        
-                        # Extract numbers
-                        numbers = re.findall(r'[\d,]+\.?\d*', text)
-                        for num_str in numbers:
-                            try:
-                                price = float(num_str.replace(',', ''))
-                                if 10 < price < 1000000:  # Sanity check
-                                    return price
-                            except ValueError:
-                                pass
-                except Exception:
-                    continue
-            
-            return None
-        except Exception as e:
-            app_logger.debug(f"Error extracting price: {e}")
-            return None
-    
-    def _extract_discount(self, soup: BeautifulSoup) -> Optional[float]:
-        """Extract discount percentage"""
-        try:
-            discount_selectors = [
-                '[data-testid*="discount"]',
-                '[class*="discount"]',
-                '.product-discount',
-            ]
-            
-            for selector in discount_selectors:
-                elements = soup.select(selector)
-                for element in elements:
-                    text = element.get_text(strip=True)
-                    numbers = re.findall(r'(\d+)', text)
-                    if numbers:
-                        try:
-                            return float(numbers[0])
-                        except ValueError:
-                            pass
-            
-            return None
-        except Exception as e:
-            app_logger.debug(f"Error extracting discount: {e}")
-            return None
-    
-    def _extract_shop_name(self, soup: BeautifulSoup) -> str:
-        """Extract shop name"""
-        try:
-            shop_selectors = [
-                '[data-testid*="shop"]',
-                '[class*="shop-name"]',
-                '[class*="seller"]',
-                '.shop-name',
-            ]
-            
-            for selector in shop_selectors:
-                try:
-                    element = soup.select_one(selector)
-                    if element:
-                        text = element.get_text(strip=True)
-                        if text:
-                            return text
-                except Exception:
-                    pass
-            
-            return "Shopee"
-        except Exception as e:
-            app_logger.debug(f"Error extracting shop name: {e}")
-            return "Shopee"
-    
-    def _extract_rating(self, soup: BeautifulSoup) -> Optional[float]:
-        """Extract product rating"""
-        try:
-            rating_selectors = [
-                '[data-testid*="rating"]',
-                '[class*="rating"]',
-                '[class*="star"]',
-                '[itemprop="ratingValue"]',
-            ]
-            
-            for selector in rating_selectors:
-                try:
-                    elements = soup.select(selector)
-                    for element in elements:
-                        text = element.get_text(strip=True)
-                        numbers = re.findall(r'(\d+\.?\d*)', text)
-                        if numbers:
-                            try:
-                                rating = float(numbers[0])
-                                if 0 <= rating <= 5:
-                                    return rating
-                            except ValueError:
-                                pass
-                except Exception:
-                    pass
-            
-            return None
-        except Exception as e:
-            app_logger.debug(f"Error extracting rating: {e}")
-            return None
-    
-    def _get_demo_data(self, url: str) -> Optional[Dict]:
+    def _get_demo_data(self, ref: ItemRef) -> Optional[Dict]:
         """
         Return demo/mock data for testing purposes
         
@@ -675,10 +1142,10 @@ class ShopeeScraper:
         Useful for testing the full workflow with Google Sheets integration.
         Uses the real product name extracted from URL.
         """
-        product_id = self.extract_product_id(url)
+        product_id = ref.item_id
         
         # Extract real product name from URL
-        product_name = self.extract_product_name_from_url(url)
+        product_name = ref.name
         if not product_name:
             product_name = 'Shopee Product'
         
@@ -742,7 +1209,7 @@ class ShopeeScraper:
         return {
             'product_id': product_id,
             'name': product_name,
-            'url': url,
+            'url': ref.url,
             'price': demo['price'],
             'original_price': demo['original_price'],
             'savings_amount': savings_amount,
@@ -0,0 +1,139 @@
+"""
+Learned CSS selectors of the product fields, per page layout
+"""
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Optional
+from config import config
+from logger import app_logger
+from state_store import load_json, save_json
+from field_extractor import FIELD_SELECTORS, LANDMARK_SELECTORS, FieldExtractor, compile_selector
+
+# Fields a page must yield for a template to be learned or trusted
+REQUIRED_FIELDS = ('title', 'price')
+
+# Persisted layouts kept, least recently used ones are dropped beyond this
+MAX_ENTRIES = 50
+
+class SelectorTemplates:
+    """
+    The exact selector each product field came from, per page layout
+
+    Pages of one web build (see state_paths.LAYOUT_META) share their DOM,
+    so once a page of a layout has been extracted with the generic
+    selectors, later pages of that layout are queried with the learned
+    selectors only. A new build brings a new layout key; a template whose
+    selectors stop finding the required fields is dropped and relearned.
+    Fields not found on any page yet keep their generic selectors.
+    """
+
+    def __init__(self, path: Optional[Path] = None):
+        """
+        Initialize cache, loading any saved templates
+
+        Args:
+            path: State file (default: cache/selector_templates.json)
+        """
+        self.path = path or config.CACHE_PATH / "selector_templates.json"
+        self._lock = threading.Lock()
+        self._entries = load_json(self.path, {}).get('entries', {})
+        self._extractors: Dict[str, FieldExtractor] = {}
+
+    def get(self, layout: str) -> Optional[Dict[str, str]]:
+        """Get the learned sources (selector or title landmark) per field of a layout"""
+        with self._lock:
+            entry = self._entries.get(layout)
+            return dict(entry['fields']) if entry else None
+
+    def extractor(self, layout: str) -> Optional[FieldExtractor]:
+        """
+        Get an extractor running only the learned selectors of a layout
+
+        Returns:
+            Extractor, or None if nothing has been learned for the layout
+        """
+        with self._lock:
+            extractor = self._extractors.get(layout)
+            entry = self._entries.get(layout)
+            if extractor is not None or entry is None:
+                return extractor
+
+            field_selectors = {}
+            for field, selectors in FIELD_SELECTORS.items():
+                source = entry['fields'].get(field)
+                if source in LANDMARK_SELECTORS:
+                    # The title rules check the landmarks before any selector
+                    field_selectors[field] = []
+                elif source:
+                    field_selectors[field] = [source]
+                else:
+                    field_selectors[field] = selectors
+            try:
+                extractor = FieldExtractor(field_selectors)
+            except ValueError as e:
+                app_logger.debug(f"Dropping selector template of layout {layout}: {e}")
+                del self._entries[layout]
+                return None
+            self._extractors[layout] = extractor
+            return extractor
+
+    def learn(self, layout: str, sources: Dict[str, str]):
+        """
+        Remember where the fields of a page were found
+
+        Args:
+            layout: Layout key
+            sources: Selector (or title landmark) per field found, as given
+                by FieldExtractor.extract_with_sources
+        """
+        if any(field not in sources for field in REQUIRED_FIELDS):
+            return
+        sources = {
+            field: source for field, source in sources.items()
+            if field in FIELD_SELECTORS and (source in LANDMARK_SELECTORS or _is_supported(source))
+        }
+
+        with self._lock:
+            entry = self._entries.get(layout)
+            fields = dict(entry['fields']) if entry else {}
+            fields.update(sources)
+            if entry is None or fields != entry['fields']:
+                self._extractors.pop(layout, None)
+            self._entries[layout] = {'fields': fields, 'updated': time.time()}
+
+    def invalidate(self, layout: str):
+        """Forget the template of a layout"""
+        with self._lock:
+            if self._entries.pop(layout, None) is not None:
+                app_logger.debug(f"Selector template of layout {layout} stopped matching, relearning")
+            self._extractors.pop(layout, None)
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._entries)
+
+    def save(self) -> bool:
+        """Persist templates, dropping the least recently used layouts beyond the cap"""
+        with self._lock:
+            if len(self._entries) > MAX_ENTRIES:
+                keep = sorted(self._entries.items(), key=lambda item: item[1].get('updated', 0))
+                self._entries = dict(keep[-MAX_ENTRIES:])
+                self._extractors = {
+                    layout: extractor for layout, extractor in self._extractors.items()
+                    if layout in self._entries
+                }
+            data = {'entries': dict(self._entries)}
+
+        if save_json(self.path, data):
+            app_logger.debug(f"Saved selector templates ({len(data['entries'])} layouts)")
+            return True
+        return False
+
+def _is_supported(selector: str) -> bool:
+    """True if the extractor can run a selector"""
+    try:
+        compile_selector(selector)
+        return True
+    except ValueError:
+        return False
@@ -0,0 +1,139 @@
+"""
+Locally cached spreadsheet metadata: sheet names, IDs, header state and row counts
+"""
+import copy
+import re
+import threading
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
+from config import config
+from logger import app_logger
+from state_store import load_json, save_json
+
+# Fields requested when metadata is (re)fetched, so the response holds no cell data
+SHEET_FIELDS = 'sheets.properties(sheetId,title,gridProperties.rowCount)'
+
+_RANGE_END_ROW = re.compile(r'(\d+)$')
+
+def last_row(updated_range: Optional[str]) -> Optional[int]:
+    """
+    Get the last row number of an A1 range (e.g. 'Price Tracker'!A2:N41 -> 41)
+
+    Returns:
+        Row number, or None if the range does not end with one
+    """
+    match = _RANGE_END_ROW.search(updated_range or '')
+    return int(match.group(1)) if match else None
+
+class SheetMetadataCache:
+    """
+    Sheets of each spreadsheet, as last fetched or written
+
+    Sheet names and IDs come from a spreadsheets().get limited to the
+    sheet properties, and are trusted for `ttl` seconds. Header rows are
+    remembered once written, so initialize_sheet does not rewrite them;
+    they stay valid across refreshes as long as the sheet keeps its ID (a
+    sheet deleted and recreated gets a new one). The last data row is
+    taken from append responses.
+    """
+
+    def __init__(self, path: Optional[Path] = None, ttl: int = None):
+        """
+        Initialize cache, loading saved metadata
+
+        Args:
+            path: State file (default: cache/sheet_metadata.json)
+            ttl: Seconds fetched sheet names are trusted (default from config)
+        """
+        self.path = path or config.CACHE_PATH / "sheet_metadata.json"
+        self.ttl = config.SHEETS_METADATA_TTL if ttl is None else ttl
+        self._lock = threading.Lock()
+        self._entries = load_json(self.path, {}).get('entries', {})
+
+    def sheets(self, spreadsheet_id: str) -> Optional[Dict[str, Dict]]:
+        """
+        Get the sheets of a spreadsheet if fetched within the TTL
+
+        Returns:
+            Sheet metadata by sheet name, or None if missing or expired
+        """
+        with self._lock:
+            entry = self._entries.get(spreadsheet_id)
+            if entry is None or time.time() - entry['fetched'] >= self.ttl:
+                return None
+            return {name: dict(sheet) for name, sheet in entry['sheets'].items()}
+
+    def store(self, spreadsheet_id: str, properties: List[Dict]):
+        """
+        Remember freshly fetched sheets
+
+        Args:
+            spreadsheet_id: Spreadsheet ID
+            properties: The properties of each sheet, as returned by the API
+        """
+        with self._lock:
+            known = self._entries.get(spreadsheet_id, {}).get('sheets', {})
+            sheets = {}
+            for props in properties:
+                sheet = {
+                    'sheet_id': props.get('sheetId'),
+                    'row_count': props.get('gridProperties', {}).get('rowCount'),
+                }
+                previous = known.get(props['title'])
+                if previous and previous.get('sheet_id') == sheet['sheet_id']:
+                    for field in ('headers', 'last_row'):
+                        if field in previous:
+                            sheet[field] = previous[field]
+                sheets[props['title']] = sheet
+            self._entries[spreadsheet_id] = {'fetched': time.time(), 'sheets': sheets}
+
+    def add_sheet(self, spreadsheet_id: str, properties: Dict):
+        """Remember a sheet just created (ignored if the spreadsheet is not cached)"""
+        with self._lock:
+            entry = self._entries.get(spreadsheet_id)
+            if entry is not None:
+                entry['sheets'][properties['title']] = {
+                    'sheet_id': properties.get('sheetId'),
+                    'row_count': properties.get('gridProperties', {}).get('rowCount'),
+                }
+
+    def headers(self, spreadsheet_id: str, sheet_name: str) -> Optional[List]:
+        """Get the header row last written to a sheet"""
+        with self._lock:
+            sheet = self._entries.get(spreadsheet_id, {}).get('sheets', {}).get(sheet_name)
+            return sheet.get('headers') if sheet else None
+
+    def set_headers(self, spreadsheet_id: str, sheet_name: str, headers: List):
+        """Remember the header row written to a sheet"""
+        with self._lock:
+            sheet = self._entries.get(spreadsheet_id, {}).get('sheets', {}).get(sheet_name)
+            if sheet is not None:
+                sheet['headers'] = headers
+
+    def set_last_row(self, spreadsheet_id: str, sheet_name: str, row: int):
+        """Remember the last row written to a sheet"""
+        with self._lock:
+            sheet = self._entries.get(spreadsheet_id, {}).get('sheets', {}).get(sheet_name)
+            if sheet is not None:
+                sheet['last_row'] = max(sheet.get('last_row', 0), row)
+
+    def invalidate(self, spreadsheet_id: str):
+        """Forget everything about a spreadsheet"""
+        with self._lock:
+            if self._entries.pop(spreadsheet_id, None) is not None:
+                app_logger.debug(f"Dropped cached metadata of spreadsheet {spreadsheet_id}")
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._entries)
+
+    def save(self) -> bool:
+        """Persist metadata"""
+        with self._lock:
+            data = {'entries': copy.deepcopy(self._entries)}
+
+        if save_json(self.path, data):
+            app_logger.debug(f"Saved sheet metadata ({len(data['entries'])} spreadsheets)")
+            return True
+        return False
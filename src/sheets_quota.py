@@ -0,0 +1,189 @@
+"""
+Google Sheets API quota tracking with per-minute sliding windows
+"""
+import threading
+import time
+from collections import deque
+from typing import Dict, Optional
+from config import config
+from logger import app_logger
+
+# Request kinds, each with its own per-minute quota
+READ = 'read'
+WRITE = 'write'
+
+# Length of the quota window in seconds (Sheets quotas are per minute)
+QUOTA_WINDOW = 60.0
+
+_shared_quota = None
+_shared_lock = threading.Lock()
+
+class SlidingWindow:
+    """Thread-safe limit on the requests made in the last `window` seconds"""
+
+    def __init__(self, limit: int, window: float = QUOTA_WINDOW):
+        """
+        Initialize an empty window
+
+        Args:
+            limit: Requests allowed per window
+            window: Window length in seconds
+        """
+        self.limit = max(1, int(limit))
+        self.window = window
+        self.requests = 0
+        self.peak = 0
+        self.waited = 0.0
+        self.throttled = 0
+        self._sent = deque()
+        self._paused_until = 0.0
+        self._lock = threading.Lock()
+
+    def _expire(self, now: float):
+        """Forget requests that have left the window"""
+        while self._sent and now - self._sent[0] >= self.window:
+            self._sent.popleft()
+
+    def acquire(self) -> float:
+        """
+        Take a slot, sleeping until the window has room
+
+        Returns:
+            Seconds spent waiting
+        """
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._expire(now)
+                if now >= self._paused_until and len(self._sent) < self.limit:
+                    self._sent.append(now)
+                    self.requests += 1
+                    self.peak = max(self.peak, len(self._sent))
+                    self.waited += waited
+                    return waited
+
+                delay = self._paused_until - now
+                if len(self._sent) >= self.limit:
+                    delay = max(delay, self._sent[0] + self.window - now)
+
+            delay = max(delay, 0.001)
+            time.sleep(delay)
+            waited += delay
+
+    def pause(self, seconds: float):
+        """Hand out no slots for the given number of seconds (after a 429)"""
+        with self._lock:
+            self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+            self.throttled += 1
+
+    @property
+    def used(self) -> int:
+        """Requests currently in the window"""
+        with self._lock:
+            self._expire(time.monotonic())
+            return len(self._sent)
+
+class SheetsQuota:
+    """
+    Read and write request budgets of the Sheets API
+
+    Sheets counts reads and writes separately, per minute, per user of a
+    project. Requests wait for room in their window instead of being sent
+    and refused with HTTP 429; a 429 that comes anyway (quota shared with
+    another process) pauses the window. The counters show how close a run
+    came to the quota.
+    """
+
+    def __init__(self, reads_per_minute: int = None, writes_per_minute: int = None,
+                 window: float = QUOTA_WINDOW):
+        """
+        Initialize quota
+
+        Args:
+            reads_per_minute: Read requests allowed per window (default from config)
+            writes_per_minute: Write requests allowed per window (default from config)
+            window: Window length in seconds
+        """
+        self.windows = {
+            READ: SlidingWindow(reads_per_minute or config.SHEETS_READS_PER_MINUTE, window),
+            WRITE: SlidingWindow(writes_per_minute or config.SHEETS_WRITES_PER_MINUTE, window),
+        }
+
+    def acquire(self, kind: str) -> float:
+        """
+        Wait for room to send a request
+
+        Args:
+            kind: READ or WRITE
+
+        Returns:
+            Seconds spent waiting
+        """
+        waited = self.windows[kind].acquire()
+        if waited:
+            app_logger.debug(f"Waited {waited:.1f}s for Sheets {kind} quota")
+        return waited
+
+    def pause(self, kind: str, seconds: float):
+        """Stop sending requests of a kind for a while (after a 429)"""
+        self.windows[kind].pause(seconds)
+
+    def report(self) -> Dict[str, Dict]:
+        """
+        Summarize quota use
+
+        Returns:
+            Per kind: requests sent, per-window limit, peak requests in a
+            window, utilization (peak / limit), 429 responses and seconds
+            spent waiting
+        """
+        report = {}
+        for kind, window in self.windows.items():
+            with window._lock:
+                report[kind] = {
+                    'requests': window.requests,
+                    'limit': window.limit,
+                    'peak': window.peak,
+                    'utilization': window.peak / window.limit,
+                    'throttled': window.throttled,
+                    'waited': window.waited,
+                }
+        return report
+
+    def log_report(self, rows: Optional[int] = None):
+        """
+        Log quota use
+
+        Args:
+            rows: Rows appended, to show the rows per write request
+        """
+        report = self.report()
+        parts = [
+            f"{stats['requests']} {kind}s (peak {stats['peak']}/{stats['limit']} per minute, "
+            f"{stats['utilization']:.0%})"
+            for kind, stats in report.items()
+        ]
+        message = (
+            f"Sheets quota: {', '.join(parts)}; "
+            f"{sum(stats['throttled'] for stats in report.values())} throttled, "
+            f"{sum(stats['waited'] for stats in report.values()):.1f}s waiting"
+        )
+        if rows and report[WRITE]['requests']:
+            message += f"; {rows / report[WRITE]['requests']:.0f} rows per write"
+        app_logger.info(message)
+
+def get_shared_quota() -> SheetsQuota:
+    """
+    Get the process-wide quota, creating it on first use
+
+    Returns:
+        Shared Sheets quota
+    """
+    global _shared_quota
+
+    if _shared_quota is None:
+        with _shared_lock:
+            if _shared_quota is None:
+                _shared_quota = SheetsQuota()
+    return _shared_quota
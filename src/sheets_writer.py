@@ -0,0 +1,380 @@
+"""
+Write-behind Google Sheets writer backed by a local write-ahead log
+"""
+import json
+import queue
+import threading
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+from googleapiclient.errors import HttpError
+from config import config
+from logger import app_logger
+from google_sheets import GoogleSheetsManager, is_invalid_rows, is_refused, product_row, row_key
+from retry import RetryPolicy
+from state_store import save_bytes
+
+# How often the writer thread checks for a stop request while waiting (seconds)
+POLL_INTERVAL = 0.5
+
+# Queued by drain() behind the last row, so the writer wakes up and stops
+_STOP = None
+
+class WriteAheadLog:
+    """
+    Append-only journal of product rows not yet written to a sheet
+
+    Each row is a JSON line {"seq", "sheet", "row"}; rows written (or
+    given up on) are recorded by a {"done": [seq, ...]} line. Whatever has
+    no done record is replayed on the next start. The file is truncated
+    once nothing is outstanding, so it stays small.
+    """
+
+    def __init__(self, path: Optional[Path] = None):
+        """
+        Initialize journal, reading any rows left by an earlier run
+
+        Args:
+            path: Journal file (default: cache/sheets_wal.jsonl)
+        """
+        self.path = Path(path or config.CACHE_PATH / "sheets_wal.jsonl")
+        self._lock = threading.Lock()
+        self._pending: Dict[int, Tuple[str, Dict]] = {}
+        self._seq = 0
+        self._load()
+        self._file = None
+
+    def _load(self):
+        """Read the outstanding rows of the journal"""
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                lines = f.readlines()
+        except FileNotFoundError:
+            return
+        except OSError as e:
+            app_logger.warning(f"Could not read Sheets write-ahead log {self.path}: {e}")
+            return
+
+        for line in lines:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                # A line cut short by a crash was never acknowledged
+                continue
+            if 'done' in record:
+                for seq in record['done']:
+                    self._pending.pop(seq, None)
+            else:
+                self._pending[record['seq']] = (record['sheet'], record['row'])
+            self._seq = max(self._seq, record.get('seq', 0), *record.get('done', [0]))
+
+        # Start the next run from a journal holding only what is outstanding
+        data = ''.join(
+            json.dumps({'seq': seq, 'sheet': sheet, 'row': row}, default=str) + '\n'
+            for seq, (sheet, row) in self._pending.items()
+        )
+        save_bytes(self.path, data.encode('utf-8'))
+
+    def _write(self, record: Dict):
+        """Append a record and hand it to the operating system"""
+        if self._file is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self._file = open(self.path, 'a', encoding='utf-8')
+        self._file.write(json.dumps(record, default=str) + '\n')
+        self._file.flush()
+
+    def __contains__(self, seq: int) -> bool:
+        """True if a row is still outstanding"""
+        with self._lock:
+            return seq in self._pending
+
+    def pending(self) -> List[Tuple[int, str, Dict]]:
+        """Outstanding rows in the order they were journaled, as (seq, sheet, row)"""
+        with self._lock:
+            return [(seq, sheet, row) for seq, (sheet, row) in sorted(self._pending.items())]
+
+    def append(self, sheet_name: str, product_data: Dict) -> int:
+        """
+        Journal a row
+
+        Returns:
+            Sequence number of the row
+
+        Raises:
+            OSError: If the journal cannot be written
+        """
+        with self._lock:
+            self._seq += 1
+            self._write({'seq': self._seq, 'sheet': sheet_name, 'row': product_data})
+            self._pending[self._seq] = (sheet_name, product_data)
+            return self._seq
+
+    def mark_done(self, seqs: List[int]):
+        """Record rows as finished, truncating the journal once nothing is outstanding"""
+        with self._lock:
+            for seq in seqs:
+                self._pending.pop(seq, None)
+            try:
+                if self._pending:
+                    self._write({'done': list(seqs)})
+                else:
+                    self._close()
+                    open(self.path, 'w').close()
+            except OSError as e:
+                # The rows may be written again after a restart, but none is lost
+                app_logger.warning(f"Could not update Sheets write-ahead log {self.path}: {e}")
+
+    def _close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def close(self):
+        """Close the journal file"""
+        with self._lock:
+            self._close()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._pending)
+
+class SheetsWriter:
+    """
+    Write product rows to Google Sheets from a background thread
+
+    submit() journals a row to the write-ahead log and puts it on a bounded
+    queue, so scraping never waits for Sheets (only for a full queue). The
+    writer thread appends queued rows in batches of up to SHEETS_FLUSH_ROWS,
+    waiting at most SHEETS_FLUSH_SECONDS for a batch to fill. Failed
+    appends are retried with jittered backoff; a batch rejected as invalid
+    is split until the bad rows are isolated and dropped. A missing sheet
+    is not a bad row: the rows are kept and retried. Rows still
+    unwritten when the writer stops stay in the log and are replayed by
+    start() on the next run.
+
+    An append that failed without a refusal from Sheets (a 5xx, timeout or
+    dropped connection) may have been applied, and so may the append a
+    stopped run was in the middle of. Before such rows are appended again,
+    the sheet's URL and Timestamp columns are read and rows already there
+    are skipped. Rows without a timestamp cannot be told apart
+    and are appended again, at the risk of a duplicate.
+    """
+
+    def __init__(self, sheets: GoogleSheetsManager, wal: Optional[WriteAheadLog] = None,
+                 queue_size: int = None, batch_rows: int = None, flush_seconds: float = None,
+                 retry_policy: Optional[RetryPolicy] = None):
+        """
+        Initialize writer
+
+        Args:
+            sheets: Sheets manager used to append
+            wal: Write-ahead log (default: cache/sheets_wal.jsonl)
+            queue_size: Rows queued before submit() blocks (default from config)
+            batch_rows: Most rows per append request (default from config)
+            flush_seconds: Longest a row waits for its batch to fill (default from config)
+            retry_policy: Backoff between failed appends (default from config)
+        """
+        self.sheets = sheets
+        self.wal = wal if wal is not None else WriteAheadLog()
+        # Rows an earlier run left unwritten, queued by start(); that run may
+        # have stopped mid-append, so they are checked against the sheet first
+        self._replay = self.wal.pending()
+        self._unchecked = {seq for seq, _, _ in self._replay}
+        self.batch_rows = max(1, batch_rows or config.SHEETS_FLUSH_ROWS)
+        self.flush_seconds = config.SHEETS_FLUSH_SECONDS if flush_seconds is None else flush_seconds
+        self.retry_policy = retry_policy or RetryPolicy()
+        self.written = 0
+        self.failed = 0
+        self._queue = queue.Queue(maxsize=queue_size or config.SHEETS_QUEUE_SIZE)
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self) -> int:
+        """
+        Start the writer thread and queue the rows an earlier run left unwritten
+
+        Returns:
+            Number of rows replayed
+        """
+        if self._thread is not None:
+            return 0
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="sheets-writer", daemon=True)
+        self._thread.start()
+
+        replayed, self._replay = self._replay, []
+        if replayed:
+            app_logger.info(f"Replaying {len(replayed)} rows not written to Google Sheets by the last run")
+        for entry in replayed:
+            self._queue.put(entry)
+        return len(replayed)
+
+    def submit(self, product_data: Dict, sheet_name: str = "Price Tracker") -> bool:
+        """
+        Journal a product row and queue it for writing
+
+        Blocks while the queue is full.
+
+        Returns:
+            True once the row is journaled (it will reach the sheet even if
+            this process stops first), False if it could not be journaled
+        """
+        try:
+            seq = self.wal.append(sheet_name, product_data)
+        except OSError as e:
+            app_logger.error(f"Could not journal row for Google Sheets: {e}")
+            return False
+        self._queue.put((seq, sheet_name, product_data))
+        return True
+
+    def drain(self, timeout: Optional[float] = None) -> int:
+        """
+        Write everything queued and stop the writer thread
+
+        Args:
+            timeout: Longest to wait in seconds (None = until done)
+
+        Returns:
+            Rows left in the write-ahead log for the next run
+        """
+        if self._thread is not None:
+            queued = self._queue.qsize()
+            if queued:
+                app_logger.info(f"Writing {queued} queued rows to Google Sheets...")
+            self._stop.set()
+            try:
+                self._queue.put_nowait(_STOP)
+            except queue.Full:
+                # The writer sees the stop request on its next poll
+                pass
+            self._thread.join(timeout)
+            if not self._thread.is_alive():
+                self._thread = None
+                self.wal.close()
+
+        left = len(self.wal)
+        if left:
+            app_logger.warning(f"{left} rows not written to Google Sheets yet, kept for the next run")
+        return left
+
+    def pending(self) -> int:
+        """Rows journaled but not written yet"""
+        return len(self.wal)
+
+    def _run(self):
+        """Collect batches from the queue and write them until stopped and drained"""
+        while True:
+            try:
+                first = self._queue.get(timeout=POLL_INTERVAL)
+            except queue.Empty:
+                if self._stop.is_set():
+                    return
+                continue
+            if first is _STOP:
+                return
+
+            batch = [first]
+            stopping = False
+            closes_at = time.monotonic() + self.flush_seconds
+            while len(batch) < self.batch_rows and not stopping:
+                wait = closes_at - time.monotonic()
+                try:
+                    if self._stop.is_set() or wait <= 0:
+                        # Take what is already queued, without waiting for more
+                        entry = self._queue.get_nowait()
+                    else:
+                        entry = self._queue.get(timeout=min(wait, POLL_INTERVAL))
+                except queue.Empty:
+                    if self._stop.is_set() or wait <= 0:
+                        break
+                    continue
+                if entry is _STOP:
+                    stopping = True
+                else:
+                    batch.append(entry)
+
+            self._write(batch)
+            if stopping:
+                return
+
+    def _write(self, batch: List[Tuple[int, str, Dict]]):
+        """Write a batch, grouped by sheet, retrying until written or the writer stops"""
+        by_sheet: Dict[str, List[Tuple[int, str, Dict]]] = {}
+        for entry in batch:
+            by_sheet.setdefault(entry[1], []).append(entry)
+
+        for sheet_name, entries in by_sheet.items():
+            attempt = 0
+            # Whether an earlier append of these rows may have been applied
+            maybe_applied = any(entry[0] in self._unchecked for entry in entries)
+            while True:
+                try:
+                    if maybe_applied:
+                        entries = self._unwritten(sheet_name, entries)
+                        maybe_applied = False
+                        self._unchecked.difference_update(entry[0] for entry in entries)
+                        if not entries:
+                            break
+                    self._append(sheet_name, entries)
+                    break
+                except Exception as e:
+                    # Halves written before the failure are not written twice
+                    entries = [entry for entry in entries if entry[0] in self.wal]
+                    if not entries:
+                        break
+                    maybe_applied = maybe_applied or not is_refused(e)
+                    attempt += 1
+                    if self._stop.is_set() and attempt >= self.retry_policy.attempts:
+                        app_logger.error(f"Giving up on {len(entries)} rows for now: {e}")
+                        break
+                    delay = self.retry_policy.backoff(min(attempt, self.retry_policy.attempts))
+                    app_logger.warning(f"Google Sheets append failed ({e}), retrying in {delay:.1f}s")
+                    time.sleep(delay)
+
+    def _unwritten(self, sheet_name: str, entries: List[Tuple[int, str, Dict]]) -> List[Tuple[int, str, Dict]]:
+        """
+        Drop the rows an append reached the sheet with before it failed
+
+        Returns:
+            Rows still to append
+
+        Raises:
+            Exception: If the sheet cannot be read
+        """
+        keys = self.sheets.row_keys(sheet_name)
+        written = [entry[0] for entry in entries if row_key(entry[2]) in keys]
+        if written:
+            app_logger.info(f"{len(written)} rows reached '{sheet_name}' before the append failed, "
+                            f"not appending them again")
+            self.written += len(written)
+            self.wal.mark_done(written)
+            self._unchecked.difference_update(written)
+        return [entry for entry in entries if entry[0] not in written]
+
+    def _append(self, sheet_name: str, entries: List[Tuple[int, str, Dict]]):
+        """
+        Append rows in one request, isolating invalid rows by halving rejected batches
+
+        Raises:
+            Exception: If the append failed for a reason other than invalid
+                rows (e.g. a sheet that could not be re-created); the rows
+                stay in the log and are retried
+        """
+        try:
+            self.sheets.append_rows([product_row(row) for _, _, row in entries], sheet_name)
+        except HttpError as e:
+            if not is_invalid_rows(e):
+                raise
+            if len(entries) > 1:
+                middle = len(entries) // 2
+                self._append(sheet_name, entries[:middle])
+                self._append(sheet_name, entries[middle:])
+                return
+            self.failed += 1
+            app_logger.error(f"Google Sheets rejected row {entries[0][2].get('name')}: {e}")
+            self.wal.mark_done([entries[0][0]])
+            return
+
+        self.written += len(entries)
+        self.wal.mark_done([seq for seq, _, _ in entries])
+        app_logger.debug(f"Appended {len(entries)} rows to '{sheet_name}'")
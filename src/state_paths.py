@@ -0,0 +1,186 @@
+"""
+Learned locations of the product record inside embedded page state
+"""
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Iterator, Optional, Tuple, Union
+from config import config
+from logger import app_logger
+from state_store import load_json, save_json
+
+# Meta tag naming the web build that rendered a page; pages of one build share a state layout
+LAYOUT_META = 'shopee:version'
+
+# Nesting depth searched for the product record
+MAX_DEPTH = 10
+
+# Persisted layouts kept, least recently used ones are dropped beyond this
+MAX_ENTRIES = 1000
+
+# Path steps standing for the IDs of the product being scraped
+ITEM_ID_STEP = '{item_id}'
+SHOP_ID_STEP = '{shop_id}'
+
+# Record fields that name the item a record describes
+ITEM_ID_FIELDS = ('itemid', 'item_id')
+
+# Keys and list indexes leading from the state root to a value
+StatePath = Tuple[Union[str, int], ...]
+
+def names_other_item(record: Dict, item_id: Optional[str]) -> bool:
+    """True if a record carries an item ID that is not the product's"""
+    if not item_id:
+        return False
+    for field in ITEM_ID_FIELDS:
+        if field in record and record[field] is not None:
+            return str(record[field]) != item_id
+    return False
+
+def iter_product_records(data, item_id: Optional[str] = None,
+                         max_depth: int = MAX_DEPTH) -> Iterator[Tuple[StatePath, Dict]]:
+    """
+    Find dicts that have both a price and a name, depth first
+
+    Candidates come in the order of a recursive pre-order search, and a
+    candidate's own children are not searched. Only one iterator per open
+    container and one shared key list are kept, whatever the state size.
+
+    Args:
+        data: Decoded state object
+        item_id: ID of the product being scraped; records naming another item are skipped
+        max_depth: Deepest nesting level examined (the root is level 0)
+
+    Yields:
+        (path, record) where path is the keys/indexes leading to the record
+    """
+    if isinstance(data, dict) and 'price' in data and 'name' in data:
+        if not names_other_item(data, item_id):
+            yield (), data
+        return
+
+    if isinstance(data, dict):
+        stack = [iter(data.items())]
+    elif isinstance(data, list):
+        stack = [enumerate(data)]
+    else:
+        return
+
+    keys = []
+    while stack:
+        for key, value in stack[-1]:
+            if isinstance(value, dict):
+                if 'price' in value and 'name' in value:
+                    if not names_other_item(value, item_id):
+                        yield tuple(keys) + (key,), value
+                    continue
+                children = iter(value.items())
+            elif isinstance(value, list):
+                children = enumerate(value)
+            else:
+                continue
+
+            if len(stack) < max_depth:
+                keys.append(key)
+                stack.append(children)
+                break
+        else:
+            stack.pop()
+            if keys:
+                keys.pop()
+
+def resolve_path(data, path: StatePath):
+    """
+    Follow a path of keys/indexes into a decoded state object
+
+    Returns:
+        The value at the path, or None if any step is missing
+    """
+    for step in path:
+        if isinstance(data, dict):
+            data = data.get(step)
+        elif isinstance(data, list) and isinstance(step, int) and -len(data) <= step < len(data):
+            data = data[step]
+        else:
+            return None
+        if data is None:
+            return None
+    return data
+
+class StatePathCache:
+    """
+    Where the product record sat in embedded state, per page layout
+
+    Keys combine the layout version with the kind of state object. Steps
+    equal to the product's own item or shop ID are stored as placeholders,
+    so a path learned on one product applies to every product of the layout.
+    """
+
+    def __init__(self, path: Optional[Path] = None):
+        """
+        Initialize cache, loading any saved paths
+
+        Args:
+            path: State file (default: cache/state_paths.json)
+        """
+        self.path = path or config.CACHE_PATH / "state_paths.json"
+        self._lock = threading.Lock()
+        self._entries = load_json(self.path, {}).get('entries', {})
+
+    def get(self, layout: str, item_id: Optional[str] = None,
+            shop_id: Optional[str] = None) -> Optional[StatePath]:
+        """
+        Get the learned path for a layout, with the product's IDs filled in
+
+        Returns:
+            Path, or None if nothing has been learned for the layout
+        """
+        with self._lock:
+            entry = self._entries.get(layout)
+            if entry is None:
+                return None
+            steps = list(entry['path'])
+
+        substitutions = {ITEM_ID_STEP: item_id, SHOP_ID_STEP: shop_id}
+        return tuple((substitutions.get(step) or step) if isinstance(step, str) else step for step in steps)
+
+    def learn(self, layout: str, path: StatePath,
+              item_id: Optional[str] = None, shop_id: Optional[str] = None):
+        """
+        Remember where the product record was found for a layout
+
+        Args:
+            layout: Layout key
+            path: Keys/indexes leading to the record
+            item_id: Product's item ID (steps equal to it become placeholders)
+            shop_id: Product's shop ID (likewise)
+        """
+        placeholders = {}
+        if shop_id:
+            placeholders[shop_id] = SHOP_ID_STEP
+        if item_id:
+            placeholders[item_id] = ITEM_ID_STEP
+        steps = [placeholders.get(step, step) if isinstance(step, str) else step for step in path]
+
+        with self._lock:
+            previous = self._entries.get(layout)
+            if previous and previous['path'] != steps:
+                app_logger.debug(f"Product state path for layout {layout} moved to {'/'.join(map(str, steps))}")
+            self._entries[layout] = {'path': steps, 'updated': time.time()}
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._entries)
+
+    def save(self) -> bool:
+        """Persist paths, dropping the least recently learned layouts beyond the cap"""
+        with self._lock:
+            if len(self._entries) > MAX_ENTRIES:
+                keep = sorted(self._entries.items(), key=lambda item: item[1].get('updated', 0))
+                self._entries = dict(keep[-MAX_ENTRIES:])
+            data = {'entries': dict(self._entries)}
+
+        if save_json(self.path, data):
+            app_logger.debug(f"Saved product state paths ({len(data['entries'])} layouts)")
+            return True
+        return False
@@ -0,0 +1,79 @@
+"""
+JSON persistence for state learned across runs
+"""
+import json
+import os
+import tempfile
+from pathlib import Path
+from typing import Any
+from logger import app_logger
+
+def load_json(path: Path, default: Any = None) -> Any:
+    """
+    Load a JSON state file
+
+    Args:
+        path: File path
+        default: Value returned if the file is missing or unreadable
+
+    Returns:
+        Decoded JSON value
+    """
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return default
+    except (OSError, ValueError) as e:
+        app_logger.warning(f"Ignoring unreadable state file {path}: {e}")
+        return default
+
+def _atomic_write(path: Path, data: bytes):
+    """Write a file through a temporary file so readers never see a partial write"""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.", suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+def save_json(path: Path, data: Any) -> bool:
+    """
+    Atomically write a JSON state file
+
+    Args:
+        path: File path
+        data: JSON-serializable value
+
+    Returns:
+        True if written successfully
+    """
+    path = Path(path)
+    try:
+        _atomic_write(path, json.dumps(data, separators=(',', ':')).encode('utf-8'))
+        return True
+    except (OSError, TypeError, ValueError) as e:
+        app_logger.warning(f"Could not save state file {path}: {e}")
+        return False
+
+def save_bytes(path: Path, data: bytes) -> bool:
+    """
+    Atomically write a binary file
+
+    Args:
+        path: File path
+        data: File contents
+
+    Returns:
+        True if written successfully
+    """
+    path = Path(path)
+    try:
+        _atomic_write(path, data)
+        return True
+    except OSError as e:
+        app_logger.warning(f"Could not save file {path}: {e}")
+        return False
@@ -0,0 +1,57 @@
+"""
+Per-run counters for scraping activity
+"""
+import threading
+from typing import Dict, Tuple, Union
+
+class RunStats:
+    """Thread-safe named counters, reset at the start of every tracking run"""
+
+    def __init__(self):
+        """Initialize empty counters"""
+        self._counts = {}
+        self._lock = threading.Lock()
+
+    def incr(self, name: str, amount: float = 1):
+        """
+        Increase a counter
+
+        Args:
+            name: Counter name
+            amount: Amount to add
+        """
+        with self._lock:
+            self._counts[name] = self._counts.get(name, 0) + amount
+
+    def get(self, name: str) -> float:
+        """Get a counter value (0 if never incremented)"""
+        with self._lock:
+            return self._counts.get(name, 0)
+
+    def ratio(self, hits: Union[str, Tuple[str, ...]], misses: str) -> float:
+        """
+        Get hits / (hits + misses) for counters
+
+        Args:
+            hits: Counter name for hits, or a tuple of names counted together
+            misses: Counter name for misses
+
+        Returns:
+            Ratio between 0 and 1 (0 if no counter was incremented)
+        """
+        if isinstance(hits, str):
+            hits = (hits,)
+        with self._lock:
+            hit_count = sum(self._counts.get(name, 0) for name in hits)
+            total = hit_count + self._counts.get(misses, 0)
+        return hit_count / total if total else 0.0
+
+    def snapshot(self) -> Dict[str, float]:
+        """Get a copy of all counters"""
+        with self._lock:
+            return dict(self._counts)
+
+    def reset(self):
+        """Clear all counters"""
+        with self._lock:
+            self._counts.clear()
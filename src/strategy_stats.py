@@ -0,0 +1,172 @@
+"""
+Success-rate and latency statistics used to order scraping strategies
+"""
+import threading
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence
+from config import config
+from logger import app_logger
+from state_store import load_json, save_json
+
+# Latency (seconds) assumed for a strategy before it has been observed
+PRIOR_LATENCY = {
+    'api': 0.5,
+    'page': 2.0,
+    'render': 10.0,
+    'json_ld': 0.01,
+    'embedded_json': 0.05,
+    'html': 0.2,
+}
+
+# Persisted entries kept, least recently used scopes are dropped beyond this
+MAX_ENTRIES = 50000
+
+class StrategyStats:
+    """
+    Per-scope outcome statistics for each scraping strategy
+
+    Scopes are a region (e.g. "shopee.ph") and a shop (e.g. "shop:123").
+    The most specific scope with enough samples decides a strategy's
+    expected cost (mean latency / success rate) and whether it is
+    currently skipped after a run of consecutive failures.
+    """
+
+    def __init__(self, path: Optional[Path] = None):
+        """
+        Initialize statistics, loading any saved state
+
+        Args:
+            path: State file (default: cache/strategy_stats.json)
+        """
+        self.path = path or config.CACHE_PATH / "strategy_stats.json"
+        self.min_samples = config.STRATEGY_MIN_SAMPLES
+        self.skip_after = config.STRATEGY_SKIP_AFTER
+        self.skip_seconds = config.STRATEGY_SKIP_SECONDS
+        self._lock = threading.Lock()
+        self._entries = load_json(self.path, {}).get('entries', {}) if self.path else {}
+
+    def _entry(self, scope: str, strategy: str) -> Optional[Dict]:
+        """Get the entry for a scope and strategy"""
+        return self._entries.get(f"{scope}|{strategy}")
+
+    def _deciding_entry(self, strategy: str, scopes: Sequence[str]) -> Optional[Dict]:
+        """Get the most specific entry with enough samples (scopes run general to specific)"""
+        for scope in reversed(scopes):
+            entry = self._entry(scope, strategy)
+            if entry and entry['attempts'] >= self.min_samples:
+                return entry
+        return None
+
+    def record(self, strategy: str, scopes: Sequence[str], success: bool, latency: float):
+        """
+        Record the outcome of one strategy attempt
+
+        Args:
+            strategy: Strategy name
+            scopes: Scopes the attempt belongs to
+            success: True if the strategy produced product data
+            latency: Seconds spent
+        """
+        now = time.time()
+        with self._lock:
+            for scope in scopes:
+                key = f"{scope}|{strategy}"
+                entry = self._entries.get(key)
+                if entry is None:
+                    entry = {'attempts': 0, 'successes': 0, 'latency': 0.0, 'failures': 0, 'skip_until': 0}
+                    self._entries[key] = entry
+
+                entry['attempts'] += 1
+                entry['latency'] += latency
+                entry['updated'] = now
+                if success:
+                    entry['successes'] += 1
+                    entry['failures'] = 0
+                    entry['skip_until'] = 0
+                else:
+                    entry['failures'] += 1
+                    if entry['failures'] >= self.skip_after:
+                        entry['skip_until'] = now + self.skip_seconds
+
+    def success_rate(self, strategy: str, scopes: Sequence[str]) -> float:
+        """Smoothed success rate (0.5 before any samples)"""
+        with self._lock:
+            entry = self._deciding_entry(strategy, scopes)
+            if not entry:
+                return 0.5
+            return (entry['successes'] + 1) / (entry['attempts'] + 2)
+
+    def expected_cost(self, strategy: str, scopes: Sequence[str]) -> float:
+        """Expected seconds spent per successful extraction"""
+        prior = PRIOR_LATENCY.get(strategy, 1.0)
+        with self._lock:
+            entry = self._deciding_entry(strategy, scopes)
+            if not entry:
+                return prior / 0.5
+
+            latency = (entry['latency'] + prior) / (entry['attempts'] + 1)
+            rate = (entry['successes'] + 1) / (entry['attempts'] + 2)
+        return latency / rate
+
+    def is_skipped(self, strategy: str, scopes: Sequence[str]) -> bool:
+        """True while a strategy is cooling down after repeated failures"""
+        with self._lock:
+            entry = self._deciding_entry(strategy, scopes)
+            return bool(entry) and entry['skip_until'] > time.time()
+
+    def is_due_for_probe(self, strategy: str, scopes: Sequence[str]) -> bool:
+        """True if a strategy has not been tried for a full skip period"""
+        with self._lock:
+            entry = self._deciding_entry(strategy, scopes)
+            return not entry or entry.get('updated', 0) + self.skip_seconds < time.time()
+
+    def order(self, strategies: Sequence[str], scopes: Sequence[str],
+              min_success: Optional[Dict[str, float]] = None) -> List[str]:
+        """
+        Order strategies by expected cost, leaving out skipped ones
+
+        Args:
+            strategies: Candidate strategies in their default order
+            scopes: Scopes of the product being scraped
+            min_success: Per-strategy success rate required to try it at all
+
+        Returns:
+            Strategies to try, cheapest first (the default order if all are skipped)
+        """
+        min_success = min_success or {}
+        candidates = []
+        for strategy in strategies:
+            if self.is_skipped(strategy, scopes):
+                continue
+            if (self.success_rate(strategy, scopes) < min_success.get(strategy, 0)
+                    and not self.is_due_for_probe(strategy, scopes)):
+                continue
+            candidates.append(strategy)
+
+        if not candidates:
+            return list(strategies)
+
+        # sorted() is stable, so ties keep the default order
+        return sorted(candidates, key=lambda strategy: self.expected_cost(strategy, scopes))
+
+    def snapshot(self) -> Dict[str, Dict]:
+        """Get a copy of all entries keyed by scope|strategy"""
+        with self._lock:
+            return {key: dict(entry) for key, entry in self._entries.items()}
+
+    def save(self) -> bool:
+        """Persist statistics, dropping the least recently updated entries beyond the cap"""
+        if not self.path:
+            return False
+
+        with self._lock:
+            if len(self._entries) > MAX_ENTRIES:
+                keep = sorted(self._entries.items(), key=lambda item: item[1].get('updated', 0))
+                self._entries = dict(keep[-MAX_ENTRIES:])
+            data = {'entries': dict(self._entries)}
+
+        if save_json(self.path, data):
+            app_logger.debug(f"Saved strategy statistics ({len(data['entries'])} entries)")
+            return True
+        return False
@@ -1,11 +1,17 @@
 """
 Main price tracking logic
 """
+import asyncio
 import schedule
 import time
 from typing import List, Dict, Optional
 from scraper import ShopeeScraper
+from async_scraper import AsyncShopeeScraper
+from retry import Deadline, DeadlineExceeded
 from google_sheets import GoogleSheetsManager
+from sheets_writer import SheetsWriter
+from browser_pool import close_browser_pool
+from http_session import close_shared_session
 from logger import app_logger
 from config import config
 from datetime import datetime
@@ -13,62 +19,138 @@ from datetime import datetime
 class PriceTracker:
     """Main price tracking engine"""
     
-    def __init__(self, spreadsheet_id: str = None):
+    def __init__(self, spreadsheet_id: str = None, concurrency: int = None):
         """
         Initialize tracker
         
         Args:
             spreadsheet_id: Google Sheets ID
+            concurrency: Products scraped at once by track_all_products (default from config)
         """
         self.scraper = ShopeeScraper()
         self.sheets = GoogleSheetsManager(spreadsheet_id)
         self.products_urls = config.SHOPEE_PRODUCT_URLS
+        self.concurrency = concurrency or config.SCRAPE_CONCURRENCY
+        self.interval = None
+        # Products that ran out of time, tried first in the next cycle
+        self.deferred = []
         
         # Initialize Google Sheet
         self.sheets.initialize_sheet()
+        
+        # Rows are written in the background; rows a previous run left unwritten go first
+        self.writer = SheetsWriter(self.sheets)
+        self.writer.start()
     
-    def track_product(self, url: str) -> Optional[Dict]:
+    def track_product(self, url: str, deadline: Optional[Deadline] = None) -> Optional[Dict]:
         """
         Track a single product
         
         Args:
             url: Product URL
+            deadline: Deadline of the tracking cycle (the product is deferred
+                to the next cycle if it runs out)
             
         Returns:
             Product data dictionary
         """
         try:
             # Scrape product
-            product_data = self.scraper.scrape_product(url)
+            product_data = self.scraper.scrape_product(url, deadline=deadline)
+            return self._save_product(url, product_data)
+        except DeadlineExceeded:
+            self.deferred.append(url)
+            return None
+        except Exception as e:
+            app_logger.error(f"Error tracking product: {e}")
+            return None
+    
+    def _save_product(self, url: str, product_data: Optional[Dict]) -> Optional[Dict]:
+        """
+        Save scraped product data to Google Sheets
+        
+        The row is journaled and written by the background writer, so this
+        does not wait for Sheets.
+        
+        Args:
+            url: Product URL
+            product_data: Scraped product data (None if scraping failed)
             
+        Returns:
+            Product data dictionary if saved
+        """
+        try:
             if not product_data:
                 app_logger.error(f"Failed to scrape: {url}")
                 return None
             
             # Save to Google Sheets
-            if self.sheets.append_price_data(product_data):
-                app_logger.info(f"Saved to Google Sheets: {product_data.get('name')}")
-                
-                # Apply formulas to the newly added row
-                # Get current row count to apply formula to the last row
-                try:
-                    self.sheets.apply_formulas_to_row()
-                except Exception as e:
-                    app_logger.debug(f"Could not apply formulas automatically: {e}")
-                
+            if self.writer.submit(product_data):
+                app_logger.info(f"Queued for Google Sheets: {product_data.get('name')}")
                 return product_data
             else:
                 app_logger.error(f"Failed to save to Google Sheets: {product_data.get('name')}")
                 return None
             
         except Exception as e:
-            app_logger.error(f"Error tracking product: {e}")
+            app_logger.error(f"Error saving product: {e}")
             return None
     
+    def _cycle_deadline(self) -> Deadline:
+        """Get the time budget for one tracking cycle"""
+        if config.CYCLE_DEADLINE > 0:
+            return Deadline(config.CYCLE_DEADLINE)
+        if self.interval:
+            # Leave headroom so a slow cycle does not run into the next one
+            return Deadline(self.interval * 0.9)
+        return Deadline()
+    
+    def _cycle_urls(self) -> List[str]:
+        """Get this cycle's URLs (one per product), products deferred last cycle first"""
+        urls = self.scraper.unique_urls(self.deferred + list(self.products_urls))
+        self.deferred = []
+        return urls
+    
+    def _track_batch(self, urls: List[str], results: List[Dict], deadline: Deadline) -> List[str]:
+        """
+        Track as many products as possible through the batched item API
+        
+        Args:
+            urls: Product URLs
+            results: List that saved products are appended to
+            deadline: Deadline of the tracking cycle
+            
+        Returns:
+            URLs that still need to be scraped individually
+        """
+        prefetched = self.scraper.fetch_products_batch(urls, deadline)
+        
+        for url, product_data in prefetched.items():
+            product = self._save_product(url, product_data)
+            if product:
+                results.append(product)
+        
+        return [url for url in urls if url not in prefetched]
+    
+    def _finish_cycle(self, results: List[Dict], total: int):
+        """Log the outcome of a tracking cycle and persist learned state"""
+        app_logger.info(f"Tracking completed. {len(results)}/{total} successful")
+        if self.writer.pending():
+            app_logger.info(f"{self.writer.pending()} rows waiting to be written to Google Sheets")
+        if self.deferred:
+            app_logger.warning(f"{len(self.deferred)} products ran out of time, deferred to the next cycle")
+        self.scraper.log_run_stats()
+        self.sheets.log_quota_stats()
+        self.scraper.save_state()
+        self.sheets.save_state()
+    
     def track_all_products(self) -> List[Dict]:
         """
         Track all configured products
         
+        Uses the async engine when concurrency is greater than 1. Products
+        not reached before the cycle deadline are deferred to the next cycle.
+        
         Returns:
             List of successfully tracked products
         """
@@ -76,17 +158,60 @@ class PriceTracker:
             app_logger.warning("No product URLs configured")
             return []
         
-        app_logger.info(f"Starting to track {len(self.products_urls)} products...")
+        if self.concurrency > 1:
+            return asyncio.run(self.track_all_products_async())
+        
+        urls = self._cycle_urls()
+        app_logger.info(f"Starting to track {len(urls)} products...")
+        self.scraper.reset_run_stats()
+        deadline = self._cycle_deadline()
         results = []
         
-        for url in self.products_urls:
-            url = url.strip()
-            if url:
-                product = self.track_product(url)
+        with self.scraper.run_scope():
+            remaining = self._track_batch(urls, results, deadline)
+            for index, url in enumerate(remaining):
+                if deadline.expired():
+                    self.deferred.extend(remaining[index:])
+                    break
+                product = self.track_product(url, deadline)
                 if product:
                     results.append(product)
         
-        app_logger.info(f"Tracking completed. {len(results)}/{len(self.products_urls)} successful")
+        self._finish_cycle(results, len(urls))
+        return results
+    
+    async def track_all_products_async(self) -> List[Dict]:
+        """
+        Track all configured products concurrently
+        
+        Products are queued for Google Sheets as soon as each scrape completes.
+        Saving runs on a worker thread, so scrapes in flight keep going
+        while Sheets is written.
+        
+        Returns:
+            List of successfully tracked products
+        """
+        if not self.products_urls:
+            app_logger.warning("No product URLs configured")
+            return []
+        
+        urls = self._cycle_urls()
+        app_logger.info(f"Starting to track {len(urls)} products...")
+        self.scraper.reset_run_stats()
+        deadline = self._cycle_deadline()
+        engine = AsyncShopeeScraper(self.scraper, concurrency=self.concurrency)
+        results = []
+        
+        with self.scraper.run_scope():
+            remaining = self._track_batch(urls, results, deadline)
+            loop = asyncio.get_running_loop()
+            async for url, product_data in engine.scrape_many(remaining, deadline):
+                product = await loop.run_in_executor(None, self._save_product, url, product_data)
+                if product:
+                    results.append(product)
+        self.deferred.extend(engine.deferred)
+        
+        self._finish_cycle(results, len(urls))
         return results
     
     def schedule_tracking(self, interval_seconds: int = None):
@@ -97,6 +222,7 @@ class PriceTracker:
             interval_seconds: Interval between tracking (default from config)
         """
         interval = interval_seconds or config.CHECK_INTERVAL
+        self.interval = interval
         
         # Schedule tracking
         schedule.every(interval).seconds.do(self.track_all_products)
@@ -121,6 +247,23 @@ class PriceTracker:
             app_logger.info("Scheduler stopped by user")
         except Exception as e:
             app_logger.error(f"Scheduler error: {e}")
+        finally:
+            self.close()
+    
+    def close(self) -> int:
+        """
+        Write the rows still queued for Google Sheets, stop the writer,
+        save the sheet metadata, close the headless browsers and release the
+        pooled HTTP connections
+        
+        Returns:
+            Rows left unwritten (kept in the write-ahead log for the next run)
+        """
+        left = self.writer.drain()
+        self.sheets.save_state()
+        close_browser_pool()
+        close_shared_session()
+        return left
     
     def get_price_history(self, sheet_name: str = "Price Tracker") -> List[Dict]:
         """
@@ -1,16 +1,73 @@
 """
 Unit tests for Shopee Price Tracker
 """
+import codecs
 import unittest
+import asyncio
+import math
+import io
 import sys
 import os
+import json
 import tempfile
+import threading
+import time
 from datetime import datetime
+from unittest.mock import patch
 
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
 
+import requests
+import scraper as scraper_module
 from scraper import ShopeeScraper
 from config import config
+import http_session
+from async_scraper import AsyncShopeeScraper, scrape_all
+from browser_pool import BrowserPool, BrowserPoolFullError, _PooledBrowser
+from strategy_stats import StrategyStats
+from coalesce import Coalescer
+from page_scanner import PageScanner
+from page_encoding import Utf8Transcoder, page_encoding, response_body
+from page_tokens import PageTokens
+import json_codec
+from json_codec import load_fields, loads, raw_decode
+from state_paths import StatePathCache, iter_product_records
+from extraction_cache import ExtractionCache, content_key
+from html_parser import available_backends, parse_html, resolve_backend
+from field_extractor import FieldExtractor, compile_selector
+from selector_templates import SelectorTemplates
+from google_sheets import GoogleSheetsManager
+from googleapiclient.errors import HttpError
+from httplib2 import Response as HttpResponse
+from sheets_quota import READ, WRITE, SheetsQuota, SlidingWindow
+from sheet_metadata import SheetMetadataCache
+from sheets_writer import SheetsWriter, WriteAheadLog
+from item_ref import parse_item_ref
+from http_cache import HttpCache, cache_key
+from retry import Deadline, DeadlineExceeded, RetryPolicy
+from rate_limiter import CircuitBreaker, CircuitOpenError, HostThrottle, TokenBucket, parse_retry_after
+from pathlib import Path
+
+FIXTURES = Path(__file__).parent / "fixtures"
+
+def make_temp_dir(test: unittest.TestCase) -> Path:
+    """Temporary directory removed when the test ends"""
+    tmpdir = tempfile.TemporaryDirectory()
+    test.addCleanup(tmpdir.cleanup)
+    return Path(tmpdir.name)
+
+def isolated_scraper(temp_dir: Path, **kwargs) -> ShopeeScraper:
+    """Scraper whose persisted state (statistics, learned paths and selectors) lives in temp_dir"""
+    kwargs.setdefault('strategy_stats', StrategyStats(path=temp_dir / "stats.json"))
+    kwargs.setdefault('state_paths', StatePathCache(path=temp_dir / "state_paths.json"))
+    kwargs.setdefault('selector_templates', SelectorTemplates(path=temp_dir / "templates.json"))
+    return ShopeeScraper(**kwargs)
+
+def setUpModule():
+    """Keep tests off the shared on-disk caches (cache tests use their own)"""
+    config.HTTP_CACHE_ENABLED = False
+    config.EXTRACTION_CACHE_ENABLED = False
+    config.SHEETS_METADATA_CACHE_ENABLED = False
 
 class TestShopeeScraper(unittest.TestCase):
     """Test Shopee scraper"""
@@ -43,6 +100,1488 @@ class TestShopeeScraper(unittest.TestCase):
         self.assertIsNotNone(self.scraper.headers)
         self.assertIn('User-Agent', self.scraper.headers)
 
+class TestItemRef(unittest.TestCase):
+    """Test canonical item references"""
+    
+    def test_url_forms(self):
+        """Test slug, bare and /product/ URLs on different Shopee domains"""
+        slug = parse_item_ref("https://shopee.co.id/Camping-Tent-i.25316261.2935397050?sp_atk=x&xptdk=y")
+        self.assertEqual((slug.region, slug.shop_id, slug.item_id), ('shopee.co.id', '25316261', '2935397050'))
+        self.assertEqual(slug.name, 'Camping Tent')
+        
+        product = parse_item_ref("https://www.shopee.com.my/product/25316261/2935397050/")
+        self.assertEqual(product.key, ('shopee.com.my', '25316261', '2935397050'))
+        self.assertIsNone(product.name)
+        
+        bare = parse_item_ref("shopee.sg/i.1.2")
+        self.assertEqual(bare.key, ('shopee.sg', '1', '2'))
+        self.assertIsNone(bare.name)
+    
+    def test_ids_not_read_from_query_string(self):
+        """Test tracking parameters cannot masquerade as item IDs"""
+        ref = parse_item_ref("https://shopee.ph/Crocs-Classic?ref=i.1.2")
+        self.assertIsNone(ref.key)
+        self.assertEqual(ref.name, 'Crocs Classic')
+    
+    def test_refs_are_memoized_and_compare_by_item(self):
+        """Test parsing is cached and equality ignores slug and query"""
+        self.assertIs(parse_item_ref(PRODUCT_URL), parse_item_ref(PRODUCT_URL))
+        other = parse_item_ref("https://shopee.ph/product/25316261/2935397050?utm_source=x")
+        self.assertEqual(parse_item_ref(PRODUCT_URL), other)
+        self.assertEqual(len({parse_item_ref(PRODUCT_URL), other}), 1)
+        self.assertFalse(hasattr(other, '__dict__'))
+
+def make_response(url, body, status=200, headers=None):
+    """Build a requests Response without touching the network"""
+    response = requests.Response()
+    response.url = url
+    response.status_code = status
+    response._content = body if isinstance(body, bytes) else body.encode('utf-8')
+    response._content_consumed = True
+    response.headers.update(headers or {})
+    response.encoding = 'utf-8'
+    return response
+
+class FakeSession:
+    """Session stub that serves canned responses and records requested URLs"""
+    
+    def __init__(self, routes):
+        self.routes = routes
+        self.requested = []
+        self.bodies = []
+    
+    def request(self, method, url, params=None, headers=None, json=None, **kwargs):
+        self.requested.append(url)
+        self.bodies.append(json)
+        for prefix, (body, status) in self.routes.items():
+            if url.startswith(prefix):
+                return make_response(url, body, status)
+        return make_response(url, b'', 404)
+
+API_ITEM = {
+    'data': {
+        'name': 'Camping Tent',
+        'price': 129900000,
+        'price_before_discount': 189900000,
+        'discount': 32,
+        'shop': {'name': 'Adventure Gear'},
+        'rating': {'rating_star': 4.7},
+    }
+}
+
+PRODUCT_URL = "https://shopee.ph/Camping-Tent-i.25316261.2935397050"
+
+class TestFetchPlanner(unittest.TestCase):
+    """Test API-first fetch planning"""
+    
+    def setUp(self):
+        self._has_browser = scraper_module.HAS_PYPPETEER
+        scraper_module.HAS_PYPPETEER = False
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmpdir.cleanup)
+        self.strategy_stats = StrategyStats(Path(self.tmpdir.name) / "stats.json")
+    
+    def tearDown(self):
+        scraper_module.HAS_PYPPETEER = self._has_browser
+    
+    def test_api_success_skips_page_download(self):
+        """Test the product page is not downloaded when the API answers"""
+        session = FakeSession({'https://shopee.ph/api/v2/': (json.dumps(API_ITEM), 200)})
+        scraper = ShopeeScraper(session=session, strategy_stats=self.strategy_stats,
+                                throttle=HostThrottle(rate=1000, burst=1000))
+        product = scraper.scrape_product(PRODUCT_URL)
+        self.assertEqual(product['price'], 1299.0)
+        self.assertEqual(session.requested, ['https://shopee.ph/api/v2/item/get'])
+        report = scraper.run_report()
+        self.assertEqual(report['requests_saved'], 1)
+        self.assertGreater(report['bytes_saved'], 0)
+    
+    def test_api_failure_downloads_page(self):
+        """Test the page is fetched when the API has no answer"""
+        session = FakeSession({
+            'https://shopee.ph/api/v2/': ('{}', 403),
+            PRODUCT_URL: ('<html><title>Tent | Shopee</title><span class="price">₱1,299</span></html>', 200),
+        })
+        scraper = ShopeeScraper(session=session, strategy_stats=self.strategy_stats,
+                                throttle=HostThrottle(rate=1000, burst=1000))
+        product = scraper.scrape_product(PRODUCT_URL)
+        self.assertEqual(product['price'], 1299.0)
+        self.assertEqual(len(session.requested), 2)
+        self.assertEqual(scraper.run_report()['requests_saved'], 0)
+
+class CountingStream(io.BytesIO):
+    """In-memory body that counts the bytes read from it"""
+    
+    bytes_read = 0
+    
+    def read(self, size=-1):
+        data = super().read(size)
+        self.bytes_read += len(data)
+        return data
+
+class StreamingSession(FakeSession):
+    """Session stub that streams one page from a file-like body"""
+    
+    def __init__(self, body):
+        super().__init__({})
+        self.raw = CountingStream(body.encode('utf-8'))
+        self.length = len(body.encode('utf-8'))
+    
+    def request(self, method, url, headers=None, stream=False, **kwargs):
+        self.requested.append(url)
+        if '/api/' in url:
+            return make_response(url, b'', 404)
+        response = requests.Response()
+        response.url = url
+        response.status_code = 200
+        response.raw = self.raw
+        response.encoding = 'utf-8'
+        response.headers['Content-Length'] = str(self.length)
+        return response
+
+PRODUCT_PAGE_HEAD = (
+    '<html><head><meta property="og:title" content="Camping Tent &amp; Fly">'
+    '<meta property="product:price:amount" content="1,299.00"></head><body>'
+)
+
+class TestStreamingFetch(unittest.TestCase):
+    """Test streamed page downloads that stop once the product is found"""
+    
+    def setUp(self):
+        self._has_browser = scraper_module.HAS_PYPPETEER
+        scraper_module.HAS_PYPPETEER = False
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmpdir.cleanup)
+    
+    def tearDown(self):
+        scraper_module.HAS_PYPPETEER = self._has_browser
+    
+    def scrape(self, session):
+        scraper = ShopeeScraper(session=session, throttle=HostThrottle(rate=1000, burst=1000),
+                                strategy_stats=StrategyStats(Path(self.tmpdir.name) / "stats.json"))
+        return scraper, scraper.scrape_product(PRODUCT_URL)
+    
+    def test_stops_reading_after_meta_tags(self):
+        """Test the body is not read past the chunk holding name and price"""
+        session = StreamingSession(PRODUCT_PAGE_HEAD + 'x' * 200000 + '</body></html>')
+        scraper, product = self.scrape(session)
+        self.assertEqual(product['name'], 'Camping Tent & Fly')
+        self.assertEqual(product['price'], 1299.0)
+        self.assertLess(session.raw.bytes_read, 100000)
+        self.assertEqual(scraper.stats.get('html_streams_stopped'), 1)
+        self.assertGreater(scraper.stats.get('html_bytes_not_read'), 100000)
+    
+    def test_json_ld_split_across_chunks(self):
+        """Test a JSON-LD block is found whatever the chunk boundaries"""
+        block = ('<script type="application/ld+json">'
+                 '{"@type": "Product", "name": "Lều cắm trại", "offers": {"price": "1299"}}</script>')
+        page = ('<html><head></head><body>' + block + '</body></html>').encode('utf-8')
+        for size in (1, 7, 64):
+            scanner = PageScanner()
+            found = None
+            for start in range(0, len(page), size):
+                found = found or scanner.feed(page[start:start + size])
+            self.assertEqual(found, ('Lều cắm trại', 1299.0))
+    
+    def test_falls_back_to_full_extraction(self):
+        """Test pages without early product data are read fully and extracted as before"""
+        page = '<html><head><title>Tent | Shopee</title></head><body><span class="price">₱1,299</span></body></html>'
+        scraper, product = self.scrape(StreamingSession(page))
+        self.assertEqual(product['name'], 'Tent')
+        self.assertEqual(product['price'], 1299.0)
+        self.assertEqual(scraper.stats.get('html_streams_stopped'), 0)
+
+class TestPageTokens(unittest.TestCase):
+    """Test the single-pass script and meta tokenizer"""
+    
+    def test_script_blocks_and_meta(self):
+        """Test JSON-LD, state assignments and meta tags are found in one pass"""
+        html = (
+            '<head><META property="og:title" content="Tent &amp; Fly"><meta name="shopee:version" content="v3">'
+            '<script type="application/ld+json" id="ld">{"@type": "Product", "name": "Tent"}</script>'
+            '<script>var config = {"debug": false}</script>'
+            '<script>window.__data__ = {"b": 2}; window.__INITIAL_STATE__ = {"s": "};", "a": {"b": 1}};</script>'
+            '<script>if (x) { var y = {"c": 3}; }</script>'
+            '<script type="text/template"><meta property="og:title" content="Inside"></script></head>'
+        )
+        tokens = PageTokens(html)
+        
+        self.assertEqual(tokens.meta, {'og:title': 'Tent & Fly', 'shopee:version': 'v3'})
+        self.assertEqual(list(tokens.json_ld()), [{'@type': 'Product', 'name': 'Tent'}])
+        self.assertEqual([state.kind for state in tokens.states], ['initial_state', 'data', 'variable'])
+        self.assertEqual(tokens.states[0].value, {'s': '};', 'a': {'b': 1}})
+        self.assertEqual([state.value for state in tokens.states if state.kind == 'variable'], [{'debug': False}])
+    
+    def test_invalid_blocks_are_skipped(self):
+        """Test literals that are not JSON and unclosed scripts do not break tokenizing"""
+        tokens = PageTokens('<script>var a = {b: 1};</script><script type="application/ld+json">{oops</script><script>x')
+        self.assertEqual([state.value for state in tokens.states], [None])
+        self.assertEqual(list(tokens.json_ld()), [])
+    
+    def test_many_unterminated_assignments_stay_linear(self):
+        """Test a large script of unterminated assignments is tokenized quickly"""
+        html = '<script>' + 'a.__data__={"k":1}\n' * 20000 + '</script>'
+        started = time.monotonic()
+        tokens = PageTokens(html)
+        self.assertEqual(len(tokens.states), 20000)
+        self.assertEqual(tokens.states[0].value, {'k': 1})
+        self.assertLess(time.monotonic() - started, 5)
+    
+    def test_extraction_methods_share_tokens(self):
+        """Test embedded state is extracted from a downloaded page"""
+        scraper = isolated_scraper(make_temp_dir(self))
+        html = '<script>window.__INITIAL_STATE__ = {"item": {"name": "Lamp", "price": "1,250"}};</script>'
+        product = scraper._try_extraction_methods(html.encode('utf-8'), parse_item_ref(PRODUCT_URL))
+        self.assertEqual((product['name'], product['price']), ('Lamp', 1250.0))
+
+class TestPageEncoding(unittest.TestCase):
+    """Test pages are handled as UTF-8 bytes without charset detection"""
+    
+    PAGE = ('<html><head><meta charset="windows-1252"><meta property="og:title" content="Café Table">'
+            '<meta property="product:price:amount" content="450"></head><body>Ø</body></html>')
+    
+    def test_encoding_precedence(self):
+        """Test a BOM wins over the header, which wins over <meta charset>"""
+        cases = [
+            ('text/html; charset=UTF-8', codecs.BOM_UTF16_LE + b'<', 'utf-16'),
+            ('text/html; charset="Shift_JIS"', b'<meta charset="utf-8">', 'shift_jis'),
+            ('text/html', b'<head><meta http-equiv="Content-Type" content="text/html; charset=TIS-620">', 'tis-620'),
+            ('text/html', b'<html>\xc3\xa9', 'utf-8'),
+            (None, b'<meta charset="no-such-codec">', 'utf-8'),
+        ]
+        for content_type, head, expected in cases:
+            with self.subTest(content_type=content_type, head=head):
+                self.assertEqual(page_encoding(content_type, head), expected)
+    
+    def test_body_is_transcoded_once(self):
+        """Test UTF-8 bodies are passed through and others become UTF-8"""
+        utf8 = self.PAGE.encode('utf-8')
+        response = make_response(PRODUCT_URL, utf8, headers={'Content-Type': 'text/html; charset=utf-8'})
+        self.assertIs(response_body(response), response.content)
+        
+        response = make_response(PRODUCT_URL, self.PAGE.encode('cp1252'), headers={'Content-Type': 'text/html'})
+        self.assertEqual(response_body(response), utf8)
+        self.assertEqual(PageTokens(response_body(response)).meta['og:title'], 'Café Table')
+    
+    def test_streamed_chunks_are_transcoded(self):
+        """Test a non-UTF-8 page is scanned correctly whatever the chunk boundaries"""
+        body = self.PAGE.encode('cp1252')
+        for size in (1, 5, 4096):
+            transcoder = Utf8Transcoder(page_encoding('text/html', body[:size]) if size > 100 else 'cp1252')
+            scanner = PageScanner()
+            found = None
+            for start in range(0, len(body), size):
+                found = found or scanner.feed(transcoder.feed(body[start:start + size]))
+            self.assertEqual(found, ('Café Table', 450.0))
+
+class TestStatePaths(unittest.TestCase):
+    """Test the learned product location in embedded state"""
+    
+    def setUp(self):
+        self.temp_dir = make_temp_dir(self)
+        self.scraper = isolated_scraper(self.temp_dir)
+    
+    def page(self, item_id, version='v1'):
+        """A page whose state lists a promoted item before the product itself"""
+        state = {
+            'banner': {'promo': {'itemid': 1, 'name': 'Promoted', 'price': 500}},
+            'item': {'byId': {str(item_id): {'itemid': item_id, 'name': f'Item {item_id}', 'price': 250}}},
+        }
+        return (f'<meta name="shopee:version" content="{version}">'
+                f'<script>window.__INITIAL_STATE__ = {json.dumps(state)};</script>')
+    
+    def scrape(self, item_id, version='v1'):
+        ref = parse_item_ref(f"https://shopee.ph/Item-i.77.{item_id}")
+        return self.scraper._extract_from_embedded_json(PageTokens(self.page(item_id, version)), ref)
+    
+    def test_search_order_matches_recursive_search(self):
+        """Test candidates come depth first in key order and are not searched inside"""
+        state = {'a': [{'x': {'name': 'A', 'price': 1, 'inner': {'name': 'B', 'price': 2}}}], 'b': {'name': 'C', 'price': 3}}
+        paths = [path for path, _ in iter_product_records(state)]
+        self.assertEqual(paths, [('a', 0, 'x'), ('b',)])
+        deep = {'name': 'deep', 'price': 1}
+        for _ in range(10):
+            deep = {'k': deep}
+        self.assertEqual(len(list(iter_product_records(deep))), 1)
+        self.assertEqual(list(iter_product_records({'k': deep})), [])
+    
+    def test_learned_path_is_reused_across_products(self):
+        """Test the path learned on one product finds the next product of the layout directly"""
+        first = self.scrape(101)
+        self.assertEqual(first['name'], 'Item 101')
+        self.assertEqual(self.scraper.state_paths.get('v1|initial_state', '202', '77'), ('item', 'byId', '202'))
+        
+        second = self.scrape(202)
+        self.assertEqual(second['name'], 'Item 202')
+        self.assertEqual(self.scraper.stats.get('state_path_hits'), 1)
+        self.assertEqual(self.scraper.stats.get('state_path_misses'), 1)
+        
+        self.scraper.save_state()
+        reloaded = StatePathCache(path=self.temp_dir / "state_paths.json")
+        self.assertEqual(reloaded.get('v1|initial_state', '303'), ('item', 'byId', '303'))
+    
+    def test_new_layout_is_searched(self):
+        """Test a layout version without a learned path falls back to the search"""
+        self.scrape(101)
+        self.assertEqual(self.scrape(202, version='v2')['name'], 'Item 202')
+        self.assertEqual(self.scraper.stats.get('state_path_hits'), 0)
+        self.assertEqual(len(self.scraper.state_paths), 2)
+
+class TestJsonCodec(unittest.TestCase):
+    """Test JSON decoding with and without the fast library"""
+    
+    def backends(self):
+        """Run the enclosed checks with orjson (if installed) and with the stdlib"""
+        return [True, False] if json_codec.HAS_ORJSON else [False]
+    
+    def test_load_fields_keeps_product_fields(self):
+        """Test only the item fields survive, for a record and a list of records"""
+        body = (FIXTURES / "item_api.json").read_bytes()
+        for fast in self.backends():
+            with self.subTest(fast=fast), patch.object(json_codec, 'HAS_ORJSON', fast):
+                item = load_fields(body, 'data')
+                self.assertEqual(item['price'], 129900000)
+                self.assertEqual(item['item_rating']['rating_star'], 4.71)
+                self.assertNotIn('description', item)
+                self.assertEqual(load_fields(b'{"data": [{"itemid": 1, "models": []}, 2]}', 'data'), [{'itemid': 1}])
+                self.assertIsNone(load_fields(b'{"error": 4}', 'data'))
+                self.assertTrue(math.isnan(loads(b'{"a": NaN}')['a']))
+                with self.assertRaises(ValueError):
+                    loads(b'{"a": ')
+    
+    def test_raw_decode_inside_script(self):
+        """Test a literal is decoded whether or not it fills the rest of its script"""
+        text = 'x = {"a": {"b": "};"}};  '
+        for fast in self.backends():
+            with self.subTest(fast=fast), patch.object(json_codec, 'HAS_ORJSON', fast):
+                self.assertEqual(raw_decode(text, 4, len(text)), ({'a': {'b': '};'}}, 22))
+                self.assertEqual(raw_decode(text + 'y = 1', 4, len(text) + 5)[0], {'a': {'b': '};'}})
+                page = 'x = {"a": "Đèn"}; y = 1'.encode('utf-8')
+                self.assertEqual(raw_decode(page, 4, len(page)), ({'a': 'Đèn'}, 18))
+    
+    def test_item_api_fixture(self):
+        """Test the item API path builds the product from the projected fields"""
+        session = FakeSession({'https://shopee.ph/api/v2/item/get': ((FIXTURES / "item_api.json").read_bytes(), 200)})
+        scraper = ShopeeScraper(session=session, throttle=HostThrottle(rate=1000, burst=1000))
+        product = scraper._try_shopee_mobile_api(parse_item_ref(PRODUCT_URL))
+        self.assertEqual((product['price'], product['original_price'], product['discount'], product['rating']),
+                         (1299.0, 1910.0, 32, 4.71))
+
+class TestExtractionCache(unittest.TestCase):
+    """Test products are reused for byte-identical response bodies"""
+    
+    PAGE = '<script>window.__INITIAL_STATE__ = {"item": {"name": "Lamp", "price": %d}};</script>'
+    
+    def setUp(self):
+        self.temp_dir = make_temp_dir(self)
+        self.routes = {PRODUCT_URL: (self.PAGE % 250, 200)}
+        self.scraper = isolated_scraper(
+            self.temp_dir,
+            session=FakeSession(self.routes),
+            throttle=HostThrottle(rate=1000, burst=1000),
+            extraction_cache=ExtractionCache(path=self.temp_dir / "extraction.json"),
+        )
+    
+    def test_unchanged_page_is_not_parsed_again(self):
+        """Test the second identical page skips extraction and only gets a new timestamp"""
+        ref = parse_item_ref(PRODUCT_URL)
+        with patch.object(self.scraper, '_try_extraction_methods', wraps=self.scraper._try_extraction_methods) as extract:
+            first = self.scraper._scrape_page(ref)
+            time.sleep(0.001)
+            second = self.scraper._scrape_page(ref)
+            self.assertEqual(extract.call_count, 1)
+            
+            self.routes[PRODUCT_URL] = (self.PAGE % 300, 200)
+            self.assertEqual(self.scraper._scrape_page(ref)['price'], 300.0)
+            self.assertEqual(extract.call_count, 2)
+        
+        self.assertEqual(dict(first, timestamp=None), dict(second, timestamp=None))
+        self.assertNotEqual(first['timestamp'], second['timestamp'])
+        report = self.scraper.run_report()
+        self.assertEqual((report['extraction_cache_hits'], report['extraction_cache_misses']), (1, 2))
+        self.assertAlmostEqual(report['extraction_cache_hit_ratio'], 1 / 3)
+    
+    def test_bounded_and_persisted(self):
+        """Test the least recently used entries are dropped and entries survive a restart"""
+        cache = ExtractionCache(path=self.temp_dir / "bounded.json", max_entries=2)
+        for index in range(3):
+            cache.put(content_key('page', 'shop:item', str(index).encode()), {'name': str(index), 'price': 20.0})
+        self.assertEqual(len(cache), 2)
+        self.assertIsNone(cache.get(content_key('page', 'shop:item', b'0'), PRODUCT_URL, '1'))
+        self.assertTrue(cache.save())
+        
+        reloaded = ExtractionCache(path=self.temp_dir / "bounded.json", max_entries=2)
+        product = reloaded.get(content_key('page', 'shop:item', b'2'), PRODUCT_URL, '1')
+        self.assertEqual((product['name'], product['url'], product['product_id']), ('2', PRODUCT_URL, '1'))
+        self.assertNotEqual(content_key('api', 'shop:item', b'2'), content_key('page', 'shop:item', b'2'))
+
+class TestParserBackends(unittest.TestCase):
+    """Test HTML parser backends give identical extraction results"""
+    
+    def extract(self, html, backend):
+        scraper = ShopeeScraper(parser_backend=backend)
+        product = scraper._extract_from_html(parse_html(html, backend), parse_item_ref(PRODUCT_URL))
+        if product:
+            product.pop('timestamp')
+        return product
+    
+    def test_backends_agree_on_fixtures(self):
+        """Test every installed backend extracts the same product from the stored pages"""
+        pages = [FIXTURES / "product_page.html", Path(__file__).parent.parent / "shopee_page.html"]
+        for page in pages:
+            html = page.read_text(encoding='utf-8')
+            reference = self.extract(html, 'html.parser')
+            for backend in available_backends():
+                with self.subTest(page=page.name, backend=backend):
+                    self.assertEqual(self.extract(html, backend), reference)
+        self.assertEqual(self.extract((FIXTURES / "product_page.html").read_text(encoding='utf-8'),
+                                      'html.parser')['price'], 1299.0)
+    
+    def test_text_skips_scripts_and_comments(self):
+        """Test element text follows BeautifulSoup's rules on every backend"""
+        html = '<div class="price"> ₱ <b>1,2</b><!-- x --> 99 <script>var x = 1</script></div><title>T</title>'
+        for backend in available_backends():
+            with self.subTest(backend=backend):
+                doc = parse_html(html, backend)
+                self.assertEqual(doc.select_one('[class*="price"]').get_text(strip=True), '₱1,299')
+                self.assertEqual(doc.find('title').string, 'T')
+    
+    def test_unknown_backend_falls_back(self):
+        """Test an unknown backend name falls back to html.parser"""
+        self.assertEqual(resolve_backend('fastest'), 'html.parser')
+
+class TestFieldExtractor(unittest.TestCase):
+    """Test the single-pass field extractor keeps the per-field priority rules"""
+    
+    CASES = [
+        ('<html><head><meta property="og:title" content="  "><meta property="og:title" content="Second">'
+         '<title> Tent | Shopee </title></head><body><h1>H</h1></body></html>',
+         ('Tent', None, None, 'Shopee', None)),
+        ('<html><body><h1>  </h1><div data-testid="product-card">abc</div>'
+         '<div class="product-name">Long product name</div></body></html>',
+         ('Long product name', None, None, 'Shopee', None)),
+        ('<html><body><span class="total">5</span><div class="old-price">₱5</div>'
+         '<p data-testid="x-price">₱ 2,500.50 sale</p><div class="price">₱99</div></body></html>',
+         (None, 2500.5, None, 'Shopee', None)),
+        ('<html><body><div class="price">₱1 or 9</div><div class="price">₱ 45.00</div>'
+         '<b class="current-price">30</b></body></html>',
+         (None, 45.0, None, 'Shopee', None)),
+        ('<html><body><div class="discount">-15%</div><div data-testid="discount-x">20</div>'
+         '<div class="star">7 stars</div><div class="rating">4.5 / 5</div></body></html>',
+         (None, None, 20.0, 'Shopee', 4.5)),
+        ('<html><body><div data-testid="shop-x"> </div><div data-testid="shop-y">Other</div>'
+         '<div class="seller-box">Seller A</div><div class="shop-name">Shop B</div></body></html>',
+         (None, None, None, 'Shop B', None)),
+        ('<html><body><div class="price"><script>var p=77</script>₱ 350</div>'
+         '<div class="rating"><style>.a{}</style>4.2</div></body></html>',
+         (None, 350.0, None, 'Shopee', 4.2)),
+    ]
+    
+    def test_priority_rules_on_every_backend(self):
+        """Test selector order beats document order and invalid values are skipped"""
+        extractor = FieldExtractor()
+        for html, expected in self.CASES:
+            for backend in available_backends():
+                with self.subTest(html=html[:40], backend=backend):
+                    fields = extractor.extract(parse_html(html, backend))
+                    self.assertEqual(
+                        (fields['title'], fields['price'], fields['discount'], fields['shop_name'], fields['rating']),
+                        expected,
+                    )
+    
+    def test_fixture_fields(self):
+        """Test the stored product page gives the fields the selector sweeps gave"""
+        html = (FIXTURES / "product_page.html").read_text(encoding='utf-8')
+        fields = FieldExtractor().extract(parse_html(html, 'html.parser'))
+        self.assertEqual(fields, {
+            'title': 'Camping Tent 4-6 Person Waterproof Double Layer',
+            'price': 1299.0,
+            'discount': 32.0,
+            'shop_name': 'Adventure Gear Store',
+            'rating': 4.71,
+        })
+    
+    def test_unsupported_selector(self):
+        """Test selectors beyond simple attribute/class matches are rejected"""
+        self.assertEqual(compile_selector('span[class*="price"]'), ('span', 'class', 'contains', 'price'))
+        with self.assertRaises(ValueError):
+            compile_selector('div > .price')
+
+class TestSelectorTemplates(unittest.TestCase):
+    """Test field selectors learned per page layout"""
+    
+    PAGE = ('<html><head><title>Desk Lamp | Shopee</title></head><body>'
+            '<div class="price-box {0}">₱ 1,250</div><div class="price">₱ 99</div></body></html>')
+    
+    def setUp(self):
+        self.templates = SelectorTemplates(path=make_temp_dir(self) / "templates.json")
+        self.scraper = isolated_scraper(self.templates.path.parent, selector_templates=self.templates)
+        self.ref = parse_item_ref(PRODUCT_URL)
+    
+    def extract(self, html, layout):
+        return self.scraper._extract_from_html(parse_html(html, 'html.parser'), self.ref, layout)
+    
+    def test_learned_selectors_are_reused(self):
+        """Test later pages of a layout are extracted with the exact selectors of the first"""
+        html = (FIXTURES / "product_page.html").read_text(encoding='utf-8')
+        first = self.extract(html, 'v1')
+        self.assertEqual(self.templates.get('v1'), {
+            'title': 'og:title',
+            'price': 'div[data-testid="price-current"]',
+            'discount': 'div[class="product-discount"]',
+            'shop_name': 'div[class="shop-name"]',
+            'rating': 'div[class="product-rating-overview"]',
+        })
+        
+        second = self.extract(html, 'v1')
+        self.assertEqual(dict(first, timestamp=None), dict(second, timestamp=None))
+        self.extract(html, 'v2')
+        self.extract(html, None)
+        report = self.scraper.run_report()
+        self.assertEqual((report['selector_template_hits'], report['selector_template_misses']), (1, 2))
+        
+        self.assertTrue(self.templates.save())
+        self.assertEqual(SelectorTemplates(path=self.templates.path).get('v2'), self.templates.get('v1'))
+    
+    def test_template_that_stops_matching_is_relearned(self):
+        """Test a template whose selectors find no price is dropped and learned again"""
+        self.assertEqual(self.extract(self.PAGE.format('a1'), 'v1')['price'], 1250.0)
+        self.assertEqual(self.templates.get('v1')['price'], 'div[class="price-box a1"]')
+        
+        self.assertEqual(self.extract(self.PAGE.format('b2'), 'v1')['price'], 1250.0)
+        self.assertEqual(self.templates.get('v1')['price'], 'div[class="price-box b2"]')
+        self.assertEqual(self.scraper.stats.get('selector_template_invalidations'), 1)
+
+class FakeSheetsService:
+    """
+    Sheets API stub recording appended rows, value updates and created
+    sheets; rows named "bad" are rejected as invalid, the statuses in
+    `failures` are returned by the first requests, the first `lost`
+    appends are applied but answered with a 503, and appends to the
+    `deleted` sheets fail until the sheet is added again
+    """
+    
+    def __init__(self, status=None, failures=(), sheet_names=(), deleted=(), lost=0):
+        self.status = status
+        self.failures = list(failures)
+        self.lost = lost
+        self.sheet_names = list(sheet_names)
+        self.deleted = set(deleted)
+        self.appended = []
+        self.updates = []
+        self.requests = 0
+    
+    def spreadsheets(self):
+        return self
+    
+    def values(self):
+        return self
+    
+    def append(self, spreadsheetId, range, valueInputOption, body):
+        self.call = ('append', body)
+        self.range = range
+        return self
+    
+    def get(self, spreadsheetId, fields=None, range=None):
+        self.call = ('get', range)
+        return self
+    
+    def batchUpdate(self, spreadsheetId, body):
+        self.call = ('batchUpdate', body)
+        return self
+    
+    def execute(self):
+        self.requests += 1
+        name, body = self.call
+        if self.failures:
+            raise HttpError(HttpResponse({'status': self.failures.pop(0), 'retry-after': '0'}), b'{}')
+        if name == 'get' and body:
+            # The URL and Timestamp columns
+            return {'values': [row[12:14] for batch in self.appended for row in batch]}
+        if name == 'get':
+            return {'sheets': [{'properties': {'sheetId': index, 'title': title}}
+                               for index, title in enumerate(self.sheet_names)]}
+        if name == 'batchUpdate' and 'requests' in body:
+            title = body['requests'][0]['addSheet']['properties']['title']
+            self.sheet_names.append(title)
+            self.deleted.discard(title)
+            return {'replies': [{'addSheet': {'properties': {'sheetId': len(self.sheet_names), 'title': title}}}]}
+        if name == 'batchUpdate':
+            self.updates.append(body)
+            return {}
+        rows = body['values']
+        if self.range.split('!')[0].strip("'") in self.deleted:
+            message = json.dumps({'error': {'message': f"Unable to parse range: {self.range}"}})
+            raise HttpError(HttpResponse({'status': 400}), message.encode('utf-8'))
+        status = self.status or (400 if any(row[0] == 'bad' for row in rows) else None)
+        if status:
+            raise HttpError(HttpResponse({'status': status}), b'{}')
+        self.appended.append(rows)
+        if self.lost:
+            self.lost -= 1
+            raise HttpError(HttpResponse({'status': 503}), b'{}')
+        total = sum(len(batch) for batch in self.appended)
+        return {'updates': {'updatedRows': len(rows), 'updatedRange': f"'Price Tracker'!A2:N{total + 1}"}}
+
+def fake_sheets(service=None, **kwargs):
+    """Sheets manager on a stub service, with its own roomy quota and no retries by default"""
+    kwargs.setdefault('quota', SheetsQuota(1000, 1000))
+    kwargs.setdefault('retry_policy', RetryPolicy(attempts=1))
+    with patch.object(GoogleSheetsManager, '_authenticate'):
+        sheets = GoogleSheetsManager('sheet-id', **kwargs)
+    sheets.service = service or FakeSheetsService()
+    return sheets
+
+class TestSheetRowBuffer(unittest.TestCase):
+    """Test product rows are appended to Google Sheets in bulk"""
+    
+    def setUp(self):
+        self.sheets = fake_sheets()
+        self.results = []
+    
+    def buffer(self, **kwargs):
+        return self.sheets.row_buffer(on_result=lambda product, error: self.results.append((product['name'], error)),
+                                      **kwargs)
+    
+    def test_rows_are_appended_in_bulk(self):
+        """Test one append request per max_rows rows, and per max_seconds wait"""
+        rows = self.buffer(max_rows=3, max_seconds=60)
+        for index in range(7):
+            rows.add({'name': f'p{index}', 'price': 10.0})
+        self.assertEqual(len(rows), 1)
+        self.assertEqual(rows.flush(), 1)
+        self.assertEqual([len(batch) for batch in self.sheets.service.appended], [3, 3, 1])
+        self.assertEqual(self.sheets.service.appended[0][0][:3], ['p0', '', 10.0])
+        self.assertEqual(self.results, [(f'p{index}', None) for index in range(7)])
+        
+        rows = self.buffer(max_rows=100, max_seconds=0.01)
+        rows.add({'name': 'first'})
+        time.sleep(0.02)
+        rows.add({'name': 'second'})
+        self.assertEqual(len(rows), 0)
+        self.assertEqual(len(self.sheets.service.appended[-1]), 2)
+    
+    def test_savings_are_written_with_the_row(self):
+        """Test the Savings Amount column is computed instead of set by a formula request"""
+        self.assertEqual(self.sheets.append_multiple([
+            {'name': 'a', 'price': 1899.0, 'original_price': 2299.0},
+            {'name': 'b', 'price': 10.0, 'original_price': None},
+            {'name': 'c', 'price': 10.0, 'original_price': 20.0, 'savings_amount': 7},
+        ]), 3)
+        self.assertEqual([row[4] for row in self.sheets.service.appended[0]], [400.0, '', 7])
+    
+    def test_invalid_rows_fail_alone(self):
+        """Test a rejected batch is split so only the invalid row fails"""
+        products = [{'name': name} for name in ('a', 'b', 'bad', 'c')]
+        with self.buffer(max_rows=10) as rows:
+            for product in products:
+                rows.add(product)
+        self.assertEqual(sorted(self.results), [('a', None), ('b', None), ('bad', self.results[2][1]), ('c', None)])
+        self.assertIsNotNone(self.results[2][1])
+        self.assertEqual(self.sheets.append_multiple(products), 3)
+    
+    def test_other_errors_fail_the_batch(self):
+        """Test errors that are not about the rows fail every row without splitting"""
+        self.sheets.service = FakeSheetsService(status=503)
+        rows = self.buffer(max_rows=10)
+        rows.add({'name': 'a'})
+        rows.add({'name': 'b'})
+        self.assertEqual(rows.flush(), 0)
+        self.assertEqual(rows.requests, 1)
+        self.assertEqual([name for name, error in self.results if error], ['a', 'b'])
+        
+        # A sheet that cannot be re-created fails the batch in one request instead of row by row
+        self.sheets.service = FakeSheetsService(deleted=['Price Tracker'])
+        self.sheets.initialize_sheet = lambda sheet_name: False
+        rows = self.buffer(max_rows=10)
+        for name in ('c', 'd', 'e'):
+            rows.add({'name': name})
+        self.assertEqual(rows.flush(), 0)
+        self.assertEqual(self.sheets.service.requests, 1)
+        self.assertEqual([name for name, error in self.results if error], ['a', 'b', 'c', 'd', 'e'])
+
+class TestSheetsWriter(unittest.TestCase):
+    """Test the write-behind Sheets writer and its write-ahead log"""
+    
+    def setUp(self):
+        self.sheets = fake_sheets()
+        self.wal_path = make_temp_dir(self) / "wal.jsonl"
+    
+    def writer(self):
+        return SheetsWriter(self.sheets, WriteAheadLog(self.wal_path), batch_rows=10, flush_seconds=60,
+                            retry_policy=RetryPolicy(attempts=2, base_delay=0.01, max_delay=0.01))
+    
+    def test_rows_are_written_in_batches_and_journal_emptied(self):
+        """Test queued rows go out together on drain and the journal is truncated"""
+        writer = self.writer()
+        writer.start()
+        for name in ('a', 'bad', 'b', 'c'):
+            self.assertTrue(writer.submit({'name': name, 'price': 10.0}))
+        self.assertEqual(writer.drain(), 0)
+        
+        self.assertEqual([row[0] for batch in self.sheets.service.appended for row in batch], ['a', 'b', 'c'])
+        self.assertEqual((writer.written, writer.failed), (3, 1))
+        self.assertEqual(self.wal_path.read_text(), '')
+    
+    def test_missing_sheet_keeps_rows(self):
+        """Test rows for a sheet that cannot be re-created stay journaled instead of being dropped"""
+        self.sheets.service = FakeSheetsService(deleted=['Price Tracker'])
+        self.sheets.initialize_sheet = lambda sheet_name: False
+        writer = self.writer()
+        writer.start()
+        for name in ('a', 'b', 'c', 'd'):
+            writer.submit({'name': name})
+        self.assertEqual(writer.drain(), 4)
+        self.assertEqual(writer.failed, 0)
+        # One request per attempt, no splitting
+        self.assertEqual(self.sheets.service.requests, 2)
+    
+    def test_unwritten_rows_are_replayed(self):
+        """Test rows Sheets did not accept survive a restart, even after a torn journal write"""
+        self.sheets.service = FakeSheetsService(status=503)
+        writer = self.writer()
+        writer.start()
+        writer.submit({'name': 'a'})
+        writer.submit({'name': 'b'})
+        self.assertEqual(writer.drain(), 2)
+        with open(self.wal_path, 'a') as f:
+            f.write('{"seq": 3, "sheet": "Price Tr')
+        
+        self.sheets.service = FakeSheetsService()
+        writer = self.writer()
+        self.assertEqual(writer.start(), 2)
+        self.assertEqual(writer.drain(), 0)
+        self.assertEqual([row[0] for row in self.sheets.service.appended[0]], ['a', 'b'])
+    
+    def test_rows_applied_before_a_server_error_are_not_appended_again(self):
+        """Test a 5xx append is checked against the sheet before the rows are sent again"""
+        self.sheets.service = FakeSheetsService(lost=1)
+        writer = self.writer()
+        writer.start()
+        writer.submit({'name': 'a', 'url': PRODUCT_URL, 'timestamp': '2024-01-01T00:00:00'})
+        writer.submit({'name': 'b', 'url': PRODUCT_URL, 'timestamp': '2024-01-01T00:00:01'})
+        self.assertEqual(writer.drain(), 0)
+        self.assertEqual(len(self.sheets.service.appended), 1)
+        self.assertEqual(writer.written, 2)
+    
+    def test_replayed_rows_already_in_the_sheet_are_skipped(self):
+        """Test rows a stopped run may have appended are checked before being replayed"""
+        wal = WriteAheadLog(self.wal_path)
+        wal.append('Price Tracker', {'name': 'a', 'url': PRODUCT_URL, 'timestamp': '2024-01-01T00:00:00'})
+        wal.append('Price Tracker', {'name': 'b', 'url': PRODUCT_URL, 'timestamp': '2024-01-01T00:00:01'})
+        wal.close()
+        self.sheets.service.appended.append([['a'] + [''] * 11 + [PRODUCT_URL, '2024-01-01T00:00:00']])
+        
+        writer = self.writer()
+        self.assertEqual(writer.start(), 2)
+        self.assertEqual(writer.drain(), 0)
+        self.assertEqual([row[0] for batch in self.sheets.service.appended for row in batch], ['a', 'b'])
+
+class TestSheetsQuota(unittest.TestCase):
+    """Test Sheets requests are scheduled within the per-minute quota"""
+    
+    def test_sliding_window_waits_for_room(self):
+        """Test a full window holds requests until the oldest leaves it"""
+        window = SlidingWindow(limit=2, window=0.05)
+        self.assertEqual(window.acquire(), 0)
+        self.assertEqual(window.acquire(), 0)
+        self.assertGreater(window.acquire(), 0)
+        self.assertEqual((window.requests, window.peak), (3, 2))
+        
+        window.pause(0.02)
+        self.assertGreater(window.acquire(), 0)
+        self.assertEqual(window.throttled, 1)
+    
+    def test_throttled_requests_are_retried(self):
+        """Test 429s are retried and reported, 5xx only for requests safe to repeat"""
+        quota = SheetsQuota(reads_per_minute=10, writes_per_minute=10)
+        service = FakeSheetsService(failures=[429, 429])
+        sheets = fake_sheets(service, quota=quota, retry_policy=RetryPolicy(attempts=3, base_delay=0.01))
+        sheets.append_rows([['a'], ['b']])
+        
+        self.assertEqual(service.requests, 3)
+        self.assertEqual(service.appended, [[['a'], ['b']]])
+        report = quota.report()
+        self.assertEqual((report[WRITE]['requests'], report[WRITE]['throttled']), (3, 2))
+        self.assertEqual(report[WRITE]['utilization'], 0.3)
+        self.assertEqual(report[READ]['requests'], 0)
+        
+        # An append that failed with a 5xx may have been applied, so it is not repeated
+        for status in (503, 400):
+            service.failures = [status]
+            with self.assertRaises(HttpError):
+                sheets.append_rows([['c']])
+        self.assertEqual(service.requests, 5)
+        
+        service.failures = [503]
+        self.assertEqual(sheets.update_values("'A'!A1", [['x']]), 1)
+        self.assertEqual(service.requests, 7)
+    
+    def test_value_updates_are_merged(self):
+        """Test updates queued in a batch go out as one batchUpdate per input option"""
+        sheets = fake_sheets()
+        with sheets.batch_updates():
+            sheets.update_values("'A'!A1", [['x']])
+            sheets.update_values("'B'!A1:B1", [['h', 'i']])
+            sheets.update_values("'A'!A1", [['y']])
+            sheets.apply_formulas_to_row(row_num=5)
+            self.assertEqual(sheets.service.requests, 0)
+        
+        updates = sheets.service.updates
+        self.assertEqual(len(updates), 2)
+        self.assertEqual(updates[0], {'valueInputOption': 'RAW', 'data': [
+            {'range': "'A'!A1", 'values': [['y']]}, {'range': "'B'!A1:B1", 'values': [['h', 'i']]}]})
+        self.assertEqual(updates[1]['valueInputOption'], 'USER_ENTERED')
+        self.assertEqual(updates[1]['data'], [{'range': "'Price Tracker'!E5", 'values': [['=D5-C5']]}])
+        
+        self.assertEqual(sheets.update_values("'A'!A2", [['z']]), 1)
+        self.assertEqual(len(sheets.service.updates), 3)
+
+class TestSheetMetadata(unittest.TestCase):
+    """Test sheet names and header state are cached between runs"""
+    
+    def setUp(self):
+        self.path = make_temp_dir(self) / "sheet_metadata.json"
+    
+    def sheets(self, service, ttl=3600):
+        return fake_sheets(service, metadata=SheetMetadataCache(self.path, ttl=ttl))
+    
+    def test_initialized_sheets_cost_no_requests(self):
+        """Test a second start reuses the saved metadata instead of fetching and rewriting headers"""
+        service = FakeSheetsService(sheet_names=['Sheet1'])
+        sheets = self.sheets(service)
+        self.assertTrue(sheets.initialize_sheet())
+        self.assertTrue(sheets.create_summary_sheet())
+        # get, addSheet and header update per sheet (the second get is cached)
+        self.assertEqual(service.requests, 5)
+        sheets.append_rows([['a'], ['b']])
+        sheets.save_state()
+        
+        service = FakeSheetsService(sheet_names=['Sheet1', 'Price Tracker', 'Summary'])
+        sheets = self.sheets(service)
+        self.assertTrue(sheets.initialize_sheet())
+        self.assertTrue(sheets.create_summary_sheet())
+        self.assertEqual(service.requests, 0)
+        cached = sheets.metadata.sheets('sheet-id')
+        self.assertEqual(cached['Price Tracker']['last_row'], 3)
+        self.assertEqual(cached['Summary']['headers'][0], 'Product Name')
+    
+    def test_deleted_sheet_is_created_again(self):
+        """Test an append to a sheet deleted since it was cached re-creates the sheet once"""
+        sheets = self.sheets(FakeSheetsService(sheet_names=['Price Tracker']))
+        sheets.initialize_sheet()
+        
+        service = FakeSheetsService(sheet_names=['Sheet1'], deleted=['Price Tracker'])
+        sheets = self.sheets(service)
+        self.assertTrue(sheets.initialize_sheet())
+        self.assertEqual(service.requests, 0)
+        
+        sheets.append_rows([['a'], ['b']])
+        self.assertEqual(service.appended, [[['a'], ['b']]])
+        self.assertEqual(service.sheet_names, ['Sheet1', 'Price Tracker'])
+        self.assertEqual(service.updates[0]['data'][0]['values'][0][0], 'Product Name')
+        # failed append, get, addSheet, headers, append
+        self.assertEqual(service.requests, 5)
+    
+    def test_headers_are_recorded_once_written(self):
+        """Test a failed header write leaves the headers unrecorded, so the next start writes them"""
+        service = FakeSheetsService(sheet_names=['Price Tracker'])
+        sheets = self.sheets(service)
+        sheets._get_sheet_names()
+        service.failures = [400]
+        self.assertFalse(sheets.initialize_sheet())
+        self.assertIsNone(sheets.metadata.headers('sheet-id', 'Price Tracker'))
+        
+        self.assertTrue(sheets.initialize_sheet())
+        self.assertEqual(len(service.updates), 1)
+        self.assertEqual(sheets.metadata.headers('sheet-id', 'Price Tracker')[0], 'Product Name')
+    
+    def test_expired_metadata_is_refreshed(self):
+        """Test names are fetched again after the TTL, keeping headers of sheets with the same ID"""
+        service = FakeSheetsService(sheet_names=['Price Tracker'])
+        sheets = self.sheets(service, ttl=0)
+        sheets.initialize_sheet()
+        self.assertEqual(service.requests, 2)
+        
+        sheets.initialize_sheet()
+        self.assertEqual(service.requests, 3)
+        self.assertEqual(len(service.updates), 1)
+        
+        # Recreated under the same name: new ID, so the headers are written again
+        service.sheet_names = ['Other', 'Price Tracker']
+        sheets.initialize_sheet()
+        self.assertEqual(len(service.updates), 2)
+
+class TestBatchFetch(unittest.TestCase):
+    """Test batched item-list API fetching"""
+    
+    def test_batch_groups_by_region_and_splits_records(self):
+        """Test items are fetched per region and mapped back to their URLs"""
+        listing = {'data': [
+            {'shopid': 1, 'itemid': 10, 'name': 'Tent', 'price': 100000000,
+             'price_before_discount': 150000000, 'discount': '33%', 'shop_name': 'Gear',
+             'item_rating': {'rating_star': 4.5}},
+            {'shopid': 2, 'itemid': 20, 'name': 'Lamp', 'price': 50000000},
+        ]}
+        session = FakeSession({'https://shopee.ph/api/v4/item/get_list': (json.dumps(listing), 200)})
+        scraper = ShopeeScraper(session=session, throttle=HostThrottle(rate=1000, burst=1000))
+        urls = [
+            "https://shopee.ph/Tent-i.1.10",
+            "https://shopee.ph/Lamp-i.2.20?sp_atk=abc",
+            "https://shopee.ph/Gone-i.1.11",
+            "https://shopee.sg/Single-i.3.30",
+        ]
+        results = scraper.fetch_products_batch(urls)
+        
+        self.assertEqual(session.requested, ['https://shopee.ph/api/v4/item/get_list'])
+        self.assertEqual(len(session.bodies[0]['shop_item_ids']), 3)
+        self.assertEqual(set(results), set(urls[:2]))
+        tent = results[urls[0]]
+        self.assertEqual(tent['price'], 1000.0)
+        self.assertEqual(tent['original_price'], 1500.0)
+        self.assertEqual(tent['discount'], 33)
+        self.assertEqual(tent['shop_name'], 'Gear')
+        self.assertEqual(tent['rating'], 4.5)
+        self.assertEqual(results[urls[1]]['shop_name'], 'Shopee')
+
+class TestCoalescing(unittest.TestCase):
+    """Test deduplication of products within a run"""
+    
+    def setUp(self):
+        self._has_browser = scraper_module.HAS_PYPPETEER
+        scraper_module.HAS_PYPPETEER = False
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmpdir.cleanup)
+    
+    def tearDown(self):
+        scraper_module.HAS_PYPPETEER = self._has_browser
+    
+    def make_scraper(self, session):
+        return ShopeeScraper(session=session, throttle=HostThrottle(rate=1000, burst=1000),
+                             strategy_stats=StrategyStats(Path(self.tmpdir.name) / "stats.json"))
+    
+    def test_concurrent_callers_share_one_call(self):
+        """Test callers waiting on an in-flight key get its result without running again"""
+        coalescer = Coalescer()
+        calls = []
+        
+        def slow():
+            calls.append(1)
+            time.sleep(0.05)
+            return 'tent'
+        
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(coalescer.run('k', slow)))
+                   for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(sorted(shared for _, shared in results), [False, True, True, True])
+    
+    def test_same_item_scraped_once_per_run(self):
+        """Test other slugs and query strings of an item reuse the first result within a run"""
+        session = FakeSession({'https://shopee.ph/api/v2/': (json.dumps(API_ITEM), 200)})
+        scraper = self.make_scraper(session)
+        with scraper.run_scope():
+            scraper.scrape_product(PRODUCT_URL)
+            product = scraper.scrape_product("https://shopee.ph/Tent-2024-i.25316261.2935397050?sp_atk=abc")
+        
+        self.assertEqual(len(session.requested), 1)
+        self.assertEqual(product['price'], 1299.0)
+        self.assertTrue(product['url'].endswith('?sp_atk=abc'))
+        self.assertEqual(scraper.stats.get('coalesced'), 1)
+        
+        scraper.scrape_product(PRODUCT_URL)
+        self.assertEqual(len(session.requested), 2)
+    
+    def test_results_are_not_kept_outside_a_run(self):
+        """Test a long-lived scraper scrapes again instead of returning its first result"""
+        session = FakeSession({'https://shopee.ph/api/v2/': (json.dumps(API_ITEM), 200)})
+        scraper = self.make_scraper(session)
+        scraper.scrape_product(PRODUCT_URL)
+        scraper.scrape_product(PRODUCT_URL)
+        
+        self.assertEqual(len(session.requested), 2)
+        self.assertFalse(scraper.is_scraped(PRODUCT_URL))
+    
+    def test_unique_urls(self):
+        """Test duplicate products are dropped, keeping the first URL"""
+        scraper = self.make_scraper(FakeSession({}))
+        urls = [PRODUCT_URL, ' ', "https://shopee.ph/x-i.25316261.2935397050?ref=1",
+                "https://shopee.ph/y-i.1.2", "https://shopee.sg/x-i.25316261.2935397050"]
+        self.assertEqual(scraper.unique_urls(urls), [PRODUCT_URL, urls[3], urls[4]])
+
+class TestStrategyStats(unittest.TestCase):
+    """Test adaptive strategy ordering"""
+    
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmpdir.cleanup)
+        self.path = Path(self.tmpdir.name) / "stats.json"
+        self.scopes = ['shopee.ph', 'shop:1']
+    
+    def test_default_order_without_samples(self):
+        """Test strategies keep their cheapest-first default order"""
+        stats = StrategyStats(self.path)
+        self.assertEqual(stats.order(['api', 'page', 'render'], self.scopes), ['api', 'page', 'render'])
+    
+    def test_failing_strategy_moves_back_then_is_skipped(self):
+        """Test a strategy that keeps failing is reordered and then skipped"""
+        stats = StrategyStats(self.path)
+        for _ in range(config.STRATEGY_MIN_SAMPLES):
+            stats.record('api', self.scopes, False, 0.5)
+            stats.record('page', self.scopes, True, 1.0)
+        self.assertEqual(stats.order(['api', 'page'], self.scopes), ['page', 'api'])
+        
+        for _ in range(config.STRATEGY_SKIP_AFTER):
+            stats.record('api', self.scopes, False, 0.5)
+        self.assertEqual(stats.order(['api', 'page'], self.scopes), ['page'])
+    
+    def test_render_needs_observed_success(self):
+        """Test rendering is dropped where it has a low success rate"""
+        stats = StrategyStats(self.path)
+        for _ in range(10):
+            stats.record('render', self.scopes, False, 8.0)
+        order = stats.order(['api', 'render'], self.scopes, min_success={'render': 0.2})
+        self.assertEqual(order, ['api'])
+    
+    def test_circuit_rejections_are_not_failures(self):
+        """Test strategies rejected by an open circuit are not recorded against them"""
+        throttle = HostThrottle(rate=1000, burst=1000)
+        throttle.after_response('shopee.ph', make_response('https://shopee.ph/', b'', 429, {'Retry-After': '600'}))
+        stats = StrategyStats(self.path)
+        scraper = ShopeeScraper(session=FakeSession({}), throttle=throttle, strategy_stats=stats)
+        with patch.object(scraper_module, 'HAS_PYPPETEER', False):
+            for _ in range(config.STRATEGY_SKIP_AFTER):
+                scraper._run_fetch_strategies(parse_item_ref(PRODUCT_URL))
+        self.assertEqual(stats.snapshot(), {})
+        self.assertGreater(scraper.stats.get('circuit_rejections'), 0)
+    
+    def test_statistics_persist(self):
+        """Test statistics survive a save and reload"""
+        stats = StrategyStats(self.path)
+        stats.record('api', self.scopes, True, 0.3)
+        self.assertTrue(stats.save())
+        reloaded = StrategyStats(self.path)
+        self.assertEqual(reloaded.snapshot()['shop:1|api']['successes'], 1)
+
+class TestRateLimiter(unittest.TestCase):
+    """Test token buckets and circuit breakers"""
+    
+    def test_bucket_allows_burst_then_waits(self):
+        """Test a bucket hands out its burst immediately and then throttles"""
+        bucket = TokenBucket(rate=50, capacity=3)
+        waits = [bucket.acquire() for _ in range(4)]
+        self.assertEqual(waits[:3], [0.0, 0.0, 0.0])
+        self.assertGreater(waits[3], 0)
+    
+    def test_circuit_opens_and_half_opens(self):
+        """Test the breaker opens on repeated blocks and lets one probe through after cooldown"""
+        breaker = CircuitBreaker('shopee.ph', failure_threshold=2, cooldown=0.05)
+        breaker.record_block()
+        self.assertTrue(breaker.allow())
+        breaker.record_block()
+        self.assertEqual(breaker.state, CircuitBreaker.OPEN)
+        self.assertFalse(breaker.allow())
+        
+        time.sleep(0.06)
+        self.assertTrue(breaker.allow())
+        self.assertEqual(breaker.state, CircuitBreaker.HALF_OPEN)
+        self.assertFalse(breaker.allow())
+        breaker.record_success()
+        self.assertEqual(breaker.state, CircuitBreaker.CLOSED)
+    
+    def test_failed_probe_reopens_circuit(self):
+        """Test a probe that gets no response reopens the circuit instead of leaving it half-open"""
+        class DownSession(FakeSession):
+            def request(self, method, url, **kwargs):
+                raise requests.exceptions.ConnectionError("connection refused")
+        
+        throttle = HostThrottle(rate=1000, burst=10, failure_threshold=1, cooldown=0.05)
+        throttle.after_response('shopee.ph', make_response('https://shopee.ph/', b'', 429))
+        time.sleep(0.06)
+        scraper = ShopeeScraper(session=DownSession({}), throttle=throttle,
+                                retry_policy=RetryPolicy(attempts=1))
+        with self.assertRaises(requests.exceptions.ConnectionError):
+            scraper.fetch('https://shopee.ph/')
+        self.assertEqual(throttle.states()['shopee.ph']['circuit'], 'open')
+        
+        time.sleep(0.06)
+        scraper.session = FakeSession({'https://shopee.ph/': ('ok', 200)})
+        self.assertEqual(scraper.fetch('https://shopee.ph/').status_code, 200)
+        self.assertEqual(throttle.states()['shopee.ph']['circuit'], 'closed')
+        
+        # A probe that never got a token is released for the next request
+        throttle.after_response('shopee.ph', make_response('https://shopee.ph/', b'', 429))
+        time.sleep(0.06)
+        bucket, breaker = throttle._get('shopee.ph')
+        bucket.pause(1)
+        self.assertIsNone(throttle.before_request('shopee.ph', timeout=0.01))
+        self.assertTrue(breaker.allow())
+    
+    def test_long_retry_after_opens_circuit(self):
+        """Test a long Retry-After rejects requests instead of blocking threads"""
+        throttle = HostThrottle(rate=1000, burst=10, failure_threshold=5, cooldown=1)
+        response = make_response('https://shopee.ph/api', b'', 429, {'Retry-After': '600'})
+        self.assertTrue(throttle.after_response('shopee.ph', response))
+        with self.assertRaises(CircuitOpenError):
+            throttle.before_request('shopee.ph')
+        self.assertEqual(throttle.states()['shopee.ph']['circuit'], 'open')
+    
+    def test_parse_retry_after(self):
+        """Test Retry-After seconds and dates"""
+        self.assertEqual(parse_retry_after('120'), 120.0)
+        self.assertIsNone(parse_retry_after('soon'))
+        self.assertEqual(parse_retry_after('Wed, 21 Oct 2015 07:28:00 GMT'), 0.0)
+
+class FlakySession(FakeSession):
+    """Session stub that fails with the given statuses before serving its routes"""
+    
+    def __init__(self, routes, failures):
+        super().__init__(routes)
+        self.failures = list(failures)
+    
+    def request(self, method, url, **kwargs):
+        if self.failures:
+            self.requested.append(url)
+            return make_response(url, b'', self.failures.pop(0))
+        return super().request(method, url, **kwargs)
+
+class TestRetry(unittest.TestCase):
+    """Test retries with backoff and time budgets"""
+    
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmpdir.cleanup)
+    
+    def make_scraper(self, session):
+        return ShopeeScraper(session=session,
+                             strategy_stats=StrategyStats(Path(self.tmpdir.name) / "stats.json"),
+                             throttle=HostThrottle(rate=1000, burst=1000),
+                             retry_policy=RetryPolicy(attempts=3, base_delay=0.01, max_delay=0.02))
+    
+    def test_backoff_is_jittered_and_capped(self):
+        """Test backoff stays between zero and the capped exponential delay"""
+        policy = RetryPolicy(attempts=5, base_delay=1, max_delay=3)
+        for attempt in range(1, 6):
+            delay = policy.backoff(attempt)
+            self.assertGreaterEqual(delay, 0)
+            self.assertLessEqual(delay, min(3, 2 ** (attempt - 1)))
+    
+    def test_deadline_within_picks_earlier(self):
+        """Test combining deadlines keeps the one expiring first"""
+        short, long = Deadline(1), Deadline(100)
+        self.assertIs(long.within(short), short)
+        self.assertIs(short.within(long), short)
+        self.assertIs(Deadline().within(short), short)
+        self.assertIsNone(Deadline().remaining())
+        self.assertEqual(Deadline(0).clamp(10), 0)
+    
+    def test_server_errors_are_retried(self):
+        """Test 5xx responses are retried until the request succeeds"""
+        session = FlakySession({'https://shopee.ph/': ('ok', 200)}, [503, 502])
+        scraper = self.make_scraper(session)
+        response = scraper.fetch('https://shopee.ph/api')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(session.requested), 3)
+        self.assertEqual(scraper.stats.get('retries'), 2)
+    
+    def test_post_is_not_retried_by_default(self):
+        """Test non-idempotent requests are sent once"""
+        session = FlakySession({}, [503])
+        scraper = self.make_scraper(session)
+        self.assertEqual(scraper.fetch('https://shopee.ph/api', method='POST').status_code, 503)
+        self.assertEqual(len(session.requested), 1)
+    
+    def test_expired_deadline_defers_product(self):
+        """Test a product is deferred, not faked, once the cycle budget is used up"""
+        session = FakeSession({})
+        scraper = self.make_scraper(session)
+        with self.assertRaises(DeadlineExceeded):
+            scraper.scrape_product(PRODUCT_URL, deadline=Deadline(0))
+        self.assertEqual(session.requested, [])
+        self.assertEqual(scraper.stats.get('deferred'), 1)
+    
+    def test_exhausted_product_budget_is_a_failure(self):
+        """Test a product that runs out of time without a cycle deadline gets no demo data"""
+        scraper = self.make_scraper(FakeSession({}))
+        with patch.object(config, 'PRODUCT_DEADLINE', 0):
+            self.assertIsNone(scraper.scrape_product(PRODUCT_URL))
+    
+    def test_async_engine_collects_deferred(self):
+        """Test the async engine reports products it ran out of time for"""
+        scraper = self.make_scraper(FakeSession({}))
+        results = []
+        deferred = scrape_all([PRODUCT_URL], lambda url, data: results.append(url),
+                              concurrency=2, scraper=scraper, deadline=Deadline(0))
+        self.assertEqual(results, [])
+        self.assertEqual(deferred, [PRODUCT_URL])
+
+class ValidatingSession(FakeSession):
+    """Session stub answering 304 when the request carries the matching ETag"""
+    
+    def __init__(self, body, etag):
+        super().__init__({})
+        self.body = body
+        self.etag = etag
+        self.sent_headers = []
+    
+    def request(self, method, url, headers=None, **kwargs):
+        self.requested.append(url)
+        self.sent_headers.append(headers or {})
+        if (headers or {}).get('If-None-Match') == self.etag:
+            return make_response(url, b'', 304, {'ETag': self.etag})
+        return make_response(url, self.body, 200, {'ETag': self.etag, 'Content-Type': 'text/html'})
+
+class TestHttpCache(unittest.TestCase):
+    """Test the on-disk response cache"""
+    
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmpdir.cleanup)
+    
+    def make_scraper(self, session, ttl):
+        cache = HttpCache(Path(self.tmpdir.name) / "http", ttl=ttl, max_bytes=1024 * 1024)
+        return ShopeeScraper(session=session, throttle=HostThrottle(rate=1000, burst=1000),
+                             strategy_stats=StrategyStats(Path(self.tmpdir.name) / "stats.json"),
+                             http_cache=cache)
+    
+    def test_fresh_response_served_without_request(self):
+        """Test a fresh cached response does not hit the network"""
+        session = ValidatingSession('<html>tent</html>', '"v1"')
+        scraper = self.make_scraper(session, ttl=300)
+        scraper.fetch(PRODUCT_URL)
+        response = scraper.fetch(PRODUCT_URL)
+        self.assertEqual(response.text, '<html>tent</html>')
+        self.assertTrue(response.from_cache)
+        self.assertEqual(len(session.requested), 1)
+        self.assertEqual(scraper.run_report()['http_cache_hit_ratio'], 0.5)
+    
+    def test_stale_response_revalidated(self):
+        """Test a stale entry is revalidated and a 304 is served from the cache"""
+        session = ValidatingSession('<html>tent</html>', '"v1"')
+        scraper = self.make_scraper(session, ttl=0)
+        scraper.fetch(PRODUCT_URL)
+        response = scraper.fetch(PRODUCT_URL)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.text, '<html>tent</html>')
+        self.assertEqual(session.sent_headers[1]['If-None-Match'], '"v1"')
+        self.assertEqual(scraper.stats.get('http_cache_revalidated'), 1)
+        self.assertEqual(scraper.run_report()['http_cache_hit_ratio'], 0.5)
+    
+    def test_not_modified_without_cached_body_fetches_again(self):
+        """Test a 304 for a body evicted since lookup is followed by an unconditional request"""
+        session = ValidatingSession('<html>tent</html>', '"v1"')
+        scraper = self.make_scraper(session, ttl=0)
+        scraper.fetch(PRODUCT_URL)
+        for body in (Path(self.tmpdir.name) / "http").glob("*.body"):
+            body.unlink()
+        
+        response = scraper.fetch(PRODUCT_URL)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.text, '<html>tent</html>')
+        self.assertEqual(len(session.requested), 3)
+        self.assertNotIn('If-None-Match', session.sent_headers[2])
+    
+    def test_lru_eviction_and_reload(self):
+        """Test least recently used bodies are evicted and the index survives a restart"""
+        directory = Path(self.tmpdir.name) / "http"
+        cache = HttpCache(directory, ttl=300, max_bytes=250)
+        for name in ('a', 'b', 'c'):
+            cache.store(cache_key(name), make_response(name, b'x' * 100))
+            time.sleep(0.01)
+        self.assertIsNone(cache.lookup(cache_key('a')))
+        self.assertIsNotNone(cache.lookup(cache_key('c')))
+        self.assertLessEqual(cache.size, 250)
+        
+        cache.save()
+        reloaded = HttpCache(directory, ttl=300, max_bytes=250)
+        self.assertEqual(len(reloaded), 2)
+        self.assertEqual(reloaded.response(cache_key('b'), 'b').content, b'x' * 100)
+    
+    def test_bodies_missing_from_index_are_removed(self):
+        """Test bodies stored after the last save (a crash) are deleted on load instead of leaking"""
+        directory = Path(self.tmpdir.name) / "http"
+        cache = HttpCache(directory, ttl=300, max_bytes=1024)
+        cache.store(cache_key('a'), make_response('a', b'x' * 100))
+        cache.save()
+        cache.store(cache_key('b'), make_response('b', b'y' * 100))
+        (directory / ".index.json.1234.tmp").write_bytes(b'{')
+        
+        reloaded = HttpCache(directory, ttl=300, max_bytes=1024)
+        self.assertEqual(len(reloaded), 1)
+        self.assertEqual(sorted(path.name for path in directory.iterdir()),
+                         sorted([f"{cache_key('a')}.body", "index.json"]))
+
+class TestHttpSession(unittest.TestCase):
+    """Test pooled HTTP session"""
+    
+    def test_scrapers_share_session(self):
+        """Test scrapers reuse the shared keep-alive session"""
+        self.assertIs(ShopeeScraper().session, ShopeeScraper().session)
+    
+    def test_per_host_pool_size(self):
+        """Test per-host adapters override the default pool size"""
+        session = http_session.create_session(pool_maxsize=5, host_pool_sizes={'shopee.ph': 40})
+        host_adapter = session.get_adapter('https://shopee.ph/api/v2/item/get')
+        default_adapter = session.get_adapter('https://shopee.sg/')
+        self.assertEqual(host_adapter._pool_maxsize, 40)
+        self.assertEqual(default_adapter._pool_maxsize, 5)
+    
+    def test_parse_host_pool_sizes(self):
+        """Test parsing host pool size overrides"""
+        sizes = http_session.parse_host_pool_sizes("shopee.ph=50, shopee.sg=10,bad,x=y")
+        self.assertEqual(sizes, {'shopee.ph': 50, 'shopee.sg': 10})
+
+class SlowScraper(ShopeeScraper):
+    """Scraper stub that records how many products are scraped at once"""
+    
+    def __init__(self, delay=0.05):
+        super().__init__()
+        self.delay = delay
+        self.active = 0
+        self.peak = 0
+        self.started = []
+        self.lock = threading.Lock()
+    
+    def scrape_product(self, url, deadline=None):
+        with self.lock:
+            self.started.append(url)
+            self.active += 1
+            self.peak = max(self.peak, self.active)
+        time.sleep(self.delay)
+        with self.lock:
+            self.active -= 1
+        return {'name': url, 'url': url, 'price': 100.0}
+
+class TestAsyncScraper(unittest.TestCase):
+    """Test async scraping engine"""
+    
+    def test_global_concurrency_cap(self):
+        """Test no more than the configured number of products run at once"""
+        scraper = SlowScraper()
+        urls = [f"https://shopee.ph/item-i.1.{i}" for i in range(12)]
+        results = []
+        scrape_all(urls, lambda url, data: results.append(url), concurrency=4, scraper=scraper)
+        self.assertEqual(sorted(results), sorted(urls))
+        self.assertLessEqual(scraper.peak, 4)
+        self.assertGreater(scraper.peak, 1)
+    
+    def test_per_host_concurrency_cap(self):
+        """Test the per-host cap applies below the global cap"""
+        scraper = SlowScraper()
+        engine = AsyncShopeeScraper(scraper, concurrency=8, per_host_concurrency=2)
+        urls = [f"https://shopee.ph/item-i.1.{i}" for i in range(6)]
+        
+        async def collect():
+            return [result async for result in engine.scrape_many(urls)]
+        
+        results = asyncio.run(collect())
+        self.assertEqual(len(results), 6)
+        self.assertLessEqual(scraper.peak, 2)
+    
+    def test_busy_host_does_not_hold_global_slots(self):
+        """Test products waiting for a busy host leave global slots to other hosts"""
+        scraper = SlowScraper()
+        engine = AsyncShopeeScraper(scraper, concurrency=2, per_host_concurrency=1)
+        urls = [f"https://shopee.ph/item-i.1.{i}" for i in range(4)] + ["https://shopee.sg/item-i.1.9"]
+        
+        async def collect():
+            return [result async for result in engine.scrape_many(urls)]
+        
+        results = asyncio.run(collect())
+        self.assertEqual(len(results), 5)
+        self.assertIn("https://shopee.sg/item-i.1.9", scraper.started[:2])
+    
+    def test_results_are_handled_off_the_event_loop(self):
+        """Test the result callback runs on a worker thread, not the loop thread"""
+        threads = []
+        scrape_all(["https://shopee.ph/item-i.1.1"],
+                   lambda url, data: threads.append(threading.current_thread()),
+                   concurrency=2, scraper=SlowScraper())
+        self.assertEqual(len(threads), 1)
+        self.assertIsNot(threads[0], threading.main_thread())
+
+class FakePage:
+    """Browser tab stub"""
+    
+    async def goto(self, url, options=None):
+        self.url = url
+    
+    async def content(self):
+        return f"<html>{self.url}</html>"
+
+class FakeBrowser:
+    """Chromium stub"""
+    
+    def __init__(self):
+        self.closed = False
+    
+    async def close(self):
+        self.closed = True
+
+class FakeBrowserPool(BrowserPool):
+    """Browser pool that launches stub browsers"""
+    
+    launched = None
+    failed_launches = 0
+    
+    async def _launch(self):
+        if self.failed_launches:
+            self.failed_launches -= 1
+            raise RuntimeError("Chromium failed to start")
+        browser = FakeBrowser()
+        self.launched.append(browser)
+        return _PooledBrowser(browser, [FakePage() for _ in range(self.tabs_per_browser)])
+
+class TestBrowserPool(unittest.TestCase):
+    """Test headless browser pool"""
+    
+    def make_pool(self, **kwargs):
+        pool = FakeBrowserPool(**kwargs)
+        pool.launched = []
+        self.addCleanup(pool.close)
+        return pool
+    
+    def test_browsers_are_reused(self):
+        """Test renders reuse launched browsers instead of starting new ones"""
+        pool = self.make_pool(browsers=1, tabs_per_browser=2, max_pages_per_browser=100)
+        for i in range(5):
+            self.assertEqual(pool.render(f"https://shopee.ph/p{i}", timeout=5), f"<html>https://shopee.ph/p{i}</html>")
+        self.assertEqual(len(pool.launched), 1)
+    
+    def test_browser_recycled_after_max_pages(self):
+        """Test a browser is closed and replaced after rendering its page budget"""
+        pool = self.make_pool(browsers=1, tabs_per_browser=1, max_pages_per_browser=2)
+        for i in range(5):
+            pool.render(f"https://shopee.ph/p{i}", timeout=5)
+        self.assertEqual(pool.recycled, 2)
+        self.assertTrue(pool.launched[0].closed)
+        self.assertFalse(pool.launched[-1].closed)
+    
+    def test_failed_relaunch_is_retried(self):
+        """Test a recycled browser that fails to relaunch is launched by the next render"""
+        pool = self.make_pool(browsers=1, tabs_per_browser=1, max_pages_per_browser=1)
+        pool.render("https://shopee.ph/p0", timeout=5)
+        pool.failed_launches = 1
+        self.assertEqual(pool.render("https://shopee.ph/p1", timeout=5), "<html>https://shopee.ph/p1</html>")
+        self.assertEqual(pool._missing, 1)
+        self.assertEqual(pool.render("https://shopee.ph/p2", timeout=5), "<html>https://shopee.ph/p2</html>")
+        # Initial, after p0, lazily for p2 and after p2 (the launch after p1 failed)
+        self.assertEqual(len(pool.launched), 4)
+        self.assertIsNone(pool.render("https://shopee.ph/p3", timeout=0.0))
+    
+    def test_full_queue_rejects_jobs(self):
+        """Test render refuses jobs once the bounded queue is full"""
+        pool = self.make_pool(browsers=1, tabs_per_browser=1, queue_size=0)
+        self.assertTrue(pool._slots.acquire(blocking=False))
+        with self.assertRaises(BrowserPoolFullError):
+            pool.render("https://shopee.ph/p", timeout=5)
+        pool._slots.release()
+
 class TestConfig(unittest.TestCase):
     """Test configuration"""
     
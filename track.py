@@ -26,6 +26,7 @@ Examples:
   python track.py --url URL          # Track a specific product
   python track.py --schedule         # Run scheduler for continuous tracking
   python track.py --scheduler        # Same as --schedule
+  python track.py --concurrency 16   # Scrape 16 products at once
         """
     )
     
@@ -55,6 +56,12 @@ Examples:
         help='Tracking interval in seconds (default: from .env or 3600)'
     )
     
+    parser.add_argument(
+        '--concurrency',
+        type=int,
+        help='Number of products to scrape at once (default: from .env or 1)'
+    )
+    
     parser.add_argument(
         '--version',
         action='version',
@@ -63,9 +70,10 @@ Examples:
     
     args = parser.parse_args()
     
+    tracker = None
     try:
         # Initialize tracker
-        tracker = PriceTracker(args.sheets_id)
+        tracker = PriceTracker(args.sheets_id, concurrency=args.concurrency)
         
         if args.url:
             # Track specific URL
@@ -113,6 +121,11 @@ Examples:
         app_logger.error(f"Fatal error: {e}")
         print(f"Error: {e}")
         sys.exit(1)
+    finally:
+        # Write the rows still queued for Google Sheets, also after Ctrl+C or
+        # an error (run_scheduler closes the tracker itself)
+        if tracker is not None and not args.schedule:
+            tracker.close()
 
 if __name__ == "__main__":
     main()
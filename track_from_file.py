@@ -4,21 +4,26 @@ Track products from a URL list file
 """
 import sys
 import os
+import argparse
 
 # Add src to path
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'src'))
 
 from scraper import ShopeeScraper
+from async_scraper import scrape_all
+from browser_pool import close_browser_pool
+from http_session import close_shared_session
 from google_sheets import GoogleSheetsManager
 from logger import app_logger
 
-def track_from_file(filename: str, limit: int = None):
+def track_from_file(filename: str, limit: int = None, concurrency: int = None):
     """
     Track products from a file containing URLs (one per line)
     
     Args:
         filename: File containing product URLs
         limit: Max products to track
+        concurrency: Products scraped at once (None or 1 = one at a time)
     """
     # Read URLs from file
     try:
@@ -32,47 +37,84 @@ def track_from_file(filename: str, limit: int = None):
         app_logger.error("No URLs found in file")
         return
     
+    # Initialize scraper and sheets
+    scraper = ShopeeScraper()
+    
+    # Each product is tracked once, however many URLs point to it
+    urls = scraper.unique_urls(urls)
+    
     # Limit if specified
     if limit:
         urls = urls[:limit]
     
     app_logger.info(f"Found {len(urls)} product URLs in {filename}")
     
-    # Initialize scraper and sheets
-    scraper = ShopeeScraper()
     sheets = GoogleSheetsManager()
     sheets.initialize_sheet()
     
     tracked = 0
     failed = 0
     
-    # Track each product
-    for i, url in enumerate(urls, 1):
-        url = url.strip()
-        if not url or url.startswith('#'):
-            continue
+    def row_written(product_data, error):
+        nonlocal tracked, failed
+        
+        if error is None:
+            tracked += 1
+            name = product_data.get('name', 'Unknown')
+            price = product_data.get('price', 'N/A')
+            print(f"  ✓ {name} - ₱{price}")
+        else:
+            failed += 1
+            print(f"  ✗ Failed to save to Google Sheets: {product_data.get('url')} ({error})")
+    
+    # Rows are appended in bulk, each reported once its batch is written
+    rows = sheets.row_buffer(on_result=row_written)
+    
+    def save_result(url, product_data):
+        nonlocal failed
         
         try:
-            app_logger.info(f"[{i}/{len(urls)}] Tracking: {url}")
-            
-            product_data = scraper.scrape_product(url)
             if product_data:
-                if sheets.append_price_data(product_data):
-                    tracked += 1
-                    name = product_data.get('name', 'Unknown')
-                    price = product_data.get('price', 'N/A')
-                    print(f"  ✓ {name} - ₱{price}")
-                else:
-                    failed += 1
-                    print(f"  ✗ Failed to save to Google Sheets")
+                rows.add(product_data)
             else:
                 failed += 1
-                print(f"  ✗ Failed to scrape product")
+                print(f"  ✗ Failed to scrape product: {url}")
                 
         except Exception as e:
             failed += 1
             app_logger.error(f"Error: {e}")
     
+    # Products returned by the batched item API need no further requests
+    prefetched = scraper.fetch_products_batch(urls)
+    for url, product_data in prefetched.items():
+        save_result(url, product_data)
+    urls = [url for url in urls if url not in prefetched]
+    
+    if concurrency and concurrency > 1:
+        # Results are saved as each product completes
+        scrape_all(urls, save_result, concurrency=concurrency, scraper=scraper)
+    else:
+        # Track each product
+        for i, url in enumerate(urls, 1):
+            url = url.strip()
+            if not url or url.startswith('#'):
+                continue
+            
+            try:
+                app_logger.info(f"[{i}/{len(urls)}] Tracking: {url}")
+                save_result(url, scraper.scrape_product(url))
+            except Exception as e:
+                failed += 1
+                app_logger.error(f"Error: {e}")
+    
+    rows.flush()
+    scraper.log_run_stats()
+    sheets.log_quota_stats()
+    sheets.save_state()
+    scraper.save_state()
+    close_browser_pool()
+    close_shared_session()
+    
     # Summary
     print("\n" + "="*70)
     print(f"Tracking Complete")
@@ -85,16 +127,22 @@ def track_from_file(filename: str, limit: int = None):
         print(f"\nData saved to Google Sheets!")
 
 if __name__ == "__main__":
-    filename = sys.argv[1] if len(sys.argv) > 1 else "product_urls.txt"
-    limit = int(sys.argv[2]) if len(sys.argv) > 2 else None
+    parser = argparse.ArgumentParser(description="Track products from a URL list file")
+    parser.add_argument('filename', nargs='?', default="product_urls.txt",
+                        help='File with one product URL per line')
+    parser.add_argument('limit', nargs='?', type=int, help='Max products to track')
+    parser.add_argument('--concurrency', type=int,
+                        help='Number of products to scrape at once (default: 1)')
+    args = parser.parse_args()
     
-    if not os.path.exists(filename):
-        print(f"Usage: python track_from_file.py <filename> [limit]")
+    if not os.path.exists(args.filename):
+        print(f"Usage: python track_from_file.py <filename> [limit] [--concurrency N]")
         print(f"\nExample:")
         print(f"  python track_from_file.py product_urls.txt")
         print(f"  python track_from_file.py product_urls.txt 10")
+        print(f"  python track_from_file.py product_urls.txt --concurrency 16")
         print(f"\nFile format: One URL per line")
         print(f"  https://shopee.ph/Product-Name-i.123456.789")
         sys.exit(1)
     
-    track_from_file(filename, limit)
+    track_from_file(args.filename, args.limit, args.concurrency)